@@ -1,7 +1,20 @@
 from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
 from typing import List, Dict, Any, Optional
+import httpx
 
 class AIAdapter(ABC):
+    http_client: Optional[httpx.AsyncClient] = None # shared pool from ai.registry, if any
+
+    @asynccontextmanager
+    async def http(self):
+        # the shared client when the registry handed one in, else a throwaway one
+        if self.http_client is not None:
+            yield self.http_client
+        else:
+            async with httpx.AsyncClient() as client:
+                yield client
+
     @abstractmethod
     async def chat(self, messages: List[Dict[str, str]], model: str = None, **kwargs) -> str:
         """Simple chat completion"""
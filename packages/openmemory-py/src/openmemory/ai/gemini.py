@@ -6,8 +6,9 @@
 from .adapter import AIAdapter
 
 class GeminiAdapter(AIAdapter):
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, http_client=None):
         self.api_key = api_key or env.gemini_key or os.getenv("GEMINI_API_KEY")
+        self.http_client = http_client
         self.base_url = "https://generativelanguage.googleapis.com/v1beta"
         
     async def chat(self, messages: List[Dict[str, str]], model: str = None, **kwargs) -> str:
@@ -30,7 +31,7 @@ async def chat(self, messages: List[Dict[str, str]], model: str = None, **kwargs
             
         url = f"{self.base_url}/{m}:generateContent?key={self.api_key}"
         
-        async with httpx.AsyncClient() as client:
+        async with self.http() as client:
             res = await client.post(url, json={
                 "contents": contents,
                 "generationConfig": kwargs
@@ -63,7 +64,7 @@ async def embed_batch(self, texts: List[str], model: str = None) -> List[List[fl
                 "taskType": "SEMANTIC_SIMILARITY" 
             })
             
-        async with httpx.AsyncClient() as client:
+        async with self.http() as client:
             res = await client.post(url, json={"requests": reqs})
             if res.status_code != 200: raise Exception(f"Gemini: {res.text}")
             
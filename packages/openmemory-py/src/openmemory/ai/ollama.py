@@ -4,14 +4,15 @@
 from .adapter import AIAdapter
 
 class OllamaAdapter(AIAdapter):
-    def __init__(self, base_url: str = None):
-        self.base_url = base_url or env.ollama_base_url or "http://localhost:11434"
+    def __init__(self, base_url: str = None, http_client=None):
+        self.base_url = base_url or env.ollama_url or "http://localhost:11434"
+        self.http_client = http_client
         
     async def chat(self, messages: List[Dict[str, str]], model: str = None, **kwargs) -> str:
         m = model or env.ollama_model or "llama3"
         url = f"{self.base_url.rstrip('/')}/api/chat"
         # simple non-streaming implementation
-        async with httpx.AsyncClient() as client:
+        async with self.http() as client:
             res = await client.post(url, json={
                 "model": m,
                 "messages": messages,
@@ -27,11 +28,17 @@ async def embed(self, text: str, model: str = None) -> List[float]:
         
     async def embed_batch(self, texts: List[str], model: str = None) -> List[List[float]]:
         m = model or env.ollama_embedding_model or "nomic-embed-text"
-        url = f"{self.base_url.rstrip('/')}/api/embeddings"
-        res = []
-        async with httpx.AsyncClient() as client:
+        base = self.base_url.rstrip('/')
+        async with self.http() as client:
+            # /api/embed takes the whole batch in one request (Ollama >= 0.3)
+            r = await client.post(f"{base}/api/embed", json={"model": m, "input": texts})
+            if r.status_code == 200:
+                return r.json()["embeddings"]
+            if r.status_code != 404: raise Exception(f"Ollama Emb: {r.text}")
+            # older servers: one /api/embeddings call per text
+            res = []
             for t in texts:
-                r = await client.post(url, json={"model": m, "prompt": t})
+                r = await client.post(f"{base}/api/embeddings", json={"model": m, "prompt": t})
                 if r.status_code != 200: raise Exception(f"Ollama Emb: {r.text}")
                 res.append(r.json()["embedding"])
         return res
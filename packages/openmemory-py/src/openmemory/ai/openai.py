@@ -5,10 +5,11 @@
 from .adapter import AIAdapter
 
 class OpenAIAdapter(AIAdapter):
-    def __init__(self, api_key: str = None, base_url: str = None):
+    def __init__(self, api_key: str = None, base_url: str = None, http_client=None):
         self.api_key = api_key or env.openai_key
         self.base_url = base_url or env.openai_base_url
-        self.client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+        self.http_client = http_client
+        self.client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, http_client=http_client)
         
     async def chat(self, messages: List[Dict[str, str]], model: str = None, **kwargs) -> str:
         m = model or env.openai_model or "gpt-4o-mini"
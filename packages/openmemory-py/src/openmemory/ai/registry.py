@@ -0,0 +1,93 @@
+import asyncio
+import atexit
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+from ..core.config import env
+from .adapter import AIAdapter
+
+# Long-lived adapters sharing one pooled HTTP client, so embeddings reuse keep-alive
+# (and HTTP/2 where available) connections instead of a new client + TLS handshake per
+# call. httpx/openai async clients are tied to the event loop they were first used on,
+# so both the client and the http-based adapters are kept per loop.
+
+try:
+    import h2  # noqa: F401  # pip install httpx[http2]
+    HAS_H2 = True
+except ImportError:
+    HAS_H2 = False
+
+_clients: Dict[int, Tuple[Any, httpx.AsyncClient]] = {}
+_adapters: Dict[Tuple[str, Optional[int]], Tuple[Any, AIAdapter]] = {}
+
+def _loop():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+def get_http_client() -> httpx.AsyncClient:
+    loop = _loop()
+    cur = _clients.get(id(loop))
+    if cur is None or cur[0] is not loop or cur[1].is_closed:
+        c = httpx.AsyncClient(
+            http2=env.http2 and HAS_H2,
+            limits=httpx.Limits(
+                max_connections=env.http_max_connections,
+                max_keepalive_connections=env.http_max_keepalive,
+                keepalive_expiry=env.http_keepalive_s,
+            ),
+            timeout=httpx.Timeout(env.http_timeout_s),
+        )
+        cur = (loop, c)
+        _prune()
+        _clients[id(loop)] = cur
+    return cur[1]
+
+def _prune():
+    # forget pools and adapters of loops that have been closed (e.g. one asyncio.run per call)
+    for k, (loop, _) in list(_clients.items()):
+        if loop is not None and loop.is_closed(): del _clients[k]
+    for k, (loop, _) in list(_adapters.items()):
+        if loop is not None and loop.is_closed(): del _adapters[k]
+
+def _make(provider: str) -> AIAdapter:
+    if provider == "openai":
+        from .openai import OpenAIAdapter
+        return OpenAIAdapter(http_client=get_http_client())
+    if provider == "ollama":
+        from .ollama import OllamaAdapter
+        return OllamaAdapter(http_client=get_http_client())
+    if provider == "gemini":
+        from .gemini import GeminiAdapter
+        return GeminiAdapter(http_client=get_http_client())
+    if provider == "aws":
+        from .aws import AwsAdapter
+        return AwsAdapter()
+    from .synthetic import SyntheticAdapter
+    return SyntheticAdapter(env.vec_dim or 768)
+
+# boto3 and synthetic adapters hold no loop-bound state and are shared process-wide
+_LOOP_FREE = {"aws", "synthetic"}
+
+def get_adapter(provider: str) -> AIAdapter:
+    loop = None if provider in _LOOP_FREE else _loop()
+    key = (provider, None if loop is None else id(loop))
+    cur = _adapters.get(key)
+    if cur is None or cur[0] is not loop:
+        cur = (loop, _make(provider))
+        _adapters[key] = cur
+    return cur[1]
+
+async def close_clients():
+    # close the current loop's pool (server shutdown)
+    loop = _loop()
+    cur = _clients.pop(id(loop), None)
+    for k in [k for k, (l, _) in _adapters.items() if l is loop]: del _adapters[k]
+    if cur and not cur[1].is_closed: await cur[1].aclose()
+
+@atexit.register
+def _drop():
+    # loops are usually gone by now; just let the pools be collected
+    _clients.clear()
+    _adapters.clear()
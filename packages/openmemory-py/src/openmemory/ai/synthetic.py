@@ -16,7 +16,7 @@ async def embed(self, text: str, model: str = None) -> List[float]:
         return self._gen_syn_emb(text, model or "semantic")
         
     async def embed_batch(self, texts: List[str], model: str = None) -> List[List[float]]:
-        return [self._gen_syn_emb(t, model or "semantic") for t in texts]
+        return self._gen_syn_emb_many(texts, model or "semantic").tolist()
         
     def _fnv1a(self, v: str) -> int:
         h = 0x811c9dc5
@@ -34,30 +34,38 @@ def _murmurish(self, v: str, seed: int) -> int:
             h &= 0xffffffff
         return h
 
-    def _add_feat(self, vec: np.ndarray, k: str, w: float):
-        h = self._fnv1a(k)
-        h2 = self._murmurish(k, 0xdeadbeef)
-        val = w * (1.0 - float((h & 1) << 1))
-        
-        if (self.dim & (self.dim - 1)) == 0:
-            vec[h & (self.dim - 1)] += val
-            vec[h2 & (self.dim - 1)] += val * 0.5
-        else:
-            vec[h % self.dim] += val
-            vec[h2 % self.dim] += val * 0.5
+    # Vectorized generator. Features are emitted in the order the original scalar
+    # version added them, both hashes are computed column-wise over all feature keys
+    # at once, and everything is scatter-added with one np.add.at (which applies
+    # repeated indices sequentially), so the float32 rounding sequence - and thus
+    # the output - is bit-identical to adding them one by one.
 
-    def _add_pos_feat(self, vec: np.ndarray, pos: int, w: float):
-        idx = pos % self.dim
-        ang = pos / pow(10000, (2 * idx) / self.dim)
-        vec[idx] += w * math.sin(ang)
-        vec[(idx + 1) % self.dim] += w * math.cos(ang)
+    def _hash_many(self, prefix: str, keys: List[str]):
+        # fnv1a / murmurish of prefix+key for every key; prefix state computed once
+        n = len(keys)
+        lens = np.fromiter((len(k) for k in keys), dtype=np.int64, count=n)
+        codes = np.frombuffer("".join(keys).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        width = int(lens.max()) if n else 0
+        mat = np.zeros((n, width), dtype=np.uint64)
+        live = np.arange(width) < lens[:, None]
+        mat[live] = codes
+        
+        h1 = np.full(n, self._fnv1a(prefix), dtype=np.uint64)
+        h2 = np.full(n, self._murmurish(prefix, 0xdeadbeef), dtype=np.uint64)
+        m32 = np.uint64(0xffffffff)
+        for j in range(width):
+            c, on = mat[:, j], live[:, j]
+            x = ((h1 ^ c) * np.uint64(16777619)) & m32
+            h1 = np.where(on, x, h1)
+            y = ((h2 ^ c) * np.uint64(0x5bd1e995)) & m32
+            y = ((y >> np.uint64(13)) ^ y) & m32
+            h2 = np.where(on, y, h2)
+        return h1, h2
 
-    def _gen_syn_emb(self, t: str, s: str) -> List[float]:
-        v = np.zeros(self.dim, dtype=np.float32)
+    def _features(self, t: str, s: str):
+        # (keys, weights) in original insertion order, plus (positions, weight) for the positional part
         ct = canonical_tokens_from_text(t)
-        
-        if not ct:
-            return (np.ones(self.dim, dtype=np.float32) / math.sqrt(self.dim)).tolist()
+        if not ct: return None
         
         et = []
         for tok in ct:
@@ -67,31 +75,78 @@ def _gen_syn_emb(self, t: str, s: str) -> List[float]:
                 for syn in syns: et.append(canonicalize_token(syn))
                     
         el = len(et)
-        if el == 0: return (np.ones(self.dim, dtype=np.float32) / math.sqrt(self.dim)).tolist()
+        if el == 0: return None
         
         tc = {}
         for tok in et: tc[tok] = tc.get(tok, 0) + 1
         
         sw = SEC_WTS.get(s, 1.0)
+        keys, ws = [], []
         
         for tok, c in tc.items():
             tf = c / el
             idf = math.log(1 + el/c)
             w = (tf * idf + 1) * sw
-            self._add_feat(v, f"{s}|tok|{tok}", w)
+            keys.append(f"tok|{tok}"); ws.append(w)
             if len(tok) >= 3:
+                w3 = w * 0.4
                 for i in range(len(tok) - 2):
-                    self._add_feat(v, f"{s}|c3|{tok[i:i+3]}", w * 0.4)
+                    keys.append(f"c3|{tok[i:i+3]}"); ws.append(w3)
                     
         for i in range(len(ct) - 1):
-            a, b = ct[i], ct[i+1]
-            pw = 1.0 / (1.0 + i * 0.1)
-            self._add_feat(v, f"{s}|bi|{a}_{b}", 1.4 * sw * pw)
+            keys.append(f"bi|{ct[i]}_{ct[i+1]}"); ws.append(1.4 * sw * (1.0 / (1.0 + i * 0.1)))
             
-        dl = math.log(1 + el)
-        for i in range(min(len(ct), 50)):
-            self._add_pos_feat(v, i, (0.5 * sw) / dl)
+        return keys, ws, min(len(ct), 50), (0.5 * sw) / math.log(1 + el)
+
+    def _pos_table(self):
+        # sin/cos of the positional angles (math.* so values match the scalar version exactly)
+        if getattr(self, "_pos", None) is None:
+            idx, sn, cs = [], [], []
+            for pos in range(50):
+                i = pos % self.dim
+                ang = pos / pow(10000, (2 * i) / self.dim)
+                idx.append((i, (i + 1) % self.dim)); sn.append(math.sin(ang)); cs.append(math.cos(ang))
+            self._pos = (np.array(idx, dtype=np.int64), np.array(sn), np.array(cs))
+        return self._pos
+
+    def _gen_syn_emb_many(self, texts: List[str], s: str) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        feats = [self._features(t, s) for t in texts]
+        acc = (np.float32(0) + 0.0).dtype # what `f32_elem += float` accumulates in on this numpy
+        pidx, psin, pcos = self._pos_table()
+        
+        keys, ws, rows, pos_idx, pos_val = [], [], [], [], []
+        for r, f in enumerate(feats):
+            if f is None: continue
+            k, w, npos, pw = f
+            keys.extend(k); ws.extend(w); rows.extend([r] * len(k))
+            pos_idx.append(r * self.dim + pidx[:npos].ravel())
+            pos_val.append(np.stack([pw * psin[:npos], pw * pcos[:npos]], axis=1).ravel())
+        
+        if keys:
+            h1, h2 = self._hash_many(f"{s}|", keys)
+            w = np.asarray(ws, dtype=np.float64)
+            val = w * (1.0 - ((h1 & np.uint64(1)) << np.uint64(1)).astype(np.float64))
+            if (self.dim & (self.dim - 1)) == 0:
+                i1, i2 = h1 & np.uint64(self.dim - 1), h2 & np.uint64(self.dim - 1)
+            else:
+                i1, i2 = h1 % np.uint64(self.dim), h2 % np.uint64(self.dim)
+            base = np.asarray(rows, dtype=np.int64) * self.dim
+            # per text: hashed features (h then h2 for each) first, then positional ones
+            fi = np.stack([base + i1.astype(np.int64), base + i2.astype(np.int64)], axis=1).ravel()
+            fv = np.stack([val, val * 0.5], axis=1).ravel()
+            np.add.at(out.reshape(-1), fi, fv.astype(acc))
+        if pos_idx:
+            np.add.at(out.reshape(-1), np.concatenate(pos_idx), np.concatenate(pos_val).astype(acc))
             
-        n = np.linalg.norm(v)
-        if n > 0: v /= n
-        return v.tolist()
+        for r, f in enumerate(feats):
+            if f is None:
+                out[r] = np.ones(self.dim, dtype=np.float32) / math.sqrt(self.dim)
+                continue
+            v = out[r]
+            n = np.linalg.norm(v)
+            if n > 0: v /= n
+        return out
+
+    def _gen_syn_emb(self, t: str, s: str) -> List[float]:
+        return self._gen_syn_emb_many([t], s)[0].tolist()
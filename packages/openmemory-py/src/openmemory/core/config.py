@@ -64,6 +64,7 @@ def get(sec: str, key: str, env_var: str, default: Any) -> Any:
         # [decay]
         self.decay_half_life = float(get("decay", "half_life_days", "OM_DECAY_HALF_LIFE", 14))
         self.decay_lambda = num(os.getenv("OM_DECAY_LAMBDA"), 0.02) # legacy env
+        self.reinforce_flush_ms = int(get("decay", "reinforce_flush_ms", "OM_REINFORCE_FLUSH_MS", 100))
 
         # [ai] or root params
         self.openai_key = get("ai", "openai_key", "OPENAI_API_KEY", "") or os.getenv("OM_OPENAI_API_KEY")
@@ -73,6 +74,18 @@ def get(sec: str, key: str, env_var: str, default: Any) -> Any:
         self.ollama_url = get("ai", "ollama_url", "OLLAMA_URL", "http://localhost:11434")
         
         self.emb_kind = get("ai", "embedding_provider", "OM_EMBED_KIND", "synthetic")
+        self.embed_concurrency = int(get("ai", "embed_concurrency", "OM_EMBED_CONCURRENCY", 4)) # in-flight calls per provider
+        # shared HTTP pool for the AI adapters (ai/registry.py)
+        self.http2 = s_bool(get("ai", "http2", "OM_HTTP2", "true"))
+        self.http_max_connections = int(get("ai", "http_max_connections", "OM_HTTP_MAX_CONNECTIONS", 100))
+        self.http_max_keepalive = int(get("ai", "http_max_keepalive", "OM_HTTP_MAX_KEEPALIVE", 20))
+        self.http_keepalive_s = float(get("ai", "http_keepalive_s", "OM_HTTP_KEEPALIVE_S", 30))
+        self.http_timeout_s = float(get("ai", "http_timeout_s", "OM_HTTP_TIMEOUT_S", 60))
+        self.embed_batch_window_ms = float(get("ai", "embed_batch_window_ms", "OM_EMBED_BATCH_WINDOW_MS", 5))
+        self.embed_batch_max = int(get("ai", "embed_batch_max", "OM_EMBED_BATCH_MAX", 64))
+        self.embed_cache_items = int(get("ai", "embed_cache_items", "OM_EMBED_CACHE_ITEMS", 4096))
+        self.embed_cache_persist = s_bool(get("ai", "embed_cache_persist", "OM_EMBED_CACHE_PERSIST", "true"))
+        self.embed_cache_rows = int(get("ai", "embed_cache_rows", "OM_EMBED_CACHE_ROWS", 100000)) # 0 = unbounded
         self.gemini_key = get("ai", "gemini_key", "GEMINI_API_KEY",  os.getenv("OM_GEMINI_KEY"))
         self.aws_region = get("ai", "aws_region", "AWS_REGION", None)
         self.aws_access_key_id = get("ai", "aws_access_key_id", "AWS_ACCESS_KEY_ID", None)
@@ -83,6 +96,7 @@ def get(sec: str, key: str, env_var: str, default: Any) -> Any:
         self.min_score = num(os.getenv("OM_MIN_SCORE"), 0.3)
         self.keyword_boost = num(os.getenv("OM_KEYWORD_BOOST"), 2.5)
         self.seg_size = int(num(os.getenv("OM_SEG_SIZE"), 10000))
+        self.waypoint_links = int(num(os.getenv("OM_WAYPOINT_LINKS"), 1)) # links created per insert
         
         self.decay_threads = int(num(os.getenv("OM_DECAY_THREADS"), 3))
         self.decay_cold_threshold = num(os.getenv("OM_DECAY_COLD_THRESHOLD"), 0.25)
@@ -102,6 +116,21 @@ def get(sec: str, key: str, env_var: str, default: Any) -> Any:
         self.gemini_embedding_model = os.getenv("OM_GEMINI_EMBEDDING_MODEL")
         self.aws_embedding_model = os.getenv("OM_AWS_EMBEDDING_MODEL")
 
+        # [cache] hsg_query result cache (LRU, invalidated per user on writes)
+        self.query_cache_items = int(get("cache", "query_items", "OM_QUERY_CACHE_ITEMS", 512))
+        self.query_cache_mb = float(get("cache", "query_mb", "OM_QUERY_CACHE_MB", 32))
+        self.query_cache_ttl_ms = int(get("cache", "query_ttl_ms", "OM_QUERY_CACHE_TTL_MS", 60000))
+
+        # [vector] optional quantized search codes (none | int8 | binary), re-ranked in float32
+        self.vec_quant = str(get("vector", "quantization", "OM_VEC_QUANT", "none")).lower()
+        self.vec_rerank = int(get("vector", "rerank_factor", "OM_VEC_RERANK", 4))
+
+        # [vector] ANN (hnsw backend) tuning
+        self.hnsw_m = int(get("vector", "hnsw_m", "OM_HNSW_M", 16))
+        self.hnsw_ef_construction = int(get("vector", "hnsw_ef_construction", "OM_HNSW_EF_CONSTRUCTION", 200))
+        self.hnsw_ef_search = int(get("vector", "hnsw_ef_search", "OM_HNSW_EF_SEARCH", 64))
+        self.hnsw_save_every = int(get("vector", "hnsw_save_every", "OM_HNSW_SAVE_EVERY", 1000))
+
     # Property for V2 access
     @property
     def database_url(self) -> str:
@@ -80,3 +80,16 @@ class SectorCfg(TypedDict):
 }
 
 SEC_WTS = {k: v["weight"] for k, v in SECTOR_CONFIGS.items()}
+
+# hsg scoring / reinforcement parameters (memory.reinforce applies gamma too)
+HYBRID_PARAMS = {
+    "tau": 3.0,
+    "beta": 2.0,
+    "eta": 0.1,
+    "gamma": 0.2,
+    "alpha_reinforce": 0.08,
+    "t_days": 7.0,
+    "t_max_days": 60.0,
+    "tau_hours": 1.0,
+    "epsilon": 1e-8,
+}
@@ -1,11 +1,16 @@
 import sqlite3
+import numpy as np
 import time
 import json
 import logging
+import asyncio
+from contextlib import contextmanager, asynccontextmanager
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Optional, Union, Callable
 from .config import env
 from .types import MemRow
+from ..utils.features import text_features
+from ..utils.text import build_search_doc, build_fts_query
 
 # simple logger
 logger = logging.getLogger("db")
@@ -14,6 +19,14 @@
 class DB:
     def __init__(self):
         self.conn: Optional[sqlite3.Connection] = None
+        # in-process listeners (e.g. vector store caches) keyed by event name
+        self._hooks: Dict[str, List[Callable]] = {}
+        # open transaction() depth; helpers' db.commit() calls are deferred to its COMMIT
+        self._tx = 0
+        self._sp = 0 # savepoint name counter
+        self._owner = None # task holding atransaction()
+        self._alock = None # (loop, asyncio.Lock)
+        self.has_fts = False
         
     def connect(self):
         if self.conn: return
@@ -78,6 +91,23 @@ def run_migrations(self):
                 except Exception as e:
                     logger.error(f"[DB] Migration {f} failed: {e}")
                     raise e
+        self._create_fts()
+
+    def _create_fts(self):
+        # Lexical index over memories.content (build_search_doc). memories has no integer key
+        # of its own (VACUUM may renumber its implicit rowid), so memories_fts_keys hands out
+        # one: memories_fts.rowid = memories_fts_keys.rid, mapped to memories.id.
+        # Kept out of the .sql migrations: SQLite builds without FTS5 just run without it.
+        try:
+            if not self.conn.execute("SELECT 1 FROM sqlite_master WHERE name='memories_fts_keys'").fetchone():
+                # an index keyed on memories.rowid is dropped and backfilled on the next search
+                self.conn.execute("DROP TABLE IF EXISTS memories_fts")
+            self.conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS memories_fts USING fts5(doc, tokenize='unicode61')")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS memories_fts_keys(rid INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE)")
+            self.has_fts = True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"[DB] FTS5 unavailable, lexical search disabled: {e}")
+            self.has_fts = False
         
     def init_schema(self):
          # Legacy entry point, mapped to migrations now
@@ -85,6 +115,9 @@ def init_schema(self):
             
     def execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
         self.connect()
+        if self._owner is not None and self.busy and not sql.lstrip()[:7].upper().startswith(("SELECT", "PRAGMA")):
+            # the write would join (and be rolled back with) another task's transaction
+            raise RuntimeError("db.execute() write while another task holds db.atransaction(); use `async with db.atransaction()`")
         return self.conn.execute(sql, params)
         
     def fetchall(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
@@ -96,17 +129,103 @@ def fetchone(self, sql: str, params: tuple = ()) -> Optional[sqlite3.Row]:
         return self.conn.execute(sql, params).fetchone()
         
     def commit(self):
-        if self.conn: self.conn.commit()
+        if self.conn and not self._tx: self.conn.commit()
+
+    @contextmanager
+    def transaction(self):
+        # Unit of work: the outermost block is BEGIN/COMMIT, nested blocks are savepoints, and
+        # every db.commit() inside is deferred to the outermost COMMIT (one WAL sync for the
+        # lot). An exception rolls back only the innermost block and is re-raised.
+        # The block must not await anything that really suspends - other tasks share the
+        # connection - use atransaction() for that.
+        # Refused while another task holds atransaction(): it would join that transaction
+        # and be undone by its rollback after having returned. Async callers queue with
+        # atransaction() instead; sync ones can check db.busy.
+        self.connect()
+        if self.busy:
+            raise RuntimeError("db.transaction() while another task holds db.atransaction(); use `async with db.atransaction()`")
+        sp = None
+        if self._tx == 0:
+            self.conn.execute("BEGIN")
+        else:
+            self._sp += 1
+            sp = f"om_sp{self._sp}"
+            self.conn.execute(f"SAVEPOINT {sp}")
+        self._tx += 1
+        try:
+            yield self.conn
+        except BaseException:
+            self._tx -= 1
+            if sp is None:
+                self.conn.execute("ROLLBACK")
+            else:
+                self.conn.execute(f"ROLLBACK TO {sp}")
+                self.conn.execute(f"RELEASE {sp}")
+            # in-process caches may hold rows that no longer exist
+            self.emit("tx_rollback")
+            raise
+        self._tx -= 1
+        if sp is not None:
+            self.conn.execute(f"RELEASE {sp}")
+            return
+        try:
+            self.conn.execute("COMMIT")
+        except BaseException:
+            if self.conn.in_transaction: self.conn.execute("ROLLBACK")
+            self.emit("tx_rollback")
+            raise
+
+    @asynccontextmanager
+    async def atransaction(self):
+        # transaction() for blocks that await: whole transactions are serialised between tasks
+        # (so two tasks never interleave savepoints on the shared connection); re-entry from
+        # the owning task nests as a savepoint. Sync transaction() blocks from other tasks are
+        # refused meanwhile (see busy).
+        task = asyncio.current_task()
+        if self._owner is task:
+            with self.transaction() as c:
+                yield c
+            return
+        loop = asyncio.get_running_loop()
+        if self._alock is None or self._alock[0] is not loop:
+            self._alock = (loop, asyncio.Lock())
+        async with self._alock[1]:
+            self._owner = task
+            try:
+                with self.transaction() as c:
+                    yield c
+            finally:
+                self._owner = None
+
+    @property
+    def busy(self) -> bool:
+        # an async transaction is open and owned by some other task than the caller
+        if self._owner is None: return False
+        try:
+            return asyncio.current_task() is not self._owner
+        except RuntimeError:
+            return True # no running loop: certainly not the owner
+
+    def on(self, event: str, fn: Callable):
+        self._hooks.setdefault(event, []).append(fn)
+
+    def off(self, event: str, fn: Callable):
+        fns = self._hooks.get(event, [])
+        if fn in fns: fns.remove(fn)
+
+    def emit(self, event: str, *args):
+        # "mem_delete": (ids, user_ids) after memory rows and their vectors are removed
+        # "mem_write": (ids, user_ids) after memory rows are inserted/updated; user_ids None = unknown/any
+        # "tx_rollback": () after a transaction() block or savepoint is rolled back
+        for fn in list(self._hooks.get(event, [])): # hooks may unregister themselves
+            fn(*args)
 
 # Single global instance
 db = DB()
 
 # Specific query wrappers matching q_type
 class Queries:
-    def ins_mem(self, **k):
-        # params: id, user_id, segment, content, simhash, primary_sector, tags, meta, created, updated, last_seen, salience, decay, version, mean_dim, mean_vec, compressed_vec, feedback
-        # simpler to just use dict
-        sql = """
+    MEM_SQL = """
         INSERT INTO memories(id, user_id, segment, content, simhash, primary_sector, tags, meta, created_at, updated_at, last_seen_at, salience, decay_lambda, version, mean_dim, mean_vec, compressed_vec, feedback_score)
         VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
         ON CONFLICT(id) DO UPDATE SET
@@ -115,18 +234,226 @@ def ins_mem(self, **k):
         salience=excluded.salience, decay_lambda=excluded.decay_lambda, version=excluded.version, mean_dim=excluded.mean_dim,
         mean_vec=excluded.mean_vec, compressed_vec=excluded.compressed_vec, feedback_score=excluded.feedback_score
         """
-        vals = (
+
+    @staticmethod
+    def _mem_vals(k: Dict[str, Any]) -> tuple:
+        return (
             k.get("id"), k.get("user_id"), k.get("segment", 0), k.get("content"), k.get("simhash"),
             k.get("primary_sector"), k.get("tags"), k.get("meta"), k.get("created_at"), k.get("updated_at"),
             k.get("last_seen_at"), k.get("salience", 1.0), k.get("decay_lambda", 0.02), k.get("version", 1),
             k.get("mean_dim"), k.get("mean_vec"), k.get("compressed_vec"), k.get("feedback_score", 0)
         )
-        db.execute(sql, vals)
+
+    def ins_mem(self, **k):
+        # params: id, user_id, segment, content, simhash, primary_sector, tags, meta, created, updated, last_seen, salience, decay, version, mean_dim, mean_vec, compressed_vec, feedback
+        # simpler to just use dict
+        db.execute(self.MEM_SQL, self._mem_vals(k))
+        self.set_simhash_bands(k.get("id"), k.get("simhash"))
+        self.set_features([(k.get("id"), k.get("content"))])
+        self.set_fts([(k.get("id"), k.get("content"))])
+        self.set_tags([(k.get("id"), k.get("tags"))])
+        db.commit()
+
+    def ins_mems(self, rows: List[Dict[str, Any]]):
+        # bulk ins_mem: one executemany for the rows and one for their simhash bands
+        if not rows: return
+        db.conn.executemany(self.MEM_SQL, [self._mem_vals(k) for k in rows])
+        db.conn.executemany("DELETE FROM simhash_bands WHERE id=?", [(k.get("id"),) for k in rows])
+        bands = []
+        for k in rows:
+            if not k.get("simhash"): continue
+            v = int(k["simhash"], 16)
+            bands += [(b, (v >> (16 * b)) & 0xffff, k["id"]) for b in range(self.SIMHASH_BANDS)]
+        db.conn.executemany("INSERT OR IGNORE INTO simhash_bands(band, value, id) VALUES (?,?,?)", bands)
+        self.set_features([(k.get("id"), k.get("content")) for k in rows])
+        self.set_fts([(k.get("id"), k.get("content")) for k in rows])
+        self.set_tags([(k.get("id"), k.get("tags")) for k in rows])
         db.commit()
 
+    def set_features(self, rows: List[tuple]) -> Dict[str, tuple]:
+        # [(id, content)] -> mem_features rows; returns {id: (toks, kws)}
+        out = {mid: text_features(content) for mid, content in rows}
+        db.conn.executemany("INSERT OR REPLACE INTO mem_features(id, toks, kws) VALUES (?,?,?)",
+                            [(mid, t.tobytes(), k.tobytes()) for mid, (t, k) in out.items()])
+        return out
+
+    def get_features(self, mems: Dict[str, Any]) -> Dict[str, tuple]:
+        # {id: row} -> {id: (toks, kws)} uint32 hash arrays; computes rows that predate the table
+        ids = list(mems)
+        out = {}
+        for n in range(0, len(ids), 500):
+            chunk = ids[n:n+500]
+            ph = ",".join("?" * len(chunk))
+            for r in db.fetchall(f"SELECT id, toks, kws FROM mem_features WHERE id IN ({ph})", tuple(chunk)):
+                out[r["id"]] = (np.frombuffer(r["toks"], dtype=np.uint32), np.frombuffer(r["kws"], dtype=np.uint32))
+        missing = [(i, mems[i]["content"]) for i in ids if i not in out]
+        if missing:
+            out.update(self.set_features(missing))
+            db.commit()
+        return out
+
+    # x 16 bits. compute_simhash repeats its 32-bit hash in both halves, so only the low two
+    # bands are distinct; Hamming <= 3 over the 64 bits is <= 1 over the 32 real ones, so
+    # one of the two always matches.
+    SIMHASH_BANDS = 2
+
+    def set_simhash_bands(self, mid: str, simhash: Optional[str]):
+        db.execute("DELETE FROM simhash_bands WHERE id=?", (mid,))
+        if not simhash: return
+        v = int(simhash, 16)
+        db.conn.executemany("INSERT OR IGNORE INTO simhash_bands(band, value, id) VALUES (?,?,?)",
+                            [(b, (v >> (16 * b)) & 0xffff, mid) for b in range(self.SIMHASH_BANDS)])
+
+    _bands_ready = False
+
+    def near_simhash(self, simhash: str):
+        # memories sharing at least one 16-bit band with simhash (superset of Hamming <= 3)
+        if not self._bands_ready:
+            # backfill rows that predate the bands table
+            for r in db.fetchall("SELECT id, simhash FROM memories WHERE simhash IS NOT NULL AND simhash != '' AND id NOT IN (SELECT id FROM simhash_bands)"):
+                self.set_simhash_bands(r["id"], r["simhash"])
+            db.commit()
+            Queries._bands_ready = True
+        v = int(simhash, 16)
+        cond = " OR ".join("(band=? AND value=?)" for _ in range(self.SIMHASH_BANDS))
+        args = [x for b in range(self.SIMHASH_BANDS) for x in (b, (v >> (16 * b)) & 0xffff)]
+        return db.fetchall(f"SELECT * FROM memories WHERE id IN (SELECT id FROM simhash_bands WHERE {cond})", tuple(args))
+
+    _seg: Optional[list] = None # [segment, fill, data_version]
+
+    def alloc_segments(self, n: int = 1) -> List[int]:
+        # Segment for each of n new memories: fill the current one up to env.seg_size, then
+        # rotate. The counter lives in memory and is written through to om_meta in the
+        # caller's transaction; reloaded when another connection commits or a rollback hits.
+        dv = db.fetchone("PRAGMA data_version")[0]
+        if self._seg is None or self._seg[2] != dv:
+            kv = {r["key"]: r["value"] for r in db.fetchall("SELECT key, value FROM om_meta WHERE key IN ('segment', 'segment_fill')")}
+            if "segment" not in kv:
+                kv["segment"] = db.fetchone("SELECT coalesce(max(segment), 0) as s FROM memories")["s"]
+                kv["segment_fill"] = db.fetchone("SELECT count(*) as c FROM memories WHERE segment=?", (kv["segment"],))["c"]
+            Queries._seg = [kv["segment"], kv.get("segment_fill", 0), dv]
+        seg = self._seg
+        out = []
+        for _ in range(n):
+            if seg[1] >= env.seg_size:
+                seg[0] += 1
+                seg[1] = 0
+                logger.info(f"[DB] Rotated to segment {seg[0]}")
+            seg[1] += 1
+            out.append(seg[0])
+        db.conn.executemany("INSERT OR REPLACE INTO om_meta(key, value) VALUES (?,?)", [("segment", seg[0]), ("segment_fill", seg[1])])
+        db.commit()
+        return out
+
+    def set_fts(self, rows: List[tuple]):
+        # [(id, content)] -> memories_fts, keyed by the memory's memories_fts_keys.rid
+        if not db.has_fts: return
+        db.conn.executemany("INSERT OR IGNORE INTO memories_fts_keys(id) VALUES (?)", [(mid,) for mid, _ in rows])
+        db.conn.executemany("INSERT OR REPLACE INTO memories_fts(rowid, doc) SELECT rid, ? FROM memories_fts_keys WHERE id=?",
+                            [(build_search_doc(content or ""), mid) for mid, content in rows])
+
+    def fts_indexed(self, ids: List[str]) -> set:
+        # the given ids that memories_fts holds (after fts_search's backfill: every stored memory)
+        if not db.has_fts: return set()
+        ids = list(ids)
+        out = set()
+        for n in range(0, len(ids), 500):
+            chunk = ids[n:n+500]
+            out.update(r["id"] for r in db.fetchall(f"SELECT id FROM memories_fts_keys WHERE id IN ({','.join('?' * len(chunk))})", tuple(chunk)))
+        return out
+
+    _fts_filled = False
+
+    def fts_search(self, text: str, k: int = 10, user_id: Optional[str] = None, ids: Optional[List[str]] = None, flt=None) -> List[tuple]:
+        # [(id, score)] best first by FTS5 bm25 (score = -bm25, higher is better); optionally
+        # restricted to one user, to given ids or by a MemFilter (core.filters) on the memories join.
+        # [] without FTS5 or without usable terms.
+        if not db.has_fts: return []
+        match = build_fts_query(text)
+        if not match: return []
+        if not self._fts_filled:
+            # backfill memories that predate the index
+            rows = db.fetchall("SELECT id, content FROM memories WHERE id NOT IN (SELECT id FROM memories_fts_keys)")
+            self.set_fts([(r["id"], r["content"]) for r in rows])
+            db.commit()
+            Queries._fts_filled = True
+        base = "SELECT m.id, bm25(memories_fts) AS r FROM memories_fts JOIN memories_fts_keys k ON k.rid = memories_fts.rowid JOIN memories m ON m.id = k.id WHERE memories_fts MATCH ?"
+        pre = [match]
+        if user_id:
+            base += " AND m.user_id=?"
+            pre.append(user_id)
+        if flt is not None:
+            w, wargs = flt.where("m")
+            base += f" AND {w}"
+            pre += wargs
+        ids = None if ids is None else list(ids)
+        out = []
+        for chunk in ([None] if ids is None else [ids[n:n+500] for n in range(0, len(ids), 500)]):
+            sql, args = base, list(pre)
+            if chunk is not None:
+                sql += f" AND m.id IN ({','.join('?' * len(chunk))})"
+                args += chunk
+            out += [(r["id"], -r["r"]) for r in db.fetchall(sql + " ORDER BY r LIMIT ?", tuple(args + [k]))]
+        if ids is not None and len(ids) > 500: out.sort(key=lambda x: -x[1])
+        return out[:k]
+
+    @staticmethod
+    def parse_tags(tags: Any) -> List[str]:
+        # memories.tags JSON -> distinct lower-cased tags (as stored in memory_tags)
+        if isinstance(tags, str):
+            try:
+                tags = json.loads(tags)
+            except ValueError:
+                return []
+        if not isinstance(tags, list): return []
+        return list(dict.fromkeys(str(t).lower() for t in tags if isinstance(t, (str, int, float)) and not isinstance(t, bool)))
+
+    def set_tags(self, rows: List[tuple]):
+        # [(id, tags json)] -> memory_tags
+        db.conn.executemany("DELETE FROM memory_tags WHERE memory_id=?", [(mid,) for mid, _ in rows])
+        db.conn.executemany("INSERT OR IGNORE INTO memory_tags(memory_id, tag) VALUES (?,?)",
+                            [(mid, t) for mid, tags in rows for t in self.parse_tags(tags)])
+
+    def get_tags(self, ids) -> Dict[str, List[str]]:
+        # {id: [tag]} for ids that have tags
+        ids = list(dict.fromkeys(ids))
+        out: Dict[str, List[str]] = {}
+        for n in range(0, len(ids), 500):
+            chunk = ids[n:n+500]
+            ph = ",".join("?" * len(chunk))
+            for r in db.fetchall(f"SELECT memory_id, tag FROM memory_tags WHERE memory_id IN ({ph})", tuple(chunk)):
+                out.setdefault(r["memory_id"], []).append(r["tag"])
+        return out
+
+    def ids_by_tags(self, tags: List[str], user_id: Optional[str] = None, limit: Optional[int] = None) -> List[str]:
+        # memories carrying any of tags, newest first
+        tags = self.parse_tags(list(tags))
+        if not tags: return []
+        sql = f"SELECT DISTINCT m.id, m.created_at FROM memory_tags t JOIN memories m ON m.id = t.memory_id WHERE t.tag IN ({','.join('?' * len(tags))})"
+        args: List[Any] = list(tags)
+        if user_id:
+            sql += " AND m.user_id=?"
+            args.append(user_id)
+        sql += " ORDER BY m.created_at DESC"
+        if limit:
+            sql += " LIMIT ?"
+            args.append(limit)
+        return [r["id"] for r in db.fetchall(sql, tuple(args))]
+
     def get_mem(self, mid: str):
         return db.fetchone("SELECT * FROM memories WHERE id=?", (mid,))
         
+    def get_mems(self, ids) -> Dict[str, sqlite3.Row]:
+        # one IN (...) fetch per 500 ids instead of a get_mem per id
+        ids = list(dict.fromkeys(ids))
+        out = {}
+        for n in range(0, len(ids), 500):
+            chunk = ids[n:n+500]
+            ph = ",".join("?" * len(chunk))
+            for r in db.fetchall(f"SELECT * FROM memories WHERE id IN ({ph})", tuple(chunk)):
+                out[r["id"]] = r
+        return out
+        
     def all_mem(self, limit=10, offset=0):
         return db.fetchall("SELECT * FROM memories ORDER BY created_at DESC LIMIT ? OFFSET ?", (limit, offset))
         
@@ -138,6 +465,12 @@ def ins_log(self, id: str, model: str, status: str, ts: int, err: Optional[str]
     def upd_log(self, id: str, status: str, err: Optional[str] = None):
         db.execute("UPDATE embed_logs SET status=?, err=? WHERE id=?", (status, err, id))
         db.commit()
+
+    def ins_logs(self, rows: List[tuple]):
+        # bulk ins_log: [(id, model, status, ts, err)]
+        if not rows: return
+        db.conn.executemany("INSERT INTO embed_logs(id, model, status, ts, err) VALUES (?,?,?,?,?)", rows)
+        db.commit()
         
     def all_mem_by_user(self, user_id: str, limit=10, offset=0):
         return db.fetchall("SELECT * FROM memories WHERE user_id=? ORDER BY created_at DESC LIMIT ? OFFSET ?", (user_id, limit, offset))
@@ -148,22 +481,42 @@ def get_waypoints_by_src(self, src_id: str):
         return db.fetchall("SELECT * FROM waypoints WHERE src_id=?", (src_id,))
 
     def del_mem(self, mid: str):
-        db.execute("DELETE FROM memories WHERE id=?", (mid,))
-        db.execute("DELETE FROM vectors WHERE id=?", (mid,))
-        db.execute("DELETE FROM waypoints WHERE src_id=? OR dst_id=?", (mid, mid))
-        db.commit()
+        # async callers: inside `async with db.atransaction()` (see DB.transaction)
+        row = db.fetchone("SELECT user_id FROM memories WHERE id=?", (mid,))
+        with db.transaction():
+            if db.has_fts:
+                db.execute("DELETE FROM memories_fts WHERE rowid IN (SELECT rid FROM memories_fts_keys WHERE id=?)", (mid,))
+                db.execute("DELETE FROM memories_fts_keys WHERE id=?", (mid,))
+            db.execute("DELETE FROM memories WHERE id=?", (mid,))
+            db.execute("DELETE FROM vectors WHERE id=?", (mid,))
+            db.execute("DELETE FROM waypoints WHERE src_id=? OR dst_id=?", (mid, mid))
+            db.execute("DELETE FROM simhash_bands WHERE id=?", (mid,))
+            db.execute("DELETE FROM mem_features WHERE id=?", (mid,))
+            db.execute("DELETE FROM memory_tags WHERE memory_id=?", (mid,))
+        db.emit("mem_delete", [mid], {row["user_id"]} if row else set())
 
     def del_mem_by_user(self, uid: str):
         # Cascading delete usually handled by FKs but we turned them off in PRAGMA
         # First get IDs to delete vectors? 
         # Or just DELETE FROM vectors WHERE id IN (SELECT id FROM memories WHERE user_id=?)
-        db.execute("DELETE FROM vectors WHERE id IN (SELECT id FROM memories WHERE user_id=?)", (uid,))
-        db.execute("DELETE FROM waypoints WHERE src_id IN (SELECT id FROM memories WHERE user_id=?) OR dst_id IN (SELECT id FROM memories WHERE user_id=?)", (uid, uid))
-        db.execute("DELETE FROM memories WHERE user_id=?", (uid,))
-        db.commit()
+        ids = [r["id"] for r in db.fetchall("SELECT id FROM memories WHERE user_id=?", (uid,))]
+        with db.transaction():
+            db.execute("DELETE FROM vectors WHERE id IN (SELECT id FROM memories WHERE user_id=?)", (uid,))
+            db.execute("DELETE FROM waypoints WHERE src_id IN (SELECT id FROM memories WHERE user_id=?) OR dst_id IN (SELECT id FROM memories WHERE user_id=?)", (uid, uid))
+            db.execute("DELETE FROM simhash_bands WHERE id IN (SELECT id FROM memories WHERE user_id=?)", (uid,))
+            db.execute("DELETE FROM mem_features WHERE id IN (SELECT id FROM memories WHERE user_id=?)", (uid,))
+            db.execute("DELETE FROM memory_tags WHERE memory_id IN (SELECT id FROM memories WHERE user_id=?)", (uid,))
+            if db.has_fts:
+                db.execute("DELETE FROM memories_fts WHERE rowid IN (SELECT rid FROM memories_fts_keys WHERE id IN (SELECT id FROM memories WHERE user_id=?))", (uid,))
+                db.execute("DELETE FROM memories_fts_keys WHERE id IN (SELECT id FROM memories WHERE user_id=?)", (uid,))
+            db.execute("DELETE FROM memories WHERE user_id=?", (uid,))
+        db.emit("mem_delete", ids, {uid})
 
 q = Queries()
+db.on("tx_rollback", lambda: setattr(Queries, "_seg", None))
+db.on("tx_rollback", lambda: setattr(Queries, "_fts_filled", False))
+db.on("tx_rollback", lambda: setattr(Queries, "_bands_ready", False))
 
 def transaction():
-    # context manager preferred
-    return db.conn
+    # with transaction(): ... (async with db.atransaction() when the block awaits)
+    return db.transaction()
@@ -0,0 +1,160 @@
+import json
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+from .db import db, q
+
+# Structured search filter, pushed down instead of applied to an already-cut top-k.
+# A MemFilter renders as a WHERE clause over `memories` (alias m); stores use it as
+#   user_id  -> their own per-row owner column / label codes (unchanged fast path)
+#   the rest -> selective filters: ids(), the matching memory ids, resolved once per query in
+#               SQLite and applied as a pre-filter bitmap (resident indexes) or an id list (Postgres)
+#            -> broad filters (more than ID_SET_SHARE of the owner's memories match, by one
+#               COUNT): post_filter(), an over-fetched search with only the owner check whose
+#               candidates are checked against where(); widened until k of them pass
+#
+# hsg_query filter dict keys:
+#   user_id, minSalience, startTime / endTime (created_at, ms, inclusive),
+#   sector (primary sector, str or list), tags (any of), metadata ({key: value}, equality)
+# `sectors` (which sector indexes to search) is not a row predicate and stays with hsg_query.
+
+ID_SET_SHARE = 0.1
+ID_SET_MIN = 1000 # matches below this always resolve to an id set
+
+class MemFilter:
+    def __init__(self, user_id: Optional[str] = None, min_salience: Optional[float] = None,
+                 start_time: Optional[int] = None, end_time: Optional[int] = None,
+                 sectors: Optional[List[str]] = None, tags: Optional[List[str]] = None,
+                 meta: Optional[Dict[str, Any]] = None):
+        self.user_id = user_id
+        self.min_salience = min_salience
+        self.start_time = start_time
+        self.end_time = end_time
+        self.sectors = sectors
+        self.tags = tags
+        self.meta = meta or {}
+        self._ids: Optional[Set[str]] = None
+        self._counts: Optional[Tuple[int, int]] = None
+
+    @classmethod
+    def from_dict(cls, f: Optional[Dict[str, Any]]) -> "MemFilter":
+        f = f or {}
+        sec = f.get("sector")
+        tags = f.get("tags")
+        return cls(
+            user_id=f.get("user_id"),
+            min_salience=f.get("minSalience") or f.get("min_salience") or None,
+            start_time=f.get("startTime"),
+            end_time=f.get("endTime"),
+            sectors=[sec] if isinstance(sec, str) else (list(sec) if sec else None),
+            tags=q.parse_tags([tags] if isinstance(tags, str) else list(tags)) if tags else None,
+            meta=f.get("metadata") or None,
+        )
+
+    @classmethod
+    def of(cls, f: Union["MemFilter", Dict[str, Any], None]) -> Optional["MemFilter"]:
+        # stores accept either; a plain dict is the old {"user_id": ...} form
+        if f is None or isinstance(f, MemFilter): return f
+        return cls.from_dict(f)
+
+    @property
+    def narrow(self) -> bool:
+        # anything beyond the owner check
+        return bool(self.min_salience or self.start_time is not None or self.end_time is not None
+                    or self.sectors or self.tags is not None or self.meta)
+
+    def where(self, alias: str = "m", owner: bool = True) -> Tuple[str, List[Any]]:
+        # (sql, args) for a WHERE over memories; "1=1" when nothing is set.
+        # owner=False leaves out the user_id check.
+        a = alias + "."
+        conds, args = [], []
+        if self.user_id and owner:
+            conds.append(f"{a}user_id=?")
+            args.append(self.user_id)
+        if self.min_salience:
+            conds.append(f"{a}salience>=?")
+            args.append(self.min_salience)
+        if self.start_time is not None:
+            conds.append(f"{a}created_at>=?")
+            args.append(self.start_time)
+        if self.end_time is not None:
+            conds.append(f"{a}created_at<=?")
+            args.append(self.end_time)
+        if self.sectors:
+            conds.append(f"{a}primary_sector IN ({','.join('?' * len(self.sectors))})")
+            args += self.sectors
+        if self.tags is not None:
+            # empty list (only unusable tags given) matches nothing, like the old any-of check
+            conds.append(f"{a}id IN (SELECT memory_id FROM memory_tags WHERE tag IN ({','.join('?' * len(self.tags))}))" if self.tags else "0")
+            args += self.tags
+        for k, v in self.meta.items():
+            path = "$." + json.dumps(str(k))
+            if v is None:
+                conds.append(f"json_extract({a}meta, ?) IS NULL")
+                args.append(path)
+            else:
+                # json_extract yields 1/0 for booleans and minified json for objects / arrays
+                if isinstance(v, bool): v = int(v)
+                elif isinstance(v, (dict, list)): v = json.dumps(v, separators=(",", ":"))
+                conds.append(f"json_extract({a}meta, ?)=?")
+                args += [path, v]
+        return " AND ".join(conds) or "1=1", args
+
+    def owner(self) -> "MemFilter":
+        return MemFilter(user_id=self.user_id)
+
+    def counts(self) -> Tuple[int, int]:
+        # (owner's memories, matching memories), one scan without materialising ids
+        if self._counts is None:
+            own, oargs = self.owner().where("m")
+            rest, rargs = self.where("m", owner=False)
+            r = db.fetchone(f"SELECT count(*) AS n, coalesce(sum({rest}), 0) AS c FROM memories m WHERE {own}", tuple(rargs + oargs))
+            self._counts = (r["n"], r["c"])
+        return self._counts
+
+    @property
+    def broad(self) -> bool:
+        # narrow, but matching too much of the owner's memories for an id set (see post_filter)
+        if not self.narrow: return False
+        n, c = self.counts()
+        return c > max(ID_SET_MIN, n * ID_SET_SHARE)
+
+    def ids(self) -> Optional[Set[str]]:
+        # ids of matching memories, or None when only user_id is set (stores handle that
+        # natively) or when the filter is broad (stores use post_filter)
+        if not self.narrow or self.broad: return None
+        if self._ids is None:
+            sql, args = self.where("m")
+            self._ids = {r["id"] for r in db.fetchall(f"SELECT m.id FROM memories m WHERE {sql}", tuple(args))}
+        return self._ids
+
+    def admit(self, ids: Iterable[str]) -> Set[str]:
+        # the given ids that match; for candidates that did not come through a filtered search
+        # (waypoints) and for post_filter
+        ids = list(ids)
+        if not self.user_id and not self.narrow: return set(ids)
+        if self._ids is not None: return self._ids.intersection(ids)
+        sql, args = self.where("m")
+        out = set()
+        for n in range(0, len(ids), 500):
+            chunk = ids[n:n+500]
+            out.update(r["id"] for r in db.fetchall(f"SELECT m.id FROM memories m WHERE m.id IN ({','.join('?' * len(chunk))}) AND {sql}", (*chunk, *args)))
+        return out
+
+    async def post_filter(self, search: Callable[[int, "MemFilter"], Awaitable[List[Dict[str, Any]]]], k: int) -> List[Dict[str, Any]]:
+        # broad filters: search(n, owner filter) over-fetches, the hits are checked against where()
+        async def run(n, owner): return {None: await search(n, owner)}
+        return (await self.post_filter_many(run, k))[None]
+
+    async def post_filter_many(self, search_many: Callable[[int, "MemFilter"], Awaitable[Dict[str, List[Dict[str, Any]]]]], k: int) -> Dict[str, List[Dict[str, Any]]]:
+        # post_filter for {sector: hits} searches: one admit() lookup per round for every sector
+        n, c = self.counts()
+        fetch = k + int(2 * k * n / max(c, 1))
+        owner = self.owner()
+        while True:
+            res = await search_many(fetch, owner)
+            ok = self.admit({h["id"] for hits in res.values() for h in hits})
+            out = {s: [h for h in hits if h["id"] in ok] for s, hits in res.items()}
+            # done when every sector has k hits or ran out of rows to return
+            if fetch >= n or all(len(out[s]) >= k or len(res[s]) < fetch for s in res):
+                return {s: hits[:k] for s, hits in out.items()}
+            fetch *= 2
+
@@ -1,3 +1,5 @@
 
 from .postgres import PostgresVectorStore
 from .valkey import ValkeyVectorStore
+from .hnsw import HNSWVectorStore
+from .mmap import MmapVectorStore
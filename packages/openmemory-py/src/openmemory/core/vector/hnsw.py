@@ -0,0 +1,228 @@
+from typing import List, Optional, Dict, Any
+import os
+import json
+import atexit
+import logging
+import weakref
+import numpy as np
+from collections import Counter
+from ..config import env
+from ..db import db
+from ..filters import MemFilter
+from ..vector_store import VectorStore, SQLiteVectorStore
+
+# pip install hnswlib  (or: pip install openmemory-py[hnsw])
+
+logger = logging.getLogger("vector_store.hnsw")
+
+BRUTE_AT = 256 # filtered searches matching at most this many rows skip the graph
+
+_open = weakref.WeakSet() # stores whose unsaved graph changes are flushed at exit
+
+@atexit.register
+def _flush_open():
+    for s in list(_open): s.flush()
+
+class _SectorIndex:
+    # One HNSW graph per sector. hnswlib works with int labels, so we keep the id <-> label
+    # mapping (and the owning user per label for filtered search, with a count per user) next to it.
+    def __init__(self, dim: int, cap: int = 1024):
+        import hnswlib
+        self.dim = dim
+        self.index = hnswlib.Index(space="cosine", dim=dim)
+        self.index.init_index(max_elements=cap, M=env.hnsw_m, ef_construction=env.hnsw_ef_construction, allow_replace_deleted=True)
+        self.labels: Dict[str, int] = {}
+        self.ids: Dict[int, str] = {}
+        self.users: Dict[int, Optional[str]] = {}
+        self.per_user: Counter = Counter()
+        self.next_label = 0
+
+    @classmethod
+    def load(cls, path: str) -> Optional["_SectorIndex"]:
+        import hnswlib
+        if not (os.path.exists(path + ".bin") and os.path.exists(path + ".json")): return None
+        with open(path + ".json") as f:
+            meta = json.load(f)
+        si = cls.__new__(cls)
+        si.dim = meta["dim"]
+        si.index = hnswlib.Index(space="cosine", dim=si.dim)
+        si.index.load_index(path + ".bin", allow_replace_deleted=True)
+        si.labels = meta["labels"]
+        si.ids = {l: i for i, l in si.labels.items()}
+        si.users = {int(l): u for l, u in meta["users"].items()}
+        si.per_user = Counter(si.users.values())
+        si.next_label = meta["next_label"]
+        return si
+
+    def save(self, path: str):
+        self.index.save_index(path + ".bin")
+        with open(path + ".json", "w") as f:
+            json.dump({"dim": self.dim, "next_label": self.next_label, "labels": self.labels, "users": self.users}, f)
+
+    def add(self, id: str, vec: np.ndarray, user_id: Optional[str]):
+        label = self.labels.get(id)
+        if label is None:
+            label = self.next_label
+            self.next_label += 1
+            self.labels[id] = label
+            self.ids[label] = id
+        if self.index.element_count >= self.index.get_max_elements():
+            self.index.resize_index(self.index.get_max_elements() * 2)
+        self.index.add_items(vec.reshape(1, -1), np.array([label]), num_threads=1, replace_deleted=True)
+        if label in self.users: self.per_user[self.users[label]] -= 1
+        self.users[label] = user_id
+        self.per_user[user_id] += 1
+
+    def remove(self, id: str) -> bool:
+        label = self.labels.pop(id, None)
+        if label is None: return False
+        self.ids.pop(label, None)
+        if label in self.users: self.per_user[self.users.pop(label)] -= 1
+        self.index.mark_deleted(label)
+        return True
+
+    def query(self, vec: np.ndarray, k: int, user_id: Optional[str] = None, allow: Optional[set] = None) -> Optional[List[Dict[str, Any]]]:
+        # None when the filter leaves too few rows for a graph walk; the caller searches exactly
+        if allow is not None:
+            # allow (MemFilter.ids()) already carries the user_id condition; it may name ids
+            # of other sectors, so n is an upper bound
+            n = min(len(allow), len(self.labels))
+            flt = lambda label: self.ids.get(label) in allow
+        elif user_id is not None:
+            n = self.per_user[user_id]
+            flt = lambda label: self.users.get(label) == user_id
+        else:
+            n = len(self.labels)
+            flt = None
+        k = min(k, n)
+        if k <= 0: return []
+        if flt is not None and n <= max(BRUTE_AT, 8 * k): return None
+        # the walk only collects matching nodes, about n/len of those it visits: widen ef by
+        # that share so roughly ef_search of them are seen, as in an unfiltered search
+        ef = max(env.hnsw_ef_search, k)
+        if flt is not None: ef = min(len(self.labels), int(ef * len(self.labels) / n))
+        self.index.set_ef(ef)
+        labels, dists = self.index.knn_query(vec.reshape(1, -1), k=k, num_threads=1, filter=flt)
+        return [{"id": self.ids[int(l)], "similarity": float(1.0 - d)} for l, d in zip(labels[0], dists[0])]
+
+class HNSWVectorStore(SQLiteVectorStore):
+    """
+    Approximate nearest-neighbour search over a per-sector HNSW graph.
+
+    The SQLite `vectors` table stays the source of truth (getVector/getVectorsById are inherited);
+    the graphs are persisted to `<db>.hnsw/<sector>.{bin,json}` and reconciled against the table
+    on load, so a crash between saves only costs re-inserting the missing rows.
+    Recall vs latency is tuned with OM_HNSW_EF_SEARCH (and OM_HNSW_M / OM_HNSW_EF_CONSTRUCTION at build time).
+    """
+    def __init__(self, table_name: str = "vectors", index_dir: Optional[str] = None):
+        super().__init__(table_name)
+        if index_dir is None and env.db_path and env.db_path != ":memory:":
+            index_dir = env.db_path + ".hnsw"
+        self.index_dir = index_dir
+        self._idx: Dict[str, _SectorIndex] = {}
+        self._dirty = 0
+        _open.add(self)
+
+    def _path(self, sector: str) -> Optional[str]:
+        return os.path.join(self.index_dir, sector) if self.index_dir else None
+
+    def _sector_index(self, sector: str) -> Optional[_SectorIndex]:
+        if sector in self._idx: return self._idx[sector]
+        path = self._path(sector)
+        si = None
+        if path:
+            try:
+                si = _SectorIndex.load(path)
+            except Exception as e:
+                logger.warning(f"[HNSW] Could not load {path}, rebuilding: {e}")
+        rows = db.fetchall(f"SELECT id, user_id, dim FROM {self.table} WHERE sector=?", (sector,))
+        if si is None and rows:
+            # the index dim follows the most common vector size in the sector
+            dims = {}
+            for r in rows: dims[r["dim"]] = dims.get(r["dim"], 0) + 1
+            si = _SectorIndex(max(dims, key=dims.get), cap=max(1024, len(rows)))
+        if si is None: return None
+
+        # reconcile with the table: drop stale labels, insert rows the saved graph has not seen
+        live = {r["id"]: r for r in rows if r["dim"] == si.dim}
+        stale = [i for i in si.labels if i not in live]
+        for id in stale: si.remove(id)
+        self._dirty += len(stale)
+        missing = [i for i in live if i not in si.labels]
+        for n in range(0, len(missing), 500):
+            chunk = missing[n:n+500]
+            ph = ",".join("?" * len(chunk))
+            for r in db.fetchall(f"SELECT id, user_id, v FROM {self.table} WHERE sector=? AND id IN ({ph})", (sector, *chunk)):
+                si.add(r["id"], np.frombuffer(r["v"], dtype=np.float32), r["user_id"])
+        if missing:
+            logger.info(f"[HNSW] {sector}: indexed {len(missing)} vectors")
+            self._dirty += len(missing)
+        self._idx[sector] = si
+        return si
+
+    def _touch(self):
+        self._dirty += 1
+        if self._dirty >= env.hnsw_save_every: self.flush()
+
+    def flush(self):
+        if not self._dirty or not self.index_dir: return
+        os.makedirs(self.index_dir, exist_ok=True)
+        for sector, si in self._idx.items():
+            si.save(self._path(sector))
+        self._dirty = 0
+
+    def close(self):
+        self.flush()
+        _open.discard(self)
+        super().close()
+        self._idx.clear()
+
+    def _reset(self):
+        # graphs are reconciled against the table when a sector is next loaded
+        super()._reset()
+        self._idx.clear()
+
+    def _evict(self, ids: List[str]):
+        super()._evict(ids)
+        for si in self._idx.values():
+            for i in ids:
+                if si.remove(i): self._dirty += 1
+
+    def _stored(self, id: str, sector: str, vector: List[float], user_id: Optional[str]):
+        super()._stored(id, sector, vector, user_id)
+        si = self._idx.get(sector)
+        if si is None:
+            si = self._sector_index(sector)
+            if si is None:
+                si = self._idx[sector] = _SectorIndex(len(vector))
+        if len(vector) == si.dim:
+            si.add(id, np.asarray(vector, dtype=np.float32), user_id)
+        else:
+            # decay-compressed vectors no longer fit the graph; the brute-force path still covers them
+            si.remove(id)
+        self._touch()
+
+    async def search(self, vector: List[float], sector: str, k: int, filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        si = self._sector_index(sector)
+        if si is None or len(vector) != si.dim:
+            return await super().search(vector, sector, k, filter)
+        flt = MemFilter.of(filter)
+        if flt and flt.broad:
+            return await flt.post_filter(lambda n, owner: self.search(vector, sector, n, owner), k)
+        uid = flt.user_id if flt else None
+        allow = flt.ids() if flt else None
+        if allow is not None and len(allow) <= max(BRUTE_AT, 8 * k):
+            # few matching rows: an exact pass over just those beats a filtered graph walk
+            return self._rerank(vector, sector, list(allow), k)
+        try:
+            res = si.query(np.asarray(vector, dtype=np.float32), k, uid, allow)
+        except RuntimeError:
+            # hnswlib gives up when a selective filter leaves fewer than k reachable nodes within ef
+            res = None
+        if res is not None: return res
+        if allow is not None: return self._rerank(vector, sector, list(allow), k)
+        return await super().search(vector, sector, k, flt)
+
+    async def search_many(self, queries: Dict[str, List[float]], k: int, filter: Optional[Dict[str, Any]] = None) -> Dict[str, List[Dict[str, Any]]]:
+        # no table pass to share here; skip SQLiteVectorStore's bulk matrix load
+        return await VectorStore.search_many(self, queries, k, filter)
@@ -0,0 +1,224 @@
+from typing import List, Optional, Dict, Any, Tuple
+import os
+import re
+import logging
+import numpy as np
+from ..config import env
+from ..db import db
+from ..filters import MemFilter
+from ..vector_store import VectorStore, SQLiteVectorStore
+
+logger = logging.getLogger("vector_store.mmap")
+
+FILE_PAT = re.compile(r"^(\d+)_(\d+)\.f32$")
+
+class _SegmentFile:
+    # Append-only file of fixed-stride float32 rows, read through np.memmap.
+    # slot i is row i; a slot is live while vector_slots points at it.
+    def __init__(self, path: str, dim: int):
+        self.path = path
+        self.dim = dim
+        self.rows = os.path.getsize(path) // (4 * dim) if os.path.exists(path) else 0
+        if self.rows * 4 * dim != (os.path.getsize(path) if os.path.exists(path) else 0):
+            # torn tail from an interrupted append: drop it so slots stay row-aligned
+            logger.warning(f"[MMAP] {path}: truncating partial row")
+            os.truncate(path, self.rows * 4 * dim)
+        self.mm = None
+        self.norms = np.zeros(0, dtype=np.float32)
+        self.ids: List[Optional[str]] = [None] * self.rows
+        self.live = np.zeros(max(64, self.rows), dtype=bool)
+        self.users = np.zeros(max(64, self.rows), dtype=np.int32)
+
+    def append(self, vec: np.ndarray) -> int:
+        with open(self.path, "ab") as f:
+            # always write at the slot boundary, even if an earlier append failed halfway
+            f.truncate(self.rows * 4 * self.dim)
+            f.write(vec.astype(np.float32).tobytes())
+        slot = self.rows
+        self.rows += 1
+        self.ids.append(None)
+        if self.rows > len(self.live):
+            self.live = np.concatenate([self.live, np.zeros(len(self.live), dtype=bool)])
+            self.users = np.concatenate([self.users, np.zeros(len(self.users), dtype=np.int32)])
+        return slot
+
+    def view(self) -> Tuple[np.ndarray, np.ndarray]:
+        # remap after appends; norms are only computed for rows not seen before
+        if self.mm is None or len(self.mm) != self.rows:
+            self.mm = np.memmap(self.path, dtype=np.float32, mode="r", shape=(self.rows, self.dim)) if self.rows else np.zeros((0, self.dim), dtype=np.float32)
+            done = len(self.norms)
+            if done < self.rows:
+                self.norms = np.concatenate([self.norms, np.linalg.norm(self.mm[done:], axis=1).astype(np.float32)])
+        return self.mm, self.norms
+
+class MmapVectorStore(SQLiteVectorStore):
+    """
+    Vectors mirrored into append-only `<db>.vecs/<sector>/<segment>_<dim>.f32` files, one per
+    `memories.segment`, and searched through zero-copy np.memmap views.
+    Cold start only reads the small vector_slots table; the OS page cache does the rest.
+    The SQLite `vectors` table stays the source of truth for getVector/getVectorsById.
+    """
+    def __init__(self, table_name: str = "vectors", data_dir: Optional[str] = None):
+        super().__init__(table_name)
+        if data_dir is None:
+            data_dir = (env.db_path if env.db_path and env.db_path != ":memory:" else "openmemory") + ".vecs"
+        self.data_dir = data_dir
+        self._files: Dict[str, Dict[Tuple[int, int], _SegmentFile]] = {}
+        self._where: Dict[str, Dict[str, Tuple[Tuple[int, int], int]]] = {}
+        self._codes: Dict[Any, int] = {}
+
+    def _code(self, uid: Any) -> int:
+        if uid not in self._codes: self._codes[uid] = len(self._codes) + 1
+        return self._codes[uid]
+
+    def _file(self, sector: str, segment: int, dim: int) -> _SegmentFile:
+        files = self._files[sector]
+        key = (segment, dim)
+        if key not in files:
+            d = os.path.join(self.data_dir, sector)
+            os.makedirs(d, exist_ok=True)
+            files[key] = _SegmentFile(os.path.join(d, f"{segment}_{dim}.f32"), dim)
+        return files[key]
+
+    def _check_external_writes(self):
+        dv = db.fetchone("PRAGMA data_version")[0]
+        if self._data_version is not None and dv != self._data_version:
+            self._files.clear()
+            self._where.clear()
+        self._data_version = dv
+
+    def _load(self, sector: str):
+        if sector in self._files: return
+        self._files[sector] = {}
+        self._where[sector] = {}
+        d = os.path.join(self.data_dir, sector)
+        if os.path.isdir(d):
+            for name in os.listdir(d):
+                m = FILE_PAT.match(name)
+                if m: self._file(sector, int(m.group(1)), int(m.group(2)))
+        lost = []
+        for r in db.fetchall("SELECT id, segment, dim, slot, user_id FROM vector_slots WHERE sector=?", (sector,)):
+            f = self._files[sector].get((r["segment"], r["dim"]))
+            if f is None or r["slot"] >= f.rows:
+                lost.append(r["id"]) # file lost or truncated: re-mirrored below
+                continue
+            self._mark(sector, r["id"], f, (r["segment"], r["dim"]), r["slot"], r["user_id"])
+
+        # vectors written before this backend was enabled, or whose file went missing;
+        # only their blobs are read, mapped rows never leave the table
+        sql = f"""
+            SELECT v.id, v.user_id, v.v, coalesce(m.segment, 0) as segment FROM {self.table} v
+            LEFT JOIN memories m ON m.id = v.id
+            WHERE v.sector=?"""
+        missing = db.fetchall(sql + " AND v.id NOT IN (SELECT id FROM vector_slots WHERE sector=?)", (sector, sector))
+        for n in range(0, len(lost), 500):
+            chunk = lost[n:n+500]
+            missing += db.fetchall(sql + f" AND v.id IN ({','.join('?' * len(chunk))})", (sector, *chunk))
+        for r in missing:
+            self._append(sector, r["id"], np.frombuffer(r["v"], dtype=np.float32), r["segment"], r["user_id"])
+        if missing: logger.info(f"[MMAP] {sector}: mirrored {len(missing)} vectors into segment files")
+
+    def _mark(self, sector: str, id: str, f: _SegmentFile, key: Tuple[int, int], slot: int, uid: Optional[str]):
+        f.ids[slot] = id
+        f.live[slot] = True
+        f.users[slot] = self._code(uid)
+        self._where[sector][id] = (key, slot)
+
+    def _unmark(self, sector: str, id: str):
+        loc = self._where[sector].pop(id, None)
+        if loc is None: return
+        f = self._files[sector][loc[0]]
+        f.live[loc[1]] = False
+        f.ids[loc[1]] = None
+
+    def _append(self, sector: str, id: str, vec: np.ndarray, segment: int, uid: Optional[str]):
+        f = self._file(sector, segment, len(vec))
+        slot = f.append(vec)
+        db.execute("INSERT OR REPLACE INTO vector_slots(id, sector, segment, dim, slot, user_id) VALUES (?,?,?,?,?,?)",
+                   (id, sector, segment, len(vec), slot, uid))
+        self._unmark(sector, id)
+        self._mark(sector, id, f, (segment, len(vec)), slot, uid)
+
+    def _reset(self):
+        super()._reset()
+        self._files.clear()
+        self._where.clear()
+
+    def close(self):
+        super().close()
+        self._files.clear()
+        self._where.clear()
+
+    def _evict(self, ids: List[str]):
+        super()._evict(ids)
+        for n in range(0, len(ids), 500):
+            chunk = ids[n:n+500]
+            db.execute(f"DELETE FROM vector_slots WHERE id IN ({','.join('?' * len(chunk))})", tuple(chunk))
+        for sector in self._where:
+            for i in ids: self._unmark(sector, i)
+
+    def _stored(self, id: str, sector: str, vector: List[float], user_id: Optional[str]):
+        super()._stored(id, sector, vector, user_id)
+        self._load(sector)
+        seg = db.fetchone("SELECT segment FROM memories WHERE id=?", (id,))
+        self._append(sector, id, np.asarray(vector, dtype=np.float32), seg["segment"] if seg else 0, user_id)
+        db.commit()
+
+    async def deleteVectors(self, id: str):
+        db.conn.execute(f"DELETE FROM {self.table} WHERE id=?", (id,))
+        db.commit()
+        self._evict([id])
+
+    async def search(self, vector: List[float], sector: str, k: int, filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        self._check_external_writes()
+        if sector not in self._files:
+            # loading mirrors unmapped vectors into vector_slots: a write, so wait for the connection
+            async with db.atransaction():
+                self._load(sector)
+        qv = np.asarray(vector, dtype=np.float32)
+        qn = float(np.linalg.norm(qv))
+        flt = MemFilter.of(filter)
+        if flt and flt.broad:
+            return await flt.post_filter(lambda n, owner: self.search(vector, sector, n, owner), k)
+        uid = flt.user_id if flt else None
+        code = self._codes.get(uid) if uid else None
+        if qn == 0 or (uid and code is None): return []
+        allow = flt.ids() if flt else None
+        slots = None
+        if allow is not None:
+            # pre-filter bitmap per segment file from the id -> slot map
+            slots = {}
+            where = self._where[sector]
+            for i in allow:
+                loc = where.get(i)
+                if loc: slots.setdefault(loc[0], []).append(loc[1])
+
+        sims, owners = [], []
+        for key, f in self._files[sector].items():
+            if f.dim != len(qv) or not f.rows: continue
+            if slots is not None and key not in slots: continue
+            mm, norms = f.view()
+            keep = f.live[:f.rows] if code is None else f.live[:f.rows] & (f.users[:f.rows] == code)
+            if slots is not None:
+                sel = np.zeros(f.rows, dtype=bool)
+                sel[slots[key]] = True
+                keep = keep & sel
+            idx = np.nonzero(keep)[0]
+            if not len(idx): continue
+            dots = mm[idx] @ (qv / qn) if len(idx) < f.rows // 2 else (mm @ (qv / qn))[idx]
+            nm = norms[idx]
+            sims.append(np.divide(dots, nm, out=np.zeros_like(dots), where=nm > 0))
+            owners.extend((f, i) for i in idx)
+        if not sims: return []
+
+        s = np.concatenate(sims)
+        if k < len(s):
+            part = np.argpartition(-s, k - 1)[:k]
+            order = part[np.argsort(-s[part], kind="stable")]
+        else:
+            order = np.argsort(-s, kind="stable")
+        return [{"id": owners[o][0].ids[owners[o][1]], "similarity": float(s[o])} for o in order]
+
+    async def search_many(self, queries: Dict[str, List[float]], k: int, filter: Optional[Dict[str, Any]] = None) -> Dict[str, List[Dict[str, Any]]]:
+        # no table pass to share here; skip SQLiteVectorStore's bulk matrix load
+        return await VectorStore.search_many(self, queries, k, filter)
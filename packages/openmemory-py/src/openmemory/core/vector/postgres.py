@@ -3,7 +3,9 @@
 import json
 import logging
 from ..types import MemRow
-from ..vector_store import VectorStore, VectorRow
+import numpy as np
+from ..vector_store import VectorStore, VectorRow, VectorBatch
+from ..filters import MemFilter
 
 # You should install asyncpg: pip install asyncpg
 # And ensure pgvector extension is enabled in your DB: CREATE EXTENSION vector;
@@ -67,6 +69,17 @@ async def getVectorsById(self, id: str) -> List[VectorRow]:
             res.append(VectorRow(r["id"], r["sector"], vec, r["dim"]))
         return res
 
+    async def getVectorsByIds(self, ids: List[str], dim: Optional[int] = None) -> Dict[str, VectorBatch]:
+        pool = await self._get_pool()
+        sql = f"SELECT id, sector, v::text as v_txt FROM {self.table} WHERE id = ANY($1::text[])"
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(sql, list(ids))
+        
+        by_sec = {}
+        for r in rows:
+            by_sec.setdefault(r["sector"], []).append((r["id"], np.array(json.loads(r["v_txt"]), dtype=np.float32)))
+        return {s: VectorBatch.from_rows(rs, dim) for s, rs in by_sec.items()}
+
     async def getVector(self, id: str, sector: str) -> Optional[VectorRow]:
         pool = await self._get_pool()
         sql = f"SELECT id, sector, v::text as v_txt, dim FROM {self.table} WHERE id=$1 AND sector=$2"
@@ -90,9 +103,18 @@ async def search(self, vector: List[float], sector: str, k: int, filter: Optiona
         args = [vec_str, sector]
         arg_idx = 3
 
-        if filter and filter.get("user_id"):
+        flt = MemFilter.of(filter)
+        if flt and flt.broad:
+            return await flt.post_filter(lambda n, owner: self.search(vector, sector, n, owner), k)
+        if flt and flt.user_id:
             filter_sql += f" AND user_id=${arg_idx}"
-            args.append(filter["user_id"])
+            args.append(flt.user_id)
+            arg_idx += 1
+        allow = flt.ids() if flt else None
+        if allow is not None:
+            # memories live in SQLite: the other predicates arrive as the matching ids
+            filter_sql += f" AND id = ANY(${arg_idx}::text[])"
+            args.append(list(allow))
             arg_idx += 1
         
         # <=> is cosine distance operator
@@ -108,3 +130,39 @@ async def search(self, vector: List[float], sector: str, k: int, filter: Optiona
             rows = await conn.fetch(sql, *args)
             
         return [{"id": r["id"], "similarity": float(r["similarity"])} for r in rows]
+
+    async def search_many(self, queries: Dict[str, List[float]], k: int, filter: Optional[Dict[str, Any]] = None) -> Dict[str, List[Dict[str, Any]]]:
+        # one round trip: a LIMITed ORDER BY per sector, glued with UNION ALL
+        if not queries: return {}
+        pool = await self._get_pool()
+        args = []
+        parts = []
+        uid_sql = ""
+        flt = MemFilter.of(filter)
+        if flt and flt.broad:
+            return await flt.post_filter_many(lambda n, owner: self.search_many(queries, n, owner), k)
+        if flt and flt.user_id:
+            args.append(flt.user_id)
+            uid_sql = f" AND user_id=${len(args)}"
+        allow = flt.ids() if flt else None
+        if allow is not None:
+            args.append(list(allow))
+            uid_sql += f" AND id = ANY(${len(args)}::text[])"
+        for sector, vector in queries.items():
+            args.extend([str(vector), sector])
+            vi, si = len(args) - 1, len(args)
+            parts.append(f"""
+                (SELECT id, sector, 1 - (v <=> ${vi}::vector) as similarity
+                FROM {self.table}
+                WHERE sector=${si}{uid_sql}
+                ORDER BY v <=> ${vi}::vector
+                LIMIT {int(k)})
+            """)
+        
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(" UNION ALL ".join(parts), *args)
+            
+        res = {s: [] for s in queries}
+        for r in rows:
+            res[r["sector"]].append({"id": r["id"], "similarity": float(r["similarity"])})
+        return res
@@ -0,0 +1,101 @@
+from typing import Optional
+import time
+import numpy as np
+from ..db import db
+from ..config import env
+from ...utils.vectors import VecMatrix
+
+# Scalar-int8 / binary codes for the resident search matrices.
+# Codes give a cheap first pass; callers re-rank the best candidates with the float32 vectors.
+
+MIN_TRAIN = 1024
+TRAIN_SAMPLE = 20000
+_POPCNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+class Codebook:
+    def __init__(self, scheme: str, dim: int, scale: Optional[np.ndarray] = None, n_train: int = 0):
+        if scheme not in ("int8", "binary"): raise ValueError(f"Unknown quantization scheme: {scheme}")
+        self.scheme = scheme
+        self.dim = dim
+        self.n_train = n_train
+        if scale is None and scheme == "int8":
+            # untrained: clip unit-vector components at 4 sigma of a random direction
+            scale = np.full(dim, 4.0 / (np.sqrt(dim) * 127.0), dtype=np.float32)
+        self.scale = scale
+
+    @property
+    def trained(self) -> bool:
+        return self.scheme == "binary" or self.n_train > 0
+
+    @classmethod
+    def train(cls, scheme: str, units: np.ndarray) -> "Codebook":
+        # symmetric per-dimension scale from the observed range of normalised rows
+        if scheme == "binary": return cls(scheme, units.shape[1], n_train=len(units))
+        amax = np.abs(units).max(axis=0)
+        amax[amax == 0] = 1.0
+        return cls(scheme, units.shape[1], (amax / 127.0).astype(np.float32), len(units))
+
+    def width(self) -> int:
+        return self.dim if self.scheme == "int8" else (self.dim + 7) // 8
+
+    def shortlist(self, k: int) -> int:
+        # sign bits rank much more coarsely than int8, so binary re-ranks a longer list
+        return k * max(1, env.vec_rerank) * (8 if self.scheme == "binary" else 1)
+
+    def encode(self, unit: np.ndarray) -> np.ndarray:
+        if self.scheme == "binary":
+            return np.packbits(unit > 0)
+        return np.clip(np.rint(unit / self.scale), -127, 127).astype(np.int8)
+
+    def scores(self, codes: np.ndarray, q_unit: np.ndarray, chunk: int = 16384) -> np.ndarray:
+        # approximate cosine of every code row against a normalised query
+        if self.scheme == "binary":
+            qb = np.packbits(q_unit > 0)
+            ham = np.empty(len(codes), dtype=np.int32)
+            for i in range(0, len(codes), chunk):
+                ham[i:i+chunk] = _POPCNT[codes[i:i+chunk] ^ qb].sum(axis=1, dtype=np.int32)
+            return 1.0 - 2.0 * ham / self.dim
+        qs = (q_unit * self.scale).astype(np.float32)
+        out = np.empty(len(codes), dtype=np.float32)
+        for i in range(0, len(codes), chunk):
+            out[i:i+chunk] = codes[i:i+chunk].astype(np.float32) @ qs
+        return out
+
+    def to_blob(self) -> Optional[bytes]:
+        return self.scale.astype(np.float32).tobytes() if self.scale is not None else None
+
+    @classmethod
+    def from_blob(cls, scheme: str, dim: int, blob: Optional[bytes], n_train: int) -> "Codebook":
+        scale = np.frombuffer(blob, dtype=np.float32).copy() if blob else None
+        return cls(scheme, dim, scale, n_train)
+
+def load_codebook(sector: str, dim: int, scheme: str) -> Optional[Codebook]:
+    r = db.fetchone("SELECT params, n_train FROM vector_codebooks WHERE sector=? AND dim=? AND scheme=?", (sector, dim, scheme))
+    return Codebook.from_blob(scheme, dim, r["params"], r["n_train"]) if r else None
+
+def save_codebook(sector: str, cb: Codebook):
+    # searches train codebooks too; while another task holds db.atransaction() the codebook
+    # only lives in memory and is trained (and saved) again on a later load
+    if db.busy: return
+    db.execute("INSERT OR REPLACE INTO vector_codebooks(sector, dim, scheme, params, n_train, created_at) VALUES (?,?,?,?,?,?)",
+               (sector, cb.dim, cb.scheme, cb.to_blob(), cb.n_train, int(time.time()*1000)))
+    db.commit()
+
+class QuantMatrix(VecMatrix):
+    # VecMatrix holding codes instead of float rows: 4x (int8) or 32x (binary) less resident memory
+    def __init__(self, codebook: Codebook, cap: int = 64):
+        self.codebook = codebook
+        self.dtype = np.int8 if codebook.scheme == "int8" else np.uint8
+        super().__init__(codebook.dim, cap)
+
+    def width(self) -> int:
+        return self.codebook.width()
+
+    def encode(self, unit: np.ndarray) -> np.ndarray:
+        return self.codebook.encode(unit)
+
+    def scores(self, q) -> np.ndarray:
+        qv = np.asarray(q, dtype=np.float32)
+        qn = float(np.linalg.norm(qv))
+        if qn == 0 or self.n == 0: return np.zeros(self.n, dtype=np.float32)
+        return self.codebook.scores(self.mat[:self.n], qv / qn)
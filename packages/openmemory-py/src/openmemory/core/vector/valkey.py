@@ -4,7 +4,9 @@
 import logging
 import asyncio
 import numpy as np
-from ..vector_store import VectorStore, VectorRow
+from ..config import env
+from ..vector_store import VectorStore, VectorRow, VectorBatch
+from ..filters import MemFilter
 
 # pip install redis
 
@@ -15,6 +17,7 @@ def __init__(self, url: str, prefix: str = "om:vec:"):
         self.url = url
         self.prefix = prefix
         self.client = None
+        self._codebooks = {}
 
     async def _get_client(self):
         import redis.asyncio as redis
@@ -25,6 +28,20 @@ async def _get_client(self):
     def _key(self, id: str) -> str:
         return f"{self.prefix}{id}"
 
+    async def _codebook(self, sector: str, dim: int):
+        # Codes live next to each vector, so the codebook must never change once written:
+        # the first writer persists the (untrained, unit-vector) default and everyone reuses it.
+        from .quant import Codebook
+        ck = (sector, dim)
+        if ck in self._codebooks: return self._codebooks[ck]
+        client = await self._get_client()
+        key = f"om:cb:{env.vec_quant}:{sector}:{dim}"
+        cb = Codebook(env.vec_quant, dim)
+        if not await client.setnx(key, cb.to_blob() or b""):
+            cb = Codebook.from_blob(env.vec_quant, dim, await client.get(key), 0)
+        self._codebooks[ck] = cb
+        return cb
+
     async def storeVector(self, id: str, sector: str, vector: List[float], dim: int, user_id: Optional[str] = None):
         client = await self._get_client()
         key = self._key(id)
@@ -40,6 +57,11 @@ async def storeVector(self, id: str, sector: str, vector: List[float], dim: int,
             "v": vec_bytes,
             "user_id": user_id or ""
         }
+        if env.vec_quant in ("int8", "binary"):
+            v = np.asarray(vector, dtype=np.float32)
+            n = float(np.linalg.norm(v))
+            cb = await self._codebook(sector, len(v))
+            mapping["q"] = cb.encode(v / n if n > 0 else v).tobytes()
         await client.hset(key, mapping=mapping)
 
     async def getVectorsById(self, id: str) -> List[VectorRow]:
@@ -64,6 +86,20 @@ def dec(x): return x.decode('utf-8') if isinstance(x, bytes) else str(x)
             int(dec(data.get(b'dim') or data.get('dim')))
         )]
 
+    async def getVectorsByIds(self, ids: List[str], dim: Optional[int] = None) -> Dict[str, VectorBatch]:
+        client = await self._get_client()
+        ids = list(ids)
+        pipe = client.pipeline()
+        for id in ids:
+            pipe.hmget(self._key(id), "sector", "v")
+        def dec(x): return x.decode('utf-8') if isinstance(x, bytes) else str(x)
+        
+        by_sec = {}
+        for id, (sector, v_bytes) in zip(ids, await pipe.execute()):
+            if not v_bytes: continue
+            by_sec.setdefault(dec(sector), []).append((id, np.frombuffer(v_bytes, dtype=np.float32)))
+        return {s: VectorBatch.from_rows(rs, dim) for s, rs in by_sec.items()}
+
     async def getVector(self, id: str, sector: str) -> Optional[VectorRow]:
         # KV store doesn't support query by two keys efficiently without index, 
         # but ID is the primary key here basically.
@@ -78,17 +114,30 @@ async def deleteVectors(self, id: str):
         await client.delete(self._key(id))
 
     async def search(self, vector: List[float], sector: str, k: int, filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        return (await self.search_many({sector: vector}, k, filter)).get(sector, [])
+
+    async def search_many(self, queries: Dict[str, List[float]], k: int, filter: Optional[Dict[str, Any]] = None) -> Dict[str, List[Dict[str, Any]]]:
         # Without RediSearch module, we must scan.
         # This is expensive (O(N)), but valid for small scale or fallback.
         # Ideally we use FT.SEARCH if available.
         # For this port, we implement the Scan logic for maximum compatibility (parity with sqlite impl logic)
+        # One SCAN serves every sector in `queries`.
         
         client = await self._get_client()
-        query_vec = np.array(vector, dtype=np.float32)
-        q_norm = np.linalg.norm(query_vec)
+        filter = MemFilter.of(filter)
+        if filter and filter.broad:
+            return await filter.post_filter_many(lambda n, owner: self.search_many(queries, n, owner), k)
+        if env.vec_quant in ("int8", "binary"):
+            return await self._search_quant_many(queries, k, filter)
+        uid = filter.user_id if filter else None
+        allow = filter.ids() if filter else None
+        qs = {}
+        for sector, vector in queries.items():
+            query_vec = np.array(vector, dtype=np.float32)
+            qs[sector] = (query_vec, np.linalg.norm(query_vec))
         
         cursor = 0
-        results = []
+        results = {s: [] for s in queries}
         
         # SCAN for all keys with prefix
         # optimize: maintain a set of IDs per sector?
@@ -109,25 +158,107 @@ async def search(self, vector: List[float], sector: str, k: int, filter: Optiona
                     def dec(x): return x.decode('utf-8') if isinstance(x, bytes) else str(x)
                     
                     i_sector = dec(item.get(b'sector') or item.get('sector'))
-                    if i_sector != sector: continue
+                    if i_sector not in qs: continue
                     
-                    if filter and filter.get("user_id"):
+                    if uid:
                         i_uid = dec(item.get(b'user_id') or item.get('user_id'))
-                        if i_uid != filter["user_id"]: continue
+                        if i_uid != uid: continue
+                    if allow is not None and dec(item.get(b'id') or item.get('id')) not in allow: continue
                     
+                    query_vec, q_norm = qs[i_sector]
                     v_bytes = item.get(b'v') or item.get('v')
                     v = np.frombuffer(v_bytes, dtype=np.float32)
+                    if len(v) != len(query_vec): continue
                     
                     dot = np.dot(query_vec, v)
                     norm = np.linalg.norm(v)
                     sim = dot / (q_norm * norm) if (q_norm * norm) > 0 else 0
                     
-                    results.append({
+                    results[i_sector].append({
                         "id": dec(item.get(b'id') or item.get('id')),
                         "similarity": float(sim)
                     })
             
             if cursor == 0: break
             
-        results.sort(key=lambda x: x["similarity"], reverse=True)
-        return results[:k]
+        for s, res in results.items():
+            res.sort(key=lambda x: x["similarity"], reverse=True)
+            results[s] = res[:k]
+        return results
+
+    async def _search_quant_many(self, queries: Dict[str, List[float]], k: int, filter: Optional[Dict[str, Any]] = None) -> Dict[str, List[Dict[str, Any]]]:
+        # Same single SCAN, but only the small code field crosses the wire; full vectors are
+        # fetched for each sector's shortlist and re-ranked exactly.
+        # Rows written before quantization was enabled have no code yet: they are scored
+        # exactly from `v` and their code is backfilled, so the next scan sees it.
+        client = await self._get_client()
+        qs = {}
+        for sector, vector in queries.items():
+            qv = np.array(vector, dtype=np.float32)
+            qn = float(np.linalg.norm(qv))
+            if qn > 0: qs[sector] = (qv, qn, await self._codebook(sector, len(qv)))
+        filter = MemFilter.of(filter)
+        uid = filter.user_id if filter else None
+        allow = filter.ids() if filter else None
+        def dec(x): return x.decode('utf-8') if isinstance(x, bytes) else str(x)
+
+        found = {s: ([], []) for s in qs}
+        uncoded = {s: [] for s in qs}
+        cursor = 0
+        while qs:
+            cursor, keys = await client.scan(cursor, match=f"{self.prefix}*", count=100)
+            if keys:
+                pipe = client.pipeline()
+                for key in keys:
+                    pipe.hmget(key, "sector", "user_id", "id", "q")
+                for i_sector, i_uid, i_id, i_q in await pipe.execute():
+                    if not i_sector: continue
+                    sector = dec(i_sector)
+                    if sector not in qs: continue
+                    if uid and dec(i_uid) != uid: continue
+                    if allow is not None and dec(i_id) not in allow: continue
+                    if not i_q:
+                        uncoded[sector].append(dec(i_id))
+                        continue
+                    cb = qs[sector][2]
+                    c = np.frombuffer(i_q, dtype=np.int8 if cb.scheme == "int8" else np.uint8)
+                    if len(c) != cb.width(): continue
+                    found[sector][0].append(dec(i_id))
+                    found[sector][1].append(c)
+            if cursor == 0: break
+
+        results = {s: [] for s in queries}
+        for sector, (ids, codes) in found.items():
+            qv, qn, cb = qs[sector]
+            res = []
+            if uncoded[sector]:
+                pipe = client.pipeline()
+                for i in uncoded[sector]:
+                    pipe.hget(self._key(i), "v")
+                fill = client.pipeline()
+                for i, v_bytes in zip(uncoded[sector], await pipe.execute()):
+                    if not v_bytes: continue
+                    v = np.frombuffer(v_bytes, dtype=np.float32)
+                    if len(v) != len(qv): continue
+                    norm = float(np.linalg.norm(v))
+                    res.append({"id": i, "similarity": float(np.dot(qv, v) / (qn * norm)) if norm > 0 else 0.0})
+                    fill.hset(self._key(i), "q", cb.encode(v / norm if norm > 0 else v).tobytes())
+                await fill.execute()
+            if ids:
+                approx = cb.scores(np.stack(codes), qv / qn)
+                n = min(len(ids), cb.shortlist(k))
+                short = np.argpartition(-approx, n - 1)[:n] if n < len(ids) else np.arange(len(ids))
+
+                pipe = client.pipeline()
+                for i in short:
+                    pipe.hget(self._key(ids[i]), "v")
+                for i, v_bytes in zip(short, await pipe.execute()):
+                    if not v_bytes: continue
+                    v = np.frombuffer(v_bytes, dtype=np.float32)
+                    if len(v) != len(qv): continue
+                    norm = np.linalg.norm(v)
+                    sim = float(np.dot(qv, v) / (qn * norm)) if norm > 0 else 0.0
+                    res.append({"id": ids[i], "similarity": sim})
+            res.sort(key=lambda x: x["similarity"], reverse=True)
+            results[sector] = res[:k]
+        return results
@@ -3,8 +3,13 @@
 import json
 import sqlite3
 import struct
+import weakref
+import numpy as np
 from .db import db, DB
+from .config import env
+from .filters import MemFilter
 from .types import MemRow
+from ..utils.vectors import VecMatrix
 import logging
 
 # Ported from backend/src/core/vector_store.ts (implied) and db.ts logic
@@ -18,13 +23,43 @@ def __init__(self, id: str, sector: str, vector: List[float], dim: int):
         self.vector = vector
         self.dim = dim
 
+class VectorBatch:
+    # vectors of one sector for many ids, stacked row-wise (rows follow `ids`)
+    def __init__(self, ids: List[str], mat: np.ndarray):
+        self.ids = ids
+        self.mat = mat
+
+    @classmethod
+    def from_rows(cls, rows: List[tuple], dim: Optional[int] = None) -> "VectorBatch":
+        # rows: [(id, np.ndarray)]; a sector can mix sizes (decay compresses vectors), keep one size only
+        if dim is None and rows:
+            cnt = {}
+            for _, v in rows: cnt[len(v)] = cnt.get(len(v), 0) + 1
+            dim = max(cnt, key=cnt.get)
+        keep = [(i, v) for i, v in rows if len(v) == dim]
+        mat = np.stack([v for _, v in keep]).astype(np.float32, copy=False) if keep else np.zeros((0, dim or 0), dtype=np.float32)
+        return cls([i for i, _ in keep], mat)
+
 class VectorStore(ABC):
     @abstractmethod
     async def storeVector(self, id: str, sector: str, vector: List[float], dim: int, user_id: Optional[str] = None): pass
     
+    async def storeVectors(self, rows: List[tuple]):
+        # bulk storeVector: rows are (id, sector, vector, dim, user_id)
+        for id, sector, vector, dim, user_id in rows:
+            await self.storeVector(id, sector, vector, dim, user_id)
+
     @abstractmethod
     async def getVectorsById(self, id: str) -> List[VectorRow]: pass
     
+    async def getVectorsByIds(self, ids: List[str], dim: Optional[int] = None) -> Dict[str, VectorBatch]:
+        # bulk variant of getVectorsById: {sector: VectorBatch}; rows whose size != dim are skipped
+        rows: Dict[str, list] = {}
+        for id in ids:
+            for r in await self.getVectorsById(id):
+                rows.setdefault(r.sector, []).append((r.id, np.asarray(r.vector, dtype=np.float32)))
+        return {s: VectorBatch.from_rows(r, dim) for s, r in rows.items()}
+
     @abstractmethod
     async def getVector(self, id: str, sector: str) -> Optional[VectorRow]: pass
     
@@ -32,11 +67,113 @@ async def getVector(self, id: str, sector: str) -> Optional[VectorRow]: pass
     async def deleteVectors(self, id: str): pass
     
     @abstractmethod
-    async def search(self, vector: List[float], sector: str, k: int, filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]: pass
+    async def search(self, vector: List[float], sector: str, k: int, filter: Union[MemFilter, Dict[str, Any], None] = None) -> List[Dict[str, Any]]: pass
+
+    async def search_many(self, queries: Dict[str, List[float]], k: int, filter: Optional[Dict[str, Any]] = None) -> Dict[str, List[Dict[str, Any]]]:
+        # {sector: query vector} -> {sector: hits}; backends override this to share one pass / round trip
+        filter = MemFilter.of(filter)
+        return {s: await self.search(v, s, k, filter) for s, v in queries.items()}
 
 class SQLiteVectorStore(VectorStore):
     def __init__(self, table_name: str = "vectors"):
         self.table = table_name
+        # sector -> dim -> resident matrix, loaded lazily on first search of a sector.
+        # Vectors compressed by decay have a smaller dim than fresh ones, hence the dim level.
+        self._mats: Dict[str, Dict[int, VecMatrix]] = {}
+        self._data_version = None
+        self._subs = [self._subscribe("mem_delete", "_on_delete"), self._subscribe("tx_rollback", "_reset")]
+
+    def _subscribe(self, event: str, method: str) -> tuple:
+        # the db hook only holds the store weakly (stores built in tests or for a backend switch
+        # must not live on through it) and drops itself once the store is gone
+        ref = weakref.WeakMethod(getattr(self, method))
+        def hook(*args):
+            m = ref()
+            if m is None: db.off(event, hook)
+            else: m(*args)
+        db.on(event, hook)
+        return (event, hook)
+
+    def close(self):
+        # stop listening to db events and drop the resident matrices
+        for event, hook in self._subs: db.off(event, hook)
+        self._subs = []
+        self._mats.clear()
+
+    def _on_delete(self, ids: List[str], user_ids):
+        self._evict(ids)
+
+    def _reset(self):
+        # forget every resident matrix; sectors reload from the table on their next search
+        self._mats.clear()
+
+    def _evict(self, ids: List[str]):
+        for by_dim in self._mats.values():
+            for m in by_dim.values():
+                for i in ids: m.remove(i)
+
+    def _check_external_writes(self):
+        # data_version only moves when *another* connection commits; our own writes keep the cache in sync
+        dv = db.fetchone("PRAGMA data_version")[0]
+        if self._data_version is not None and dv != self._data_version:
+            self._mats.clear()
+        self._data_version = dv
+
+    def _new_matrix(self, sector: str, dim: int, units: Optional[np.ndarray] = None, cap: int = 64) -> VecMatrix:
+        if env.vec_quant not in ("int8", "binary"):
+            return VecMatrix(dim, cap)
+        from .vector.quant import QuantMatrix, Codebook, load_codebook, save_codebook, MIN_TRAIN
+        cb = load_codebook(sector, dim, env.vec_quant)
+        if cb is None:
+            if units is not None and len(units) >= MIN_TRAIN:
+                cb = Codebook.train(env.vec_quant, units)
+                save_codebook(sector, cb)
+                logger.info(f"[VECTOR] Trained {env.vec_quant} codebook for {sector}/{dim} on {len(units)} vectors")
+            else:
+                cb = Codebook(env.vec_quant, dim)
+        return QuantMatrix(cb, cap)
+
+    def _sector(self, sector: str) -> Dict[int, VecMatrix]:
+        if sector not in self._mats: self._load_sectors([sector])
+        return self._mats[sector]
+
+    def _load_sectors(self, sectors: List[str]):
+        # one pass over the table for every sector that is not resident yet
+        todo = [s for s in sectors if s not in self._mats]
+        if not todo: return
+        groups: Dict[str, Dict[int, list]] = {s: {} for s in todo}
+        ph = ",".join("?" * len(todo))
+        for r in db.fetchall(f"SELECT id, sector, user_id, v FROM {self.table} WHERE sector IN ({ph})", tuple(todo)):
+            v = np.frombuffer(r["v"], dtype=np.float32)
+            groups[r["sector"]].setdefault(len(v), []).append((r["id"], r["user_id"], v))
+        for sector, by_len in groups.items():
+            by_dim = {}
+            for d, rows in by_len.items():
+                units = None
+                if env.vec_quant in ("int8", "binary"):
+                    from .vector.quant import TRAIN_SAMPLE
+                    units = np.stack([v for _, _, v in rows[:TRAIN_SAMPLE]])
+                    norms = np.linalg.norm(units, axis=1, keepdims=True)
+                    units = np.divide(units, norms, out=np.zeros_like(units), where=norms > 0)
+                m = by_dim[d] = self._new_matrix(sector, d, units, cap=len(rows))
+                for id, uid, v in rows: m.upsert(id, v, uid)
+            self._mats[sector] = by_dim
+
+    def _cache_put(self, id: str, sector: str, vector: List[float], user_id: Optional[str]):
+        by_dim = self._mats.get(sector)
+        if by_dim is None: return  # not loaded yet, the first search reads it from the table
+        for d, m in by_dim.items():
+            if d != len(vector): m.remove(id)
+        m = by_dim.get(len(vector))
+        if m is None:
+            m = by_dim[len(vector)] = self._new_matrix(sector, len(vector))
+        m.upsert(id, vector, user_id)
+        cb = getattr(m, "codebook", None)
+        if cb is not None and not cb.trained:
+            from .vector.quant import MIN_TRAIN
+            if len(m) >= MIN_TRAIN:
+                # enough data for a real codebook now: reload (and train) on the next search
+                self._mats.pop(sector, None)
         
     async def storeVector(self, id: str, sector: str, vector: List[float], dim: int, user_id: Optional[str] = None):
         # sqlite blob
@@ -44,6 +181,19 @@ async def storeVector(self, id: str, sector: str, vector: List[float], dim: int,
         sql = f"INSERT OR REPLACE INTO {self.table}(id, sector, user_id, v, dim) VALUES (?, ?, ?, ?, ?)"
         db.conn.execute(sql, (id, sector, user_id, blob, dim))
         db.commit()
+        self._stored(id, sector, vector, user_id)
+
+    async def storeVectors(self, rows: List[tuple]):
+        sql = f"INSERT OR REPLACE INTO {self.table}(id, sector, user_id, v, dim) VALUES (?, ?, ?, ?, ?)"
+        db.conn.executemany(sql, [(id, sector, user_id, np.asarray(vector, dtype=np.float32).tobytes(), dim)
+                                  for id, sector, vector, dim, user_id in rows])
+        db.commit()
+        for id, sector, vector, dim, user_id in rows:
+            self._stored(id, sector, vector, user_id)
+
+    def _stored(self, id: str, sector: str, vector: List[float], user_id: Optional[str]):
+        # in-process bookkeeping after a row is written; subclasses extend it for their indexes
+        self._cache_put(id, sector, vector, user_id)
         
     async def getVectorsById(self, id: str) -> List[VectorRow]:
         sql = f"SELECT * FROM {self.table} WHERE id=?"
@@ -55,6 +205,16 @@ async def getVectorsById(self, id: str) -> List[VectorRow]:
             res.append(VectorRow(r["id"], r["sector"], vec, r["dim"]))
         return res
 
+    async def getVectorsByIds(self, ids: List[str], dim: Optional[int] = None) -> Dict[str, VectorBatch]:
+        rows: Dict[str, list] = {}
+        ids = list(ids)
+        for n in range(0, len(ids), 500):
+            chunk = ids[n:n+500]
+            ph = ",".join("?" * len(chunk))
+            for r in db.fetchall(f"SELECT id, sector, v FROM {self.table} WHERE id IN ({ph})", tuple(chunk)):
+                rows.setdefault(r["sector"], []).append((r["id"], np.frombuffer(r["v"], dtype=np.float32)))
+        return {s: VectorBatch.from_rows(r, dim) for s, r in rows.items()}
+
     async def getVector(self, id: str, sector: str) -> Optional[VectorRow]:
         sql = f"SELECT * FROM {self.table} WHERE id=? AND sector=?"
         r = db.conn.execute(sql, (id, sector)).fetchone()
@@ -66,47 +226,49 @@ async def getVector(self, id: str, sector: str) -> Optional[VectorRow]:
     async def deleteVectors(self, id: str):
         db.conn.execute(f"DELETE FROM {self.table} WHERE id=?", (id,))
         db.commit()
+        self._evict([id])
         
     async def search(self, vector: List[float], sector: str, k: int, filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
-        # Brute force cosine sim for SQLite (parity with naive local impl)
-        # Optimized approaches exist (sqlite-vss) but user wants 1:1 of backend logic which might rely on PG/extension or naive loop for fallback.
-        # The backend db.ts for sqlite doesn't show vector search logic inside db.ts, it uses `vector_store`. 
-        # `PostgresVectorStore` uses pgvector. 
-        # `SQLiteVectorStore` (implied fallback in backend) likely does naive scan or user didn't implement it fully in backend?
-        # Wait, backend line 547: `new PostgresVectorStore(...)` even for SQLite?? 
-        # Line 533: "SQLite fallback uses PostgresVectorStore logic but with SQLite db ops".
-        # This implies the SQL is compatible. BUT standard SQLite lacks `<=>` operator for cosine sim.
-        # Unless they loaded an extension.
-        # Given "Python Port", I will implement a Python-side brute force or `numpy` scan for SQLite to ensure it works without extensions.
-        # This is strictly better/safer than assuming extension.
-        
-        # 1. Fetch all vectors for sector (filtered by user if needed)
-        filter_sql = ""
-        params = [sector]
-        if filter and filter.get("user_id"):
-            filter_sql += " AND user_id=?"
-            params.append(filter["user_id"])
-            
-        sql = f"SELECT id, v FROM {self.table} WHERE sector=? {filter_sql}"
-        rows = db.conn.execute(sql, tuple(params)).fetchall()
-        
-        # 2. Compute similarity
-        results = []
-        import numpy as np
-        query_vec = np.array(vector, dtype=np.float32)
-        q_norm = np.linalg.norm(query_vec)
-        
+        # Exact cosine search over a resident, pre-normalised float32 matrix per sector:
+        # one matmul + argpartition instead of unpacking every blob on each query.
+        # Rows whose dim differs from the query (decay-compressed vectors) are not comparable and are skipped.
+        # Filters are applied as a row bitmap before the top-k cut, so selective ones cannot starve it.
+        self._check_external_writes()
+        m = self._sector(sector).get(len(vector))
+        if m is None: return []
+        flt = MemFilter.of(filter)
+        if flt and flt.broad:
+            return await flt.post_filter(lambda n, owner: self.search(vector, sector, n, owner), k)
+        mask = m.mask(flt.user_id) if flt and flt.user_id else None
+        allow = flt.ids() if flt else None
+        if allow is not None:
+            am = m.mask_ids(allow)
+            mask = am if mask is None else mask & am
+        if not hasattr(m, "codebook"):
+            return [{"id": i, "similarity": s} for i, s in m.top_k(vector, k, mask)]
+        # quantized first pass, then exact re-rank of the shortlist
+        cand = [i for i, _ in m.top_k(vector, m.codebook.shortlist(k), mask)]
+        return self._rerank(vector, sector, cand, k)
+
+    async def search_many(self, queries: Dict[str, List[float]], k: int, filter: Optional[Dict[str, Any]] = None) -> Dict[str, List[Dict[str, Any]]]:
+        self._check_external_writes()
+        self._load_sectors(list(queries.keys()))
+        filter = MemFilter.of(filter) # ids() resolved once for every sector
+        return {s: await self.search(v, s, k, filter) for s, v in queries.items()}
+
+    def _rerank(self, vector: List[float], sector: str, ids: List[str], k: int) -> List[Dict[str, Any]]:
+        if not ids: return []
+        ids = list(ids)
+        rows = []
+        for n in range(0, len(ids), 500):
+            chunk = ids[n:n+500]
+            ph = ",".join("?" * len(chunk))
+            rows += db.fetchall(f"SELECT id, v FROM {self.table} WHERE sector=? AND id IN ({ph})", (sector, *chunk))
+        rm = VecMatrix(len(vector), cap=len(rows))
         for r in rows:
-            cnt = len(r["v"]) // 4
-            v = np.array(struct.unpack(f"{cnt}f", r["v"]), dtype=np.float32)
-            dot = np.dot(query_vec, v)
-            norm = np.linalg.norm(v)
-            sim = dot / (q_norm * norm) if (q_norm * norm) > 0 else 0
-            results.append({"id": r["id"], "similarity": float(sim)})
-            
-        # 3. Sort and limit
-        results.sort(key=lambda x: x["similarity"], reverse=True)
-        return results[:k]
+            v = np.frombuffer(r["v"], dtype=np.float32)
+            if len(v) == len(vector): rm.upsert(r["id"], v)
+        return [{"id": i, "similarity": s} for i, s in rm.top_k(vector, k)]
 
 
 # Global store instance factory
@@ -126,6 +288,16 @@ def get_vector_store() -> VectorStore:
         from .vector.valkey import ValkeyVectorStore
         logger.info(f"Using ValkeyVectorStore at {url}")
         return ValkeyVectorStore(url)
+
+    elif backend == "hnsw":
+        from .vector.hnsw import HNSWVectorStore
+        logger.info(f"Using HNSWVectorStore (ef_search={env.hnsw_ef_search})")
+        return HNSWVectorStore()
+
+    elif backend == "mmap":
+        from .vector.mmap import MmapVectorStore
+        logger.info("Using MmapVectorStore")
+        return MmapVectorStore()
         
     else:
         logger.info("Using SQLiteVectorStore")
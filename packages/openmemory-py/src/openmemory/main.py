@@ -2,7 +2,8 @@
 from typing import List, Dict, Optional, Any
 from .core.db import db, q
 from .memory.hsg import hsg_query, add_hsg_memory
-from .ops.ingest import ingest_document
+from .memory.reinforce import reinforce_queue
+from .ops.ingest import ingest_document, ingest_documents
 from .openai_handler import OpenAIRegistrar
 
 logger = logging.getLogger("openmemory")
@@ -29,6 +30,19 @@ async def add(self, content: str, user_id: str = None, **kwargs) -> Dict[str, An
             res["id"] = res["root_memory_id"]
         return res
 
+    async def add_many(self, items: List[Any], user_id: str = None) -> List[Dict[str, Any]]:
+        # Bulk add: items are strings or {content, user_id?, meta?, tags?}; committed once per batch.
+        uid = user_id or self.default_user
+        docs = []
+        for it in items:
+            d = {"content": it} if isinstance(it, str) else dict(it)
+            d["user_id"] = d.get("user_id") or uid
+            docs.append(d)
+        res = await ingest_documents(docs)
+        for r in res:
+            r["id"] = r["root_memory_id"]
+        return res
+
     async def search(self, query: str, user_id: str = None, limit: int = 10, **kwargs) -> List[Dict[str, Any]]:
         uid = user_id or self.default_user
         filters = kwargs.copy()
@@ -36,16 +50,19 @@ async def search(self, query: str, user_id: str = None, limit: int = 10, **kwarg
         return await hsg_query(query, limit, filters)
 
     async def get(self, memory_id: str):
+        await reinforce_queue.flush() # pending retrieval reinforcement
         return q.get_mem(memory_id)
         
     async def delete(self, memory_id: str):
         # Hard delete for now
-        q.del_mem(memory_id)
+        async with db.atransaction():
+            q.del_mem(memory_id)
         
     async def delete_all(self, user_id: str = None):
         uid = user_id or self.default_user
         if uid:
-            q.del_mem_by_user(uid)
+            async with db.atransaction():
+                q.del_mem_by_user(uid)
         
     def history(self, user_id: str = None, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
         uid = user_id or self.default_user
@@ -53,6 +70,13 @@ def history(self, user_id: str = None, limit: int = 20, offset: int = 0) -> List
         rows = q.all_mem_by_user(uid, limit, offset)
         return [dict(r) for r in rows]
 
+    def by_tags(self, tags: List[str], user_id: str = None, limit: int = 100) -> List[Dict[str, Any]]:
+        # memories carrying any of tags, newest first (indexed memory_tags lookup)
+        uid = user_id or self.default_user
+        ids = q.ids_by_tags(tags, uid, limit)
+        rows = q.get_mems(ids)
+        return [dict(rows[i]) for i in ids if i in rows]
+
     def source(self, name: str):
         """
         get a pre-configured source connector.
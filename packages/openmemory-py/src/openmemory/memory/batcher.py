@@ -0,0 +1,52 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+# Micro-batching: concurrent callers each submit one text, and within a short window
+# (or once max_items are waiting) they are sent as a single batch call. Results are
+# fanned back out to the waiting futures; a failed batch fails every caller in it.
+
+class MicroBatcher:
+    def __init__(self, fn: Callable[[List[str]], Awaitable[List[Any]]], window_ms: float = 5, max_items: int = 64):
+        self.fn = fn
+        self.window = window_ms / 1000.0
+        self.max_items = max(1, max_items)
+        self._waiting: Dict[str, List[asyncio.Future]] = {} # text -> futures (duplicates share a slot)
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set() # in-flight batches; the loop only keeps weak refs
+        self.batches = 0
+        self.items = 0
+
+    def submit(self, text: str) -> "asyncio.Future":
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._waiting.setdefault(text, []).append(fut)
+        if len(self._waiting) >= self.max_items:
+            self._fire()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._fire)
+        return fut
+
+    def _fire(self):
+        if self._timer: self._timer.cancel()
+        self._timer = None
+        batch, self._waiting = self._waiting, {}
+        if batch:
+            t = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(t)
+            t.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: Dict[str, List[asyncio.Future]]):
+        texts = list(batch)
+        self.batches += 1
+        self.items += len(texts)
+        try:
+            res = await self.fn(texts)
+            if len(res) != len(texts): raise ValueError(f"batch returned {len(res)} vectors for {len(texts)} texts")
+        except Exception as e:
+            for futs in batch.values():
+                for f in futs:
+                    if not f.done(): f.set_exception(e)
+            return
+        for t, v in zip(texts, res):
+            for f in batch[t]:
+                if not f.done(): f.set_result(v)
@@ -3,6 +3,7 @@
 import math
 import random
 import json
+import numpy as np
 from typing import List, Dict, Any, Optional
 
 from ..core.db import q, db
@@ -32,6 +33,7 @@ def __init__(self):
 active_q = 0
 last_decay = 0
 COOLDOWN = 60000
+DECAY_CHUNK = 64 # memories per decay transaction
 
 def inc_q():
     global active_q
@@ -105,11 +107,14 @@ def fingerprint_mem(m: Dict) -> Dict[str, Any]:
     return {"vector": vec, "summary": summary}
 
 def calc_recency_score(last_seen: int) -> float:
-    now = int(time.time() * 1000)
-    dt = max(0, now - last_seen)
+    return float(calc_recency_scores(np.array([last_seen], dtype=np.float64))[0])
+
+def calc_recency_scores(last_seen: np.ndarray, now: Optional[float] = None) -> np.ndarray:
+    # calc_recency_score over an array of last_seen_at (ms)
+    if now is None: now = int(time.time() * 1000)
     # Base decay using lambda_cold as baseline
-    hours = dt / 3600000.0
-    return math.exp(-0.05 * hours) # approximate decay logic
+    hours = np.maximum(0.0, now - last_seen) / 3600000.0
+    return np.exp(-0.05 * hours) # approximate decay logic
 
     
 async def apply_decay():
@@ -126,6 +131,8 @@ async def apply_decay():
         
     last_decay = now_ts
     t0 = time.time()
+    from .reinforce import reinforce_queue # circular: reinforce reads cfg from here
+    await reinforce_queue.flush() # land queued reinforcement before decaying it
     
     # get segments
     segments_rows = db.fetchall("SELECT DISTINCT segment FROM memories ORDER BY segment DESC")
@@ -153,53 +160,57 @@ async def apply_decay():
         # Since DB is sync (sqlite), concurrency is limited by I/O lock mostly.
         # But computation (compress) is CPU.
         
-        for m in batch: # simplified loop
-            dict_m = dict(m)
-            m_tier = pick_tier(dict_m, now_ts)
-            tier_counts[m_tier] += 1
+        # one commit per chunk: a failure rolls back that chunk only, and other writers
+        # get the connection between chunks instead of waiting for the whole segment
+        for n in range(0, len(batch), DECAY_CHUNK):
+            async with db.atransaction():
+                for m in batch[n:n + DECAY_CHUNK]:
+                    dict_m = dict(m)
+                    m_tier = pick_tier(dict_m, now_ts)
+                    tier_counts[m_tier] += 1
             
-            lam = cfg.lambda_hot if m_tier == "hot" else (cfg.lambda_warm if m_tier == "warm" else cfg.lambda_cold)
-            dt = max(0, (now_ts - (dict_m["last_seen_at"] or dict_m["updated_at"] or 0)) / cfg.time_unit_ms)
-            act = max(0, dict_m.get("coactivations") or dict_m.get("feedback_score") or 0)
-            sal = max(0.0, min(1.0, (dict_m["salience"] or 0.5) * (1 + math.log1p(act))))
+                    lam = cfg.lambda_hot if m_tier == "hot" else (cfg.lambda_warm if m_tier == "warm" else cfg.lambda_cold)
+                    dt = max(0, (now_ts - (dict_m["last_seen_at"] or dict_m["updated_at"] or 0)) / cfg.time_unit_ms)
+                    act = max(0, dict_m.get("coactivations") or dict_m.get("feedback_score") or 0)
+                    sal = max(0.0, min(1.0, (dict_m["salience"] or 0.5) * (1 + math.log1p(act))))
             
-            f = math.exp(-lam * (dt / (sal + 0.1)))
-            new_sal = max(0.0, min(1.0, sal * f))
-            changed = abs(new_sal - (dict_m["salience"] or 0)) > 0.001
+                    f = math.exp(-lam * (dt / (sal + 0.1)))
+                    new_sal = max(0.0, min(1.0, sal * f))
+                    changed = abs(new_sal - (dict_m["salience"] or 0)) > 0.001
             
-            # Compression
-            if f < 0.7:
-                sector = dict_m["primary_sector"] or "semantic"
-                vec_row = await store.getVector(dict_m["id"], sector)
-                if vec_row and vec_row.vector:
-                    vec = vec_row.vector
-                    if len(vec) > 0:
-                         new_vec = compress_vector(vec, f, cfg.min_vec_dim, cfg.max_vec_dim)
-                         # summary compression omitted for brevity/complexity parity (requires LLM sometimes or simple keys)
-                         # TS `compress_summary` uses `top_keywords`.
+                    # Compression
+                    if f < 0.7:
+                        sector = dict_m["primary_sector"] or "semantic"
+                        vec_row = await store.getVector(dict_m["id"], sector)
+                        if vec_row and vec_row.vector:
+                            vec = vec_row.vector
+                            if len(vec) > 0:
+                                 new_vec = compress_vector(vec, f, cfg.min_vec_dim, cfg.max_vec_dim)
+                                 # summary compression omitted for brevity/complexity parity (requires LLM sometimes or simple keys)
+                                 # TS `compress_summary` uses `top_keywords`.
                          
-                         if len(new_vec) < len(vec):
-                             await store.storeVector(dict_m["id"], sector, new_vec, len(new_vec))
-                             tot_comp += 1
-                             changed = True
+                                 if len(new_vec) < len(vec):
+                                     await store.storeVector(dict_m["id"], sector, new_vec, len(new_vec))
+                                     tot_comp += 1
+                                     changed = True
                              
-            # Fingerprinting (Cold storage)
-            if f < max(0.3, cfg.cold_threshold):
-                sector = dict_m["primary_sector"] or "semantic"
-                fp = fingerprint_mem(dict_m)
-                await store.storeVector(dict_m["id"], sector, fp["vector"], len(fp["vector"]))
-                db.conn.execute("UPDATE memories SET summary=? WHERE id=?", (fp["summary"], dict_m["id"]))
-                tot_fp += 1
-                changed = True
-
-            if changed:
-                db.conn.execute("UPDATE memories SET salience=?, updated_at=? WHERE id=?", (new_sal, int(time.time()*1000), dict_m["id"]))
-                tot_chg += 1
+                    # Fingerprinting (Cold storage)
+                    if f < max(0.3, cfg.cold_threshold):
+                        sector = dict_m["primary_sector"] or "semantic"
+                        fp = fingerprint_mem(dict_m)
+                        await store.storeVector(dict_m["id"], sector, fp["vector"], len(fp["vector"]))
+                        db.conn.execute("UPDATE memories SET summary=? WHERE id=?", (fp["summary"], dict_m["id"]))
+                        tot_fp += 1
+                        changed = True
+
+                    if changed:
+                        db.conn.execute("UPDATE memories SET salience=?, updated_at=? WHERE id=?", (new_sal, int(time.time()*1000), dict_m["id"]))
+                        tot_chg += 1
             
-            tot_proc += 1
-            await asyncio.sleep(0) # yield
+                    tot_proc += 1
+            await asyncio.sleep(0) # yield, outside the transaction
             
-    db.commit()
+    if tot_chg: db.emit("mem_write", [], None)
     dur = (time.time() - t0) * 1000
     print(f"[decay] {tot_chg}/{tot_proc} | tiers: {tier_counts} | comp={tot_comp} fp={tot_fp} | {dur:.1f}ms")
 
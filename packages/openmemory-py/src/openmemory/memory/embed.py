@@ -14,25 +14,68 @@
 from ..utils.text import canonical_tokens_from_text, synonyms_for, canonicalize_token
 from ..utils.vectors import vec_to_buf, buf_to_vec
 
-from ..ai.openai import OpenAIAdapter
-from ..ai.ollama import OllamaAdapter
-from ..ai.gemini import GeminiAdapter
-from ..ai.aws import AwsAdapter
-from ..ai.synthetic import SyntheticAdapter
+from ..ai.registry import get_adapter
+from .embed_cache import embed_cache
+from .batcher import MicroBatcher
 
 async def emb_dispatch(provider: str, t: str, s: str) -> List[float]:
-    if provider == "synthetic": 
-        return await SyntheticAdapter(env.vec_dim or 768).embed(t, model=s)
-    if provider == "openai": 
-        return await OpenAIAdapter().embed(t, model=env.openai_model)
-    if provider == "ollama":
-        return await OllamaAdapter().embed(t, model=env.ollama_embedding_model)
-    if provider == "gemini":
-        return await GeminiAdapter().embed(t, model=env.gemini_embedding_model) 
-    if provider == "aws":
-        return await AwsAdapter().embed(t, model=env.aws_embedding_model)
-        
-    return await SyntheticAdapter(env.vec_dim or 768).embed(t, model=s)
+    # per-sector embedding; remote providers (SECTOR_AGNOSTIC) go through _embed_remote instead
+    async with _provider_sem(provider):
+        return await get_adapter("synthetic").embed(t, model=s)
+
+async def emb_dispatch_batch(provider: str, texts: List[str]) -> List[List[float]]:
+    # one request for many texts; only for providers whose vectors don't depend on the sector
+    async with _provider_sem(provider):
+        if provider == "openai": 
+            return await get_adapter("openai").embed_batch(texts, model=env.openai_model)
+        if provider == "ollama":
+            return await get_adapter("ollama").embed_batch(texts, model=env.ollama_embedding_model)
+        if provider == "gemini":
+            return await get_adapter("gemini").embed_batch(texts, model=env.gemini_embedding_model) 
+        if provider == "aws":
+            return await get_adapter("aws").embed_batch(texts, model=env.aws_embedding_model)
+    raise ValueError(f"no batch embedding for provider {provider}")
+
+# synthetic embeds per sector (model=sector); remote providers embed the text once for all sectors
+SECTOR_AGNOSTIC = {"openai", "ollama", "gemini", "aws"}
+
+def _model_for(provider: str) -> str:
+    # part of the embedding cache key; defaults mirror the adapters
+    if provider == "openai": return env.openai_model or "text-embedding-3-small"
+    if provider == "ollama": return env.ollama_embedding_model or "nomic-embed-text"
+    if provider == "gemini": return env.gemini_embedding_model or "models/text-embedding-004"
+    if provider == "aws": return env.aws_embedding_model or "amazon.titan-embed-text-v2:0"
+    return f"synthetic-{env.vec_dim or 768}"
+
+# Per-provider cap on in-flight embedding calls (OM_EMBED_CONCURRENCY). asyncio primitives
+# are bound to the loop that first uses them, so they are recreated per loop.
+_sems: Dict[str, Tuple[Any, asyncio.Semaphore]] = {}
+
+def _provider_sem(provider: str) -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    cur = _sems.get(provider)
+    if cur is None or cur[0] is not loop:
+        cur = (loop, asyncio.Semaphore(max(1, env.embed_concurrency)))
+        _sems[provider] = cur
+    return cur[1]
+
+# Concurrent single-text requests to a remote provider are coalesced into one embed_batch
+# call per OM_EMBED_BATCH_WINDOW_MS / OM_EMBED_BATCH_MAX (window 0 = off). Per provider
+# (the model is fixed by config) and per event loop, like the semaphores.
+_batchers: Dict[str, Tuple[Any, MicroBatcher]] = {}
+
+def _batcher(provider: str) -> MicroBatcher:
+    loop = asyncio.get_running_loop()
+    cur = _batchers.get(provider)
+    if cur is None or cur[0] is not loop:
+        cur = (loop, MicroBatcher(lambda texts: emb_dispatch_batch(provider, texts), env.embed_batch_window_ms, env.embed_batch_max))
+        _batchers[provider] = cur
+    return cur[1]
+
+async def _embed_remote(provider: str, t: str) -> List[float]:
+    if env.embed_batch_window_ms > 0:
+        return await _batcher(provider).submit(t)
+    return (await emb_dispatch_batch(provider, [t]))[0]
 
 # Public API
 
@@ -49,7 +92,31 @@ async def embed_for_sector(t: str, s: str) -> List[float]:
     # Let's check config.py... I didn't verify `tier` in config.py.
     # I'll defaulting to synthetic to test fast.
     
-    return await emb_dispatch(env.emb_kind or "synthetic", t, s) # actually env.emb_kind defaults to synthetic in config.py
+    provider = env.emb_kind or "synthetic" # actually env.emb_kind defaults to synthetic in config.py
+    remote = provider in SECTOR_AGNOSTIC
+    # synthetic vectors are cheaper to recompute than to read/write; keep them in memory only
+    persist = None if remote else False
+    k = embed_cache.key(provider, _model_for(provider), "" if remote else s, t)
+    v = embed_cache.get(k, persist)
+    if v is not None: return v
+    v = await (_embed_remote(provider, t) if remote else emb_dispatch(provider, t, s))
+    return embed_cache.put(k, v, persist)
+
+async def embed_for_sectors(t: str, secs: List[str]) -> Dict[str, List[float]]:
+    # same text for several sectors: concurrent per-sector calls, or a single request when
+    # the provider ignores the sector
+    for s in secs:
+        if s not in SECTOR_CONFIGS: raise Exception(f"Unknown sector: {s}")
+    if not secs: return {}
+    provider = env.emb_kind or "synthetic"
+    if provider in SECTOR_AGNOSTIC:
+        k = embed_cache.key(provider, _model_for(provider), "", t)
+        v = embed_cache.get(k)
+        if v is None:
+            v = embed_cache.put(k, await _embed_remote(provider, t))
+        return {s: v for s in secs}
+    vecs = await asyncio.gather(*(embed_for_sector(t, s) for s in secs))
+    return dict(zip(secs, vecs))
 
 async def embed_multi_sector(id: str, txt: str, secs: List[str], chunks: Optional[List[dict]] = None) -> List[Dict[str, Any]]:
     # log pending
@@ -57,9 +124,9 @@ async def embed_multi_sector(id: str, txt: str, secs: List[str], chunks: Optiona
     
     res = []
     try:
+        vecs = await embed_for_sectors(txt, secs)
         for s in secs:
-            # simple loop, parralelism omitted for brevity but should use asyncio.gather
-            v = await embed_for_sector(txt, s)
+            v = vecs[s]
             res.append({"sector": s, "vector": v, "dim": len(v)})
             
         q.upd_log(id=id, status="completed", err=None)
@@ -0,0 +1,72 @@
+import time
+import hashlib
+import numpy as np
+from typing import List, Optional, Tuple
+
+from ..core.db import db
+from ..core.config import env
+from ..utils.cache import LRUCache
+
+# Content-hash embedding cache: (provider, model, sector, sha256(text)) -> vector.
+# Tier 1 is an in-process LRU, tier 2 the embed_cache table, so identical text
+# (recurring queries, regeneration, restore) never goes back to the provider.
+# Sector-agnostic providers are keyed with sector "" and share one entry across sectors.
+# Entries are float32 (what the vector stores keep anyway); put() returns the rounded
+# vector so a miss and a later hit hand back identical values.
+# The table is capped at max_rows: once it overshoots by 10%, the oldest rows go.
+# Rows put while another task holds db.atransaction() wait in memory for the next put
+# outside it, so they are not rolled back with somebody else's unit of work.
+
+Key = Tuple[str, str, str, str]
+
+class EmbedCache:
+    def __init__(self, max_items: int = 4096, persist: bool = True, max_rows: int = 0):
+        self.lru = LRUCache(max_items)
+        self.persist = persist
+        self.max_rows = max_rows # 0 = unbounded
+        self._rows: Optional[int] = None # approximate table size, recounted on trim
+        self._pending: List[tuple] = [] # rows not written yet (db busy)
+
+    @staticmethod
+    def key(provider: str, model: str, sector: str, text: str) -> Key:
+        return (provider, model or "", sector or "", hashlib.sha256(text.encode("utf-8")).hexdigest())
+
+    def get(self, k: Key, persist: Optional[bool] = None) -> Optional[List[float]]:
+        v = self.lru.get(k)
+        if v is not None: return v.tolist()
+        if not (self.persist if persist is None else persist): return None
+        r = db.fetchone("SELECT v FROM embed_cache WHERE provider=? AND model=? AND sector=? AND hash=?", k)
+        if not r: return None
+        v = np.frombuffer(r["v"], dtype=np.float32).copy()
+        self.lru.put(k, v, v.nbytes)
+        return v.tolist()
+
+    def put(self, k: Key, vec: List[float], persist: Optional[bool] = None) -> List[float]:
+        v = np.asarray(vec, dtype=np.float32)
+        self.lru.put(k, v, v.nbytes)
+        if self.persist if persist is None else persist:
+            self._pending.append((*k, len(v), v.tobytes(), int(time.time()*1000)))
+            if not db.busy: self._write()
+        return v.tolist()
+
+    def _write(self):
+        rows, self._pending = self._pending, []
+        db.conn.executemany("INSERT OR REPLACE INTO embed_cache(provider,model,sector,hash,dim,v,created_at) VALUES (?,?,?,?,?,?,?)", rows)
+        for _ in rows: self._trim()
+        db.commit()
+
+    def _trim(self):
+        if not self.max_rows: return
+        if self._rows is None: self._rows = db.fetchone("SELECT count(*) AS c FROM embed_cache")["c"]
+        else: self._rows += 1 # replacements overcount, which only brings the recount forward
+        if self._rows <= self.max_rows * 1.1: return
+        self._rows = db.fetchone("SELECT count(*) AS c FROM embed_cache")["c"]
+        over = self._rows - self.max_rows
+        if over > 0:
+            db.execute("DELETE FROM embed_cache WHERE rowid IN (SELECT rowid FROM embed_cache ORDER BY created_at LIMIT ?)", (over,))
+            self._rows = self.max_rows
+
+    def stats(self):
+        return self.lru.stats()
+
+embed_cache = EmbedCache(env.embed_cache_items, env.embed_cache_persist, env.embed_cache_rows)
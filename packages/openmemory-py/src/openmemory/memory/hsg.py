@@ -6,19 +6,23 @@
 import random
 import numpy as np
 import uuid
+from collections import deque
 from typing import List, Dict, Any, Optional, Set, Tuple
 
 from ..core.db import q, db, transaction
 from ..core.config import env
-from ..core.constants import SECTOR_CONFIGS
+from ..core.constants import SECTOR_CONFIGS, HYBRID_PARAMS
 from ..core.vector_store import vector_store as store
+from ..core.filters import MemFilter
 from ..utils.text import canonical_token_set, canonical_tokens_from_text
 from ..utils.chunking import chunk_text
 from ..utils.keyword import keyword_filter_memories, compute_keyword_overlap
-from ..utils.vectors import buf_to_vec, vec_to_buf, cos_sim
-from .embed import embed_multi_sector, embed_for_sector, embed_multi_sector, calc_mean_vec 
+from ..utils.vectors import buf_to_vec, vec_to_buf, cos_sim, VecMatrix
+from ..utils.cache import LRUCache
+from ..utils.features import QueryFeatures
+from .embed import embed_multi_sector, embed_for_sector, embed_for_sectors, calc_mean_vec 
 # embed_multi_sector returns list of results, calc_mean_vec takes them.
-from .decay import inc_q, dec_q, on_query_hit, calc_recency_score as calc_recency_score_decay, pick_tier # wait, calc_recency_score is in hsg.ts in backend?
+from .decay import inc_q, dec_q, on_query_hit, calc_recency_score as calc_recency_score_decay, calc_recency_scores, pick_tier # wait, calc_recency_score is in hsg.ts in backend?
 # In backend/src/memory/hsg.ts line 275: export function calc_recency_score.
 # I should put it here.
 from ..ops.dynamics import (
@@ -28,6 +32,8 @@
     propagateAssociativeReinforcementToLinkedNodes
 )
 from .user_summary import update_user_summary
+from .reinforce import reinforce_queue
+from .waypoint_graph import waypoint_graph
 
 # Shared Constants (mirrored from hsg.ts)
 SCORING_WEIGHTS = {
@@ -38,18 +44,6 @@
     "tag_match": 0.20,
 }
 
-HYBRID_PARAMS = {
-    "tau": 3.0,
-    "beta": 2.0,
-    "eta": 0.1,
-    "gamma": 0.2,
-    "alpha_reinforce": 0.08,
-    "t_days": 7.0,
-    "t_max_days": 60.0,
-    "tau_hours": 1.0,
-    "epsilon": 1e-8,
-}
-
 REINFORCEMENT = {
     "salience_boost": 0.1,
     "waypoint_boost": 0.05,
@@ -58,6 +52,9 @@
     "prune_threshold": 0.05,
 }
 
+# add_hsg_memory: simhash within Hamming 3 but not equal also needs this token-set overlap
+NEAR_DUP_JACCARD = 0.8
+
 SECTOR_RELATIONSHIPS = {
     "semantic": {"procedural": 0.8, "episodic": 0.6, "reflective": 0.7, "emotional": 0.4},
     "procedural": {"semantic": 0.8, "episodic": 0.6, "reflective": 0.6, "emotional": 0.3},
@@ -68,13 +65,7 @@
 
 async def embed_query_for_all_sectors(query: str, sectors: List[str]) -> Dict[str, List[float]]:
     # port of embedQueryForAllSectors
-    # simplistic: sequential loop if batch not supported by embed implementation
-    res = {}
-    # embed.py's embed_dispatch handles batching if simple mode? 
-    # For now loop. 1:1 logic from embed.ts shows optimizations but I need to call `embed_for_sector`.
-    for s in sectors:
-        res[s] = await embed_for_sector(query, s)
-    return res
+    return await embed_for_sectors(query, sectors)
 
 def has_temporal_markers(text: str) -> bool:
     pats = [
@@ -86,22 +77,24 @@ def has_temporal_markers(text: str) -> bool:
     ]
     return any(re.search(p, text, re.I) for p in pats)
 
-async def compute_tag_match_score(mid: str, q_toks: Set[str]) -> float:
-    mem = q.get_mem(mid)
-    if not mem or not mem["tags"]: return 0.0
-    try:
-        tags = json.loads(mem["tags"])
-        if not isinstance(tags, list): return 0.0
+async def compute_tag_match_scores(mids: List[str], q_toks: Set[str], tags_by_id: Optional[Dict[str, List[str]]] = None) -> Dict[str, float]:
+    # tags of all candidates in one memory_tags lookup (or tags_by_id, from q.get_tags); each
+    # distinct tag is compared with the query tokens once (exact token +2, substring either way +1 per token)
+    per_tag: Dict[str, int] = {}
+    out = {}
+    if tags_by_id is None: tags_by_id = q.get_tags(mids)
+    for mid, tags in tags_by_id.items():
         matches = 0
-        for tag in tags:
-            tl = str(tag).lower()
-            if tl in q_toks: matches += 2
-            else:
-                for tok in q_toks:
-                    if tl in tok or tok in tl: matches += 1
-        return min(1.0, matches / max(1, len(tags) * 2))
-    except:
-        return 0.0
+        for tl in tags:
+            m = per_tag.get(tl)
+            if m is None:
+                m = per_tag[tl] = 2 if tl in q_toks else sum(1 for tok in q_toks if tl in tok or tok in tl)
+            matches += m
+        out[mid] = min(1.0, matches / max(1, len(tags) * 2))
+    return out
+
+async def compute_tag_match_score(mid: str, q_toks: Set[str], mem=None) -> float:
+    return (await compute_tag_match_scores([mid], q_toks)).get(mid, 0.0)
 
 def compress_vec_for_storage(vec: List[float], target_dim: int) -> List[float]:
     if len(vec) <= target_dim: return vec
@@ -175,71 +168,25 @@ def boosted_sim(s: float) -> float:
     return 1 - math.exp(-HYBRID_PARAMS["tau"] * s)
 
 def compute_simhash(text: str) -> str:
+    # Port of the TS simhash: 32-bit JS string hash per token, majority vote per bit.
+    # The TS loop runs i over 0..63 with `1 << i`, which wraps at 32 in JS, so bit i and
+    # bit i+32 vote on the same hash bit: the 64-bit result is the 32-bit one twice.
+    # Rendered as 16 hex digits, vec[0] being the most significant bit.
     tokens = canonical_token_set(text)
-    hashes = []
+    if not tokens: return "0" * 16
+    hs = []
     for t in tokens:
         h = 0
-        for c in t:
-            h = (h << 5) - h + ord(c)
-            h = h & 0xffffffff # enforce 32-bit semantics
-        # JS uses `h & h` which is no-op or cast to int32. `h | 0` is simpler.
-        # Python ints are arbitrary precision. I need to simulate 32-bit signed int?
-        # JS `(h<<5)-h+char` can overflow.
-        # Strict porting:
-        # let h = 0; h = (h<<5)-h+code | 0.
-        # Python:
-        h = 0
-        for c in t: 
-             # (h<<5) - h + ord(c)
-             val = (h << 5) - h + ord(c)
-             # Convert to signed 32-bit
-             val = val & 0xffffffff
-             if val & 0x80000000: val = -((val ^ 0xffffffff) + 1)
-             h = val
-        hashes.append(h)
-        
-    vec = [0] * 64
-    for h in hashes:
-        for i in range(64):
-            # check the ith bit of h? 
-            # JS line 298: `if (h & (1 << i))`.
-            # Note JS bitwise ops operate on 32 bits. i goes 0..63.
-            # 1<<32 is 1 in JS? No, 1<<32 is 1<<0.
-            # So `1 << i` wraps every 32 bits.
-            # So for i >= 32, it tests `h & (1 << (i%32))`. 
-            # BUT: TS loop `for (let i = 0; i < 64; i++)`. 
-            # Wait, `h` is 32-bit int. Why loop 64 times?
-            # JS reference `if (h & (1 << i)) vec[i]++`.
-            # If `i` >= 32, `1 << i` in JS is `1 << (i % 32)`.
-            # So it tests the same 32 bits TWICE?
-            # That essentially dups the hash to 64 dims? 
-            # Yes, standard SimHash usually uses 64-bit hash. 
-            # But the TS implementation uses 32-bit `h` and loops 64 times.
-            # This means `vec[0]` and `vec[32]` track the same bit (bit 0).
-            # I must replicate this "quirk".
-            bit = 1 << (i % 32)
-            if h & bit: vec[i] += 1
-            else: vec[i] -= 1
-            
-    res_hash = ""
-    for i in range(0, 64, 4):
-        nibble = 0
-        if vec[i] > 0: nibble += 8
-        if vec[i+1] > 0: nibble += 4
-        if vec[i+2] > 0: nibble += 2
-        if vec[i+3] > 0: nibble += 1
-        res_hash += format(nibble, 'x')
-    return res_hash
+        for c in t: h = (h * 31 + ord(c)) & 0xffffffff # (h<<5)-h+c | 0, bits only
+        hs.append(h)
+    ones = ((np.array(hs, dtype=np.uint64)[:, None] >> np.arange(32, dtype=np.uint64)) & np.uint64(1)).sum(axis=0)
+    x = 0
+    for i in range(32):
+        if 2 * int(ones[i]) > len(hs): x |= 1 << (31 - i)
+    return format((x << 32) | x, "016x")
 
 def hamming_dist(h1: str, h2: str) -> int:
-    dist = 0
-    for i in range(len(h1)):
-        x = int(h1[i], 16) ^ int(h2[i], 16)
-        if x & 8: dist += 1
-        if x & 4: dist += 1
-        if x & 2: dist += 1
-        if x & 1: dist += 1
-    return dist
+    return bin(int(h1, 16) ^ int(h2, 16)).count("1")
 
 def sigmoid(x: float) -> float:
     return 1.0 / (1.0 + math.exp(-x))
@@ -301,113 +248,211 @@ def compute_hybrid_score(sim: float, tok_ov: float, wp_wt: float, rec_sc: float,
            kw_score)
     return sigmoid(raw)
 
+# Columnar forms of the above, one array slot per candidate (hsg_query scores all candidates at once)
+
+def calc_decay_many(secs: List[str], init_sal: np.ndarray, days_since: np.ndarray) -> np.ndarray:
+    lam = np.array([SECTOR_CONFIGS[s]["decay_lambda"] if s in SECTOR_CONFIGS else np.nan for s in secs], dtype=np.float64)
+    known = ~np.isnan(lam)
+    lam = np.where(known, lam, 0.0)
+    decayed = init_sal * np.exp(-lam * days_since)
+    reinf = HYBRID_PARAMS["alpha_reinforce"] * (1 - np.exp(-lam * days_since))
+    # unknown sectors keep their salience untouched, like calc_decay
+    return np.where(known, np.clip(decayed + reinf, 0.0, 1.0), init_sal)
+
+def compute_hybrid_scores(sim: np.ndarray, tok_ov: np.ndarray, wp_wt: np.ndarray, rec_sc: np.ndarray, kw_score: np.ndarray, tag_match: np.ndarray) -> np.ndarray:
+    s_p = 1 - np.exp(-HYBRID_PARAMS["tau"] * sim)
+    raw = (SCORING_WEIGHTS["similarity"] * s_p +
+           SCORING_WEIGHTS["overlap"] * tok_ov +
+           SCORING_WEIGHTS["waypoint"] * wp_wt +
+           SCORING_WEIGHTS["recency"] * rec_sc +
+           SCORING_WEIGHTS["tag_match"] * tag_match +
+           kw_score)
+    return 1.0 / (1.0 + np.exp(-raw))
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    # best k by score, ties keep input order (same as a stable sort over all candidates)
+    n = len(scores)
+    if n == 0 or k <= 0: return np.zeros(0, dtype=np.intp)
+    if k < n:
+        part = np.argpartition(-scores, k - 1)[:k]
+        # pull in everything tied with the k-th score so the tie-break below stays stable
+        part = np.flatnonzero(scores >= scores[part].min())
+    else:
+        part = np.arange(n)
+    order = part[np.lexsort((part, -scores[part]))]
+    return order[:k]
+
+class MeanVecIndex:
+    # Resident matrix of memory mean vectors (one VecMatrix per dim, rows labelled by
+    # user) so waypoint linking on insert is one matmul instead of decoding 1000 blobs.
+    # Loaded on first use, kept in sync by add_hsg_memory and the mem_delete hook, and
+    # dropped when another connection writes (PRAGMA data_version).
+    def __init__(self):
+        self._mats: Optional[Dict[int, VecMatrix]] = None
+        self._dv = None
+        db.on("mem_delete", lambda ids, uids: self.remove(ids))
+        db.on("tx_rollback", self.reset)
+
+    def _load(self) -> Dict[int, VecMatrix]:
+        dv = db.fetchone("PRAGMA data_version")[0]
+        if self._dv is not None and dv != self._dv: self._mats = None
+        self._dv = dv
+        if self._mats is None:
+            mats: Dict[int, VecMatrix] = {}
+            for r in db.fetchall("SELECT id, user_id, mean_vec FROM memories WHERE mean_vec IS NOT NULL"):
+                v = np.frombuffer(r["mean_vec"], dtype=np.float32)
+                if len(v) == 0: continue
+                mats.setdefault(len(v), VecMatrix(len(v))).upsert(r["id"], v, r["user_id"])
+            self._mats = mats
+        return self._mats
+
+    def reset(self):
+        self._mats = None
+
+    def add(self, mid: str, vec: List[float], user_id: Optional[str]):
+        if self._mats is None: return # picked up by the first load
+        for d, m in self._mats.items():
+            if d != len(vec): m.remove(mid)
+        self._mats.setdefault(len(vec), VecMatrix(len(vec))).upsert(mid, vec, user_id)
+
+    def remove(self, ids: List[str]):
+        if self._mats is None: return
+        for m in self._mats.values():
+            for i in ids: m.remove(i)
+
+    def nearest(self, vec: List[float], user_id: Optional[str], k: int, exclude: str) -> List[Tuple[str, float]]:
+        m = self._load().get(len(vec))
+        if m is None: return []
+        mask = m.mask(user_id) if user_id else None
+        return [(i, s) for i, s in m.top_k(vec, k + 1, mask) if i != exclude][:k]
+
+mean_index = MeanVecIndex()
+
 async def create_single_waypoint(new_id: str, new_mean: List[float], ts: int, user_id: str = "anonymous"):
-    mems = q.all_mem_by_user(user_id, 1000, 0) if user_id else q.all_mem(1000, 0)
-    best = None
-    best_sim = -1.0
-    
-    import numpy as np
-    nm = np.array(new_mean, dtype=np.float32)
-    
-    for mem in mems:
-        if mem["id"] == new_id or not mem["mean_vec"]: continue
-        ex_mean = np.array(buf_to_vec(mem["mean_vec"]), dtype=np.float32)
-        sim = cos_sim(nm, ex_mean)
-        if sim > best_sim:
-            best_sim = sim
-            best = mem["id"]
+    # link to the env.waypoint_links (default 1) most similar memories of the same user
+    best = mean_index.nearest(new_mean, user_id, max(1, env.waypoint_links), new_id)
+    best = [(i, sim) for i, sim in best if sim > -1.0]
             
-    if best:
-        # q.ins_waypoint values(?,?,?,?,?,?)
-        # src_id, dst_id, user_id, weight, created, updated
-        db.execute("INSERT OR REPLACE INTO waypoints(src_id,dst_id,user_id,weight,created_at,updated_at) VALUES (?,?,?,?,?,?)", (new_id, best, user_id, float(best_sim), ts, ts))
-    else:
-        db.execute("INSERT OR REPLACE INTO waypoints(src_id,dst_id,user_id,weight,created_at,updated_at) VALUES (?,?,?,?,?,?)", (new_id, new_id, user_id, 1.0, ts, ts))
+    # q.ins_waypoint values(?,?,?,?,?,?)
+    # src_id, dst_id, user_id, weight, created, updated
+    edges = [(new_id, i, user_id, float(sim)) for i, sim in best] or [(new_id, new_id, user_id, 1.0)]
+    db.conn.executemany("INSERT OR REPLACE INTO waypoints(src_id,dst_id,user_id,weight,created_at,updated_at) VALUES (?,?,?,?,?,?)",
+                        [e + (ts, ts) for e in edges])
     db.commit()
+    waypoint_graph.add_edges(edges)
 
-async def calc_multi_vec_fusion_score(mid: str, qe: Dict[str, List[float]], w: Dict[str, float]) -> float:
-    vecs = await store.getVectorsById(mid)
-    s = 0.0
-    tot = 0.0
-    
-    wm = {
+def _sector_weights(w: Dict[str, float]) -> Dict[str, float]:
+    return {
          "semantic": w.get("semantic_dimension_weight", 0),
          "emotional": w.get("emotional_dimension_weight", 0),
          "procedural": w.get("procedural_dimension_weight", 0),
          "episodic": w.get("temporal_dimension_weight", 0),
          "reflective": w.get("reflective_dimension_weight", 0),
     }
-    
-    for v in vecs:
-        qv = qe.get(v.sector)
-        if not qv: continue
-        sim = cos_sim(v.vector, qv)
-        wgt = wm.get(v.sector, 0.5)
-        s += sim * wgt
-        tot += wgt
-        
-    return s / tot if tot > 0 else 0.0
 
-async def add_hsg_memory(content: str, tags: Optional[str] = None, metadata: Any = None, user_id: Optional[str] = None) -> Dict[str, Any]:
-    simhash = compute_simhash(content)
-    existing = db.fetchone("SELECT * FROM memories WHERE simhash=? ORDER BY salience DESC LIMIT 1", (simhash,))
+async def calc_multi_vec_fusion_scores(mids: List[str], qe: Dict[str, List[float]], w: Dict[str, float]) -> Dict[str, float]:
+    # weighted mean over sectors of cos(memory sector vector, query sector vector), for all candidates at once
+    mids = list(mids)
+    if not mids: return {}
+    pos = {m: i for i, m in enumerate(mids)}
+    s = np.zeros(len(mids), dtype=np.float64)
+    tot = np.zeros(len(mids), dtype=np.float64)
+    wm = _sector_weights(w)
     
-    if existing and hamming_dist(simhash, existing["simhash"]) <= 3:
-        now = int(time.time()*1000)
-        boost = min(1.0, (existing["salience"] or 0) + 0.15)
-        db.execute("UPDATE memories SET last_seen_at=?, salience=?, updated_at=? WHERE id=?", (now, boost, now, existing["id"]))
-        db.commit()
-        return {
-            "id": existing["id"],
-            "primary_sector": existing["primary_sector"],
-            "sectors": [existing["primary_sector"]],
-            "deduplicated": True
-        }
+    batches = await store.getVectorsByIds(mids)
+    for sec, batch in batches.items():
+        qv = qe.get(sec)
+        if not qv or not batch.ids: continue
+        qa = np.asarray(qv, dtype=np.float32)
+        if batch.mat.shape[1] != len(qa): continue
+        qn = float(np.linalg.norm(qa))
+        vn = np.linalg.norm(batch.mat, axis=1)
+        d = vn * qn
+        sims = np.divide(batch.mat @ qa, d, out=np.zeros(len(d), dtype=np.float32), where=d > 0)
+        idx = np.fromiter((pos[i] for i in batch.ids), dtype=np.intp, count=len(batch.ids))
+        wgt = wm.get(sec, 0.5)
+        np.add.at(s, idx, sims * wgt)
+        np.add.at(tot, idx, wgt)
         
-    mid = str(uuid.uuid4())
+    out = np.divide(s, tot, out=np.zeros_like(s), where=tot > 0)
+    return {m: float(out[i]) for i, m in enumerate(mids)}
+
+async def calc_multi_vec_fusion_score(mid: str, qe: Dict[str, List[float]], w: Dict[str, float]) -> float:
+    return (await calc_multi_vec_fusion_scores([mid], qe, w)).get(mid, 0.0)
+
+def _pick_near_dup(content: str, simhash: str, cands) -> Optional[Any]:
+    # most salient candidate within Hamming 3 of simhash. Short texts have coarse simhashes
+    # (few voting tokens), so inexact matches must also share most tokens.
+    toks = None
+    near = []
+    for m in cands:
+        if m["simhash"] != simhash:
+            if hamming_dist(simhash, m["simhash"]) > 3: continue
+            if toks is None: toks = canonical_token_set(content)
+            mt = canonical_token_set(m["content"])
+            if len(toks & mt) < NEAR_DUP_JACCARD * len(toks | mt): continue
+        near.append(m)
+    return max(near, key=lambda m: m["salience"] or 0) if near else None
+
+def _boost_near_dup(content: str, simhash: str) -> Optional[Dict[str, Any]]:
+    # near-duplicates via the simhash band index: re-adding one boosts it instead of inserting
+    existing = _pick_near_dup(content, simhash, q.near_simhash(simhash))
+    if not existing: return None
     now = int(time.time()*1000)
-    
-    # Ensure user
-    if user_id:
-        u = db.fetchone("SELECT * FROM users WHERE user_id=?", (user_id,))
-        if not u:
-            db.execute("INSERT OR IGNORE INTO users(user_id,summary,reflection_count,created_at,updated_at) VALUES (?,?,?,?,?)",
-                       (user_id, "User profile initializing...", 0, now, now))
-            db.commit()
-            
+    boost = min(1.0, (existing["salience"] or 0) + 0.15)
+    db.execute("UPDATE memories SET last_seen_at=?, salience=?, updated_at=? WHERE id=?", (now, boost, now, existing["id"]))
+    db.commit()
+    db.emit("mem_write", [existing["id"]], {existing["user_id"]})
+    return {
+        "id": existing["id"],
+        "primary_sector": existing["primary_sector"],
+        "sectors": [existing["primary_sector"]],
+        "deduplicated": True
+    }
+
+async def embed_hsg_memory(content: str, metadata: Any = None) -> Dict[str, Any]:
+    # first half of add_hsg_memory: classification and embeddings, no writes.
+    # Provider calls happen here, so callers can do them before opening a transaction.
+    mid = str(uuid.uuid4())
     chunks = chunk_text(content)
-    use_chunks = len(chunks) > 1
     cls = classify_content(content, metadata)
     all_secs = [cls["primary"]] + cls["additional"]
+    emb_res = await embed_multi_sector(mid, content, all_secs, chunks if len(chunks) > 1 else None)
+    return {"id": mid, "content": content, "simhash": compute_simhash(content), "chunks": len(chunks),
+            "cls": cls, "sectors": all_secs, "emb_res": emb_res, "mean_vec": calc_mean_vec(emb_res, all_secs)}
+
+async def store_hsg_memory(prep: Dict[str, Any], tags: Optional[str] = None, metadata: Any = None, user_id: Optional[str] = None) -> Dict[str, Any]:
+    # second half: the writes for an embed_hsg_memory result, as one unit of work (a savepoint
+    # when the caller already holds db.atransaction()). Near-duplicates are checked again,
+    # they may have been written since (e.g. an earlier section of the same document).
+    content, mid, cls, all_secs = prep["content"], prep["id"], prep["cls"], prep["sectors"]
+    mean_vec = prep["mean_vec"]
+    stored = extract_essence(content, cls["primary"], env.summary_max_length)
+    sec_cfg = SECTOR_CONFIGS[cls["primary"]]
+    init_sal = max(0.0, min(1.0, 0.4 + 0.1 * len(cls["additional"])))
     
-    # Start TX
-    # using db.conn directly for simplicity
-    try:
-        # db.execute("BEGIN")
-        # Segments logic
-        max_seg_res = db.fetchone("SELECT coalesce(max(segment), 0) as max_seg FROM memories")
-        # ... (rest of logic unchanged, just unindented or comments?)
-        # Actually I must keep Python indentation.
-        # I just comment out the execute calls.
+    # one unit of work: user, row, vectors, waypoints and summary land (or roll back) together
+    async with db.atransaction():
+        dup = _boost_near_dup(content, prep["simhash"])
+        if dup: return dup
+        now = int(time.time()*1000)
         
-        max_seg_res = db.fetchone("SELECT coalesce(max(segment), 0) as max_seg FROM memories")
-        cur_seg = max_seg_res["max_seg"]
-        cnt_res = db.fetchone("SELECT count(*) as c FROM memories WHERE segment=?", (cur_seg,))
-        if cnt_res["c"] >= env.seg_size:
-            cur_seg += 1
-            print(f"[HSG] Rotated to segment {cur_seg}")
+        # Ensure user
+        if user_id:
+            u = db.fetchone("SELECT * FROM users WHERE user_id=?", (user_id,))
+            if not u:
+                db.execute("INSERT OR IGNORE INTO users(user_id,summary,reflection_count,created_at,updated_at) VALUES (?,?,?,?,?)",
+                           (user_id, "User profile initializing...", 0, now, now))
+                
+        cur_seg = q.alloc_segments(1)[0]
             
-        stored = extract_essence(content, cls["primary"], env.summary_max_length)
-        sec_cfg = SECTOR_CONFIGS[cls["primary"]]
-        init_sal = max(0.0, min(1.0, 0.4 + 0.1 * len(cls["additional"])))
-        
         # Insert Mem
         q.ins_mem(
             id=mid,
             user_id=user_id or "anonymous",
             segment=cur_seg,
             content=stored,
-            simhash=simhash,
+            simhash=prep["simhash"],
             primary_sector=cls["primary"],
             tags=tags,
             meta=json.dumps(metadata or {}),
@@ -417,89 +462,205 @@ async def add_hsg_memory(content: str, tags: Optional[str] = None, metadata: Any
             salience=init_sal,
             decay_lambda=sec_cfg["decay_lambda"],
             version=1,
-            mean_dim=None,
-            mean_vec=None,
-            compressed_vec=None,
+            mean_dim=len(mean_vec),
+            mean_vec=vec_to_buf(mean_vec),
+            compressed_vec=vec_to_buf(compress_vec_for_storage(mean_vec, 128)) if len(mean_vec) > 128 else None,
             feedback_score=0
         )
         
-        # Embed
-        emb_res = await embed_multi_sector(mid, content, all_secs, chunks if use_chunks else None)
-        for r in emb_res:
+        for r in prep["emb_res"]:
              await store.storeVector(mid, r["sector"], r["vector"], r["dim"], user_id or "anonymous")
-             
-        mean_vec = calc_mean_vec(emb_res, all_secs)
-        mean_buf = vec_to_buf(mean_vec)
-        db.execute("UPDATE memories SET mean_dim=?, mean_vec=? WHERE id=?", (len(mean_vec), mean_buf, mid))
-        
-        if len(mean_vec) > 128:
-            comp = compress_vec_for_storage(mean_vec, 128)
-            db.execute("UPDATE memories SET compressed_vec=? WHERE id=?", (vec_to_buf(comp), mid))
+        mean_index.add(mid, mean_vec, user_id or "anonymous")
             
         await create_single_waypoint(mid, mean_vec, now, user_id)
         
         # Trigger summary update if user exists
         if user_id:
-            # fire and forget or await? For package, await to ensure consistency during test.
-            # circular import risk?
-            # hsg imports user_summary? No.
-            # user_summary imports db.
-            # I need to import update_user_summary inside function or at top if no circle.
-            # hsg imports: db, config, constants, vector_store, text, chunking, keyword, vectors, embed, decay, dynamics.
-            # user_summary imports: db, config.
-            # Safe to import at top.
             await update_user_summary(user_id)
         
-        # db.execute("COMMIT")
-        return {
-            "id": mid,
-            "content": content,
+    db.emit("mem_write", [mid], {user_id or "anonymous"})
+    return {
+        "id": mid,
+        "content": content,
+        "primary_sector": cls["primary"],
+        "sectors": all_secs,
+        "chunks": prep["chunks"],
+        "salience": init_sal
+    }
+
+async def add_hsg_memory(content: str, tags: Optional[str] = None, metadata: Any = None, user_id: Optional[str] = None) -> Dict[str, Any]:
+    # a re-added near-duplicate is only boosted, without embedding it
+    async with db.atransaction():
+        dup = _boost_near_dup(content, compute_simhash(content))
+    if dup: return dup
+    # embed before the transaction, which should not hold the connection across provider calls
+    prep = await embed_hsg_memory(content, metadata)
+    return await store_hsg_memory(prep, tags, metadata, user_id)
+
+async def add_hsg_memories(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Bulk add_hsg_memory. items: [{content, tags?, metadata?, user_id?}], results in the same order.
+    # Dedup, classification and embedding run over the whole batch first; the writes (users,
+    # memories, vectors, embed logs, waypoints, user summaries) then go out as executemany calls
+    # inside one transaction, i.e. one commit per batch instead of ~10 per memory.
+    now = int(time.time()*1000)
+    out: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    rows: List[Dict[str, Any]] = [] # new memories
+    plan: List[tuple] = [] # (result index, row, sectors, chunk count, content)
+    bands: Dict[tuple, List[Dict[str, Any]]] = {} # simhash band -> rows of this batch
+    boosted: Dict[str, Dict[str, Any]] = {} # existing id -> {salience, user_id}
+    
+    for n, it in enumerate(items):
+        content = it["content"]
+        simhash = compute_simhash(content)
+        v = int(simhash, 16)
+        keys = [(b, (v >> (16 * b)) & 0xffff) for b in range(q.SIMHASH_BANDS)]
+        
+        # duplicates of a row earlier in this batch fold into it, like a re-add would
+        local = _pick_near_dup(content, simhash, list({id(r): r for k in keys for r in bands.get(k, [])}.values()))
+        if local is not None:
+            local["salience"] = min(1.0, local["salience"] + 0.15)
+            out[n] = {"id": local["id"], "primary_sector": local["primary_sector"], "sectors": [local["primary_sector"]], "deduplicated": True}
+            continue
+        existing = _pick_near_dup(content, simhash, [boosted.get(m["id"], m) for m in q.near_simhash(simhash)])
+        if existing is not None:
+            b = boosted.setdefault(existing["id"], dict(existing))
+            b["salience"] = min(1.0, (b["salience"] or 0) + 0.15)
+            out[n] = {"id": b["id"], "primary_sector": b["primary_sector"], "sectors": [b["primary_sector"]], "deduplicated": True}
+            continue
+            
+        metadata = it.get("metadata")
+        cls = classify_content(content, metadata)
+        sec_cfg = SECTOR_CONFIGS[cls["primary"]]
+        row = {
+            "id": str(uuid.uuid4()),
+            "user_id": it.get("user_id") or "anonymous",
+            "content": extract_essence(content, cls["primary"], env.summary_max_length),
+            "simhash": simhash,
             "primary_sector": cls["primary"],
-            "sectors": all_secs,
-            "chunks": len(chunks),
-            "salience": init_sal
+            "tags": it.get("tags"),
+            "meta": json.dumps(metadata or {}),
+            "created_at": now, "updated_at": now, "last_seen_at": now,
+            "salience": max(0.0, min(1.0, 0.4 + 0.1 * len(cls["additional"]))),
+            "decay_lambda": sec_cfg["decay_lambda"],
+            "version": 1,
+            "feedback_score": 0,
         }
-    except Exception as e:
-        # db.execute("ROLLBACK")
-        raise e
+        rows.append(row)
+        plan.append((n, row, [cls["primary"]] + cls["additional"], len(chunk_text(content)), content))
+        for k in keys: bands.setdefault(k, []).append(row)
+        
+    # embeddings: concurrent per memory; remote providers coalesce these into batch requests
+    embs = await asyncio.gather(*(embed_for_sectors(content, secs) for _, _, secs, _, content in plan))
+    
+    vecs = []
+    for (n, row, secs, _, _), emb in zip(plan, embs):
+        emb_res = [{"sector": s, "vector": emb[s], "dim": len(emb[s])} for s in secs]
+        vecs += [(row["id"], r["sector"], r["vector"], r["dim"], row["user_id"]) for r in emb_res]
+        mean_vec = calc_mean_vec(emb_res, secs)
+        row["mean"] = mean_vec
+        row["mean_dim"], row["mean_vec"] = len(mean_vec), vec_to_buf(mean_vec)
+        if len(mean_vec) > 128:
+            row["compressed_vec"] = vec_to_buf(compress_vec_for_storage(mean_vec, 128))
+            
+    ids = [r["id"] for r in rows]
+    users = {r["user_id"] for r in rows} | {b["user_id"] for b in boosted.values()}
+    mean_index._load() # before the batch rows exist, so each memory links to what came before it
+    async with db.atransaction():
+        for row, seg in zip(rows, q.alloc_segments(len(rows))): row["segment"] = seg
+        db.conn.executemany("INSERT OR IGNORE INTO users(user_id,summary,reflection_count,created_at,updated_at) VALUES (?,?,?,?,?)",
+                            [(u, "User profile initializing...", 0, now, now) for u in {it.get("user_id") for it in items} if u])
+        q.ins_mems(rows)
+        q.ins_logs([(i, "multi-sector", "completed", now, None) for i in ids])
+        await store.storeVectors(vecs)
+        db.conn.executemany("UPDATE memories SET last_seen_at=?, salience=?, updated_at=? WHERE id=?",
+                            [(now, b["salience"], now, i) for i, b in boosted.items()])
+        
+        # waypoints in insertion order, as if added one by one
+        wps = []
+        for row in rows:
+            best = [(i, sim) for i, sim in mean_index.nearest(row["mean"], row["user_id"], max(1, env.waypoint_links), row["id"]) if sim > -1.0]
+            wps += [(row["id"], i, row["user_id"], float(sim), now, now) for i, sim in best] or [(row["id"], row["id"], row["user_id"], 1.0, now, now)]
+            mean_index.add(row["id"], row["mean"], row["user_id"])
+        db.conn.executemany("INSERT OR REPLACE INTO waypoints(src_id,dst_id,user_id,weight,created_at,updated_at) VALUES (?,?,?,?,?,?)", wps)
+        waypoint_graph.add_edges([w[:4] for w in wps])
+        
+        for u in {it.get("user_id") for it in items if it.get("user_id")}:
+            await update_user_summary(u)
+        
+    db.emit("mem_write", ids + list(boosted), users)
+    for n, row, secs, nchunks, content in plan:
+        out[n] = {
+            "id": row["id"],
+            "content": content,
+            "primary_sector": row["primary_sector"],
+            "sectors": secs,
+            "chunks": nchunks,
+            "salience": row["salience"]
+        }
+    return out
 
 # Cache for query
-cache = {}
-TTL = 60000
+TTL = env.query_cache_ttl_ms
+cache = LRUCache(env.query_cache_items, int(env.query_cache_mb * 1024 * 1024), TTL)
+
+# Write generations: part of every cache key, so a write makes that user's (and
+# unscoped) cached results unreachable; they then age out of the LRU.
+_gen: Dict[Optional[str], int] = {}
+_epoch = 0
+
+def bump_cache_gen(user_ids: Optional[Set[str]] = None):
+    global _epoch
+    if user_ids is None:
+        _epoch += 1 # unknown owner -> every key
+        return
+    for u in user_ids:
+        _gen[u] = _gen.get(u, 0) + 1
+    _gen[None] = _gen.get(None, 0) + 1 # queries without a user filter see everyone's rows
+
+db.on("mem_write", lambda ids, uids: bump_cache_gen(uids))
+db.on("mem_delete", lambda ids, uids: bump_cache_gen(uids or None))
+db.on("tx_rollback", bump_cache_gen)
+
+def _result_size(r: List[Dict[str, Any]]) -> int:
+    return sum(256 + len(x["content"]) for x in r)
 
 async def expand_via_waypoints(ids: List[str], max_exp: int = 10):
+    # BFS from the hits, one level at a time: each level's adjacency comes from the
+    # in-memory waypoint graph in one call. Same visiting order as a node-by-node FIFO.
     exp = []
     vis = set(ids)
-    q_arr = [{"id": i, "weight": 1.0, "path": [i]} for i in ids]
+    dq = deque({"id": i, "weight": 1.0, "path": [i]} for i in ids)
     cnt = 0
     
-    while q_arr and cnt < max_exp:
-        cur = q_arr.pop(0)
-        # neighbors: dst_id, weight
-        neighs = db.fetchall("SELECT dst_id, weight FROM waypoints WHERE src_id=? ORDER BY weight DESC", (cur["id"],))
-        for n in neighs:
-            dst = n["dst_id"]
-            if dst in vis: continue
-            wt = min(1.0, max(0.0, float(n["weight"])))
-            exp_wt = cur["weight"] * wt * 0.8
-            if exp_wt < 0.1: continue
-            
-            item = {"id": dst, "weight": exp_wt, "path": cur["path"] + [dst]}
-            exp.append(item)
-            vis.add(dst)
-            q_arr.append(item)
-            cnt += 1
+    while dq and cnt < max_exp:
+        level = list(dq)
+        dq.clear()
+        adj = waypoint_graph.neighbors_many([c["id"] for c in level])
+        for cur in level:
+            if cnt >= max_exp: break
+            for dst, w in adj[cur["id"]]:
+                if dst in vis: continue
+                wt = min(1.0, max(0.0, float(w)))
+                exp_wt = cur["weight"] * wt * 0.8
+                if exp_wt < 0.1: continue
+                
+                item = {"id": dst, "weight": exp_wt, "path": cur["path"] + [dst]}
+                exp.append(item)
+                vis.add(dst)
+                dq.append(item)
+                cnt += 1
     return exp
 
 async def hsg_query(qt: str, k: int = 10, f: Dict[str, Any] = None) -> List[Dict[str, Any]]:
-    # f: {sectors, minSalience, user_id, startTime, endTime}
+    # f: {sectors, minSalience, user_id, startTime, endTime, sector, tags, metadata}
+    # everything but `sectors` is a row filter (core.filters.MemFilter), pushed into the searches
     start_q = time.time()
     inc_q()
     try:
-        cache_key = f"{qt}:{k}:{json.dumps(f)}"
-        if cache_key in cache:
-            entry = cache[cache_key]
-            if time.time()*1000 - entry["t"] < TTL: return entry["r"]
+        uid = f.get("user_id") if f else None
+        cache_key = f"{qt}:{k}:{json.dumps(f)}:{_epoch}:{_gen.get(uid, 0)}"
+        hit = cache.get(cache_key)
+        if hit is not None: return hit
             
         qc = classify_content(qt)
         qtk = canonical_token_set(qt)
@@ -518,12 +679,9 @@ async def hsg_query(qt: str, k: int = 10, f: Dict[str, Any] = None) -> List[Dict
             "reflective_dimension_weight": 1.1 if qc["primary"] == "reflective" else 0.5,
         }
         
-        # Search vectors
-        sr = {}
-        for s in ss:
-            qv = qe[s] # list[float]
-            res = await store.search(qv, s, k*3, {"user_id": f.get("user_id")})
-            sr[s] = res
+        # Search vectors (all sectors in one pass / round trip)
+        flt = MemFilter.from_dict(f)
+        sr = await store.search_many({s: qe[s] for s in ss}, k*3, flt)
             
         all_sims = []
         ids = set()
@@ -542,30 +700,37 @@ async def hsg_query(qt: str, k: int = 10, f: Dict[str, Any] = None) -> List[Dict
             exp = await expand_via_waypoints(list(ids), k*2)
             for e in exp: ids.add(e["id"])
             
-        res_list = []
+        # lexical candidates (FTS5 bm25): exact terms and rare identifiers the embeddings miss
+        for mid, _ in q.fts_search(qt, k*3, flt=flt): ids.add(mid)
+            
         kw_scores = {}
-        for mid in ids:
-            mem = q.get_mem(mid)
-            if mem:
-                overlap = compute_keyword_overlap(qt, mem["content"])
-                kw_scores[mid] = overlap * 0.15 # 15% boost for keyword overlap
+        mems = {i: reinforce_queue.view(r) for i, r in q.get_mems(ids).items()}
+        # token/keyword sets were hashed at insert time: overlaps are integer intersections
+        qf = QueryFeatures(qtk, qt)
+        feats = q.get_features(mems)
+        mem_tags = q.get_tags(mems)
+        tag_sc = await compute_tag_match_scores(list(mems), qtk, mem_tags)
+        for mid in mems:
+            kw_scores[mid] = qf.keyword_overlap(feats[mid][1]) * 0.15 # 15% boost for keyword overlap
         
+        mvf_all = await calc_multi_vec_fusion_scores(list(ids), qe, w)
+        best = {}
+        for s, rlist in sr.items():
+            for r in rlist:
+                if r["similarity"] > best.get(r["id"], float("-inf")): best[r["id"]] = r["similarity"]
+        exp_by_id = {}
+        for e in exp: exp_by_id.setdefault(e["id"], e)
+        
+        # gather one column per signal, then score all candidates at once
+        cand, adj, tok_ov, ww, kw, tag, pen = [], [], [], [], [], [], []
+        ok = flt.admit(mems) # waypoint-expanded candidates bypass the filtered searches
         for mid in ids:
-            m = q.get_mem(mid)
-            if not m: continue
-            if f and f.get("minSalience") and m["salience"] < f["minSalience"]: continue
-            if f and f.get("user_id") and m["user_id"] != f["user_id"]: continue
-            # ... time filters
+            m = mems.get(mid)
+            if not m or mid not in ok: continue
             
-            mvf = await calc_multi_vec_fusion_score(mid, qe, w)
-            csr = await calculateCrossSectorResonanceScore(m["primary_sector"], qc["primary"], mvf)
+            csr = await calculateCrossSectorResonanceScore(m["primary_sector"], qc["primary"], mvf_all.get(mid, 0.0))
+            best_sim = max(csr, best.get(mid, csr)) # cross-sector resonance vs best direct hit
             
-            best_sim = csr # start with cross-sector resonance
-            # find max sim in sr
-            for s, rlist in sr.items():
-                 for r in rlist:
-                     if r["id"] == mid and r["similarity"] > best_sim: best_sim = r["similarity"]
-                     
             # penalty
             mem_sec = m["primary_sector"]
             q_sec = qc["primary"]
@@ -573,28 +738,32 @@ async def hsg_query(qt: str, k: int = 10, f: Dict[str, Any] = None) -> List[Dict
             if mem_sec != q_sec:
                 penalty = SECTOR_RELATIONSHIPS.get(q_sec, {}).get(mem_sec, 0.3)
                 
-            adj = best_sim * penalty
-            
-            em = next((e for e in exp if e["id"] == mid), None)
-            ww = min(1.0, max(0.0, em["weight"] if em else 0.0))
-            
-            days = (time.time()*1000 - m["last_seen_at"]) / 86400000.0
-            sal = calc_decay(m["primary_sector"], m["salience"], days)
-            mtk = canonical_token_set(m["content"])
-            tok_ov = compute_token_overlap(qtk, mtk)
-            rec_sc = calc_recency_score_decay(m["last_seen_at"])
-            tag_Match = await compute_tag_match_score(mid, qtk)
-            
-            fs = compute_hybrid_score(adj, tok_ov, ww, rec_sc, kw_scores.get(mid, 0), tag_Match)
+            em = exp_by_id.get(mid)
+            cand.append(m)
+            adj.append(best_sim * penalty)
+            pen.append(penalty)
+            ww.append(min(1.0, max(0.0, em["weight"] if em else 0.0)))
+            tok_ov.append(qf.token_overlap(feats[mid][0]))
+            kw.append(kw_scores.get(mid, 0))
+            tag.append(tag_sc.get(mid, 0.0))
             
+        now = time.time()*1000
+        last_seen = np.array([m["last_seen_at"] for m in cand], dtype=np.float64)
+        sal = calc_decay_many([m["primary_sector"] for m in cand], np.array([m["salience"] for m in cand], dtype=np.float64), (now - last_seen) / 86400000.0)
+        rec_sc = calc_recency_scores(last_seen, now)
+        fs = compute_hybrid_scores(np.array(adj), np.array(tok_ov), np.array(ww), rec_sc, np.array(kw), np.array(tag))
+        
+        top = []
+        for i in top_k_indices(fs, k):
+            m = cand[i]
+            em = exp_by_id.get(m["id"])
             item = {
-                "id": mid,
+                "id": m["id"],
                 "content": m["content"],
-                "score": fs,
+                "score": float(fs[i]),
                 "primary_sector": m["primary_sector"],
-                "path": em["path"] if em else [mid],
-                "salience": sal,
-                "salience": sal,
+                "path": em["path"] if em else [m["id"]],
+                "salience": float(sal[i]),
                 "last_seen_at": m["last_seen_at"],
                 "tags": json.loads(m["tags"] or "[]"),
                 "metadata": json.loads(m["meta"] or "{}")
@@ -602,55 +771,25 @@ async def hsg_query(qt: str, k: int = 10, f: Dict[str, Any] = None) -> List[Dict
             
             if f and f.get("debug"):
                 item["_debug"] = {
-                    "sim_adj": adj,
-                    "tok_ov": tok_ov,
-                    "recency": rec_sc,
-                    "waypoint": ww,
-                    "tag": tag_Match,
-                    "penalty": penalty
+                    "sim_adj": adj[i],
+                    "tok_ov": tok_ov[i],
+                    "recency": float(rec_sc[i]),
+                    "waypoint": ww[i],
+                    "tag": tag[i],
+                    "penalty": pen[i]
                 }
             
-            res_list.append(item)
-            
-        res_list.sort(key=lambda x: x["score"], reverse=True)
-        top = res_list[:k]
+            top.append(item)
         
-        # Reinforce (decay logic)
+        # Reinforce (decay logic): queued, written behind by memory.reinforce
+        now = int(time.time()*1000)
         for r in top:
-             # Retrieval Trace Reinforcement
-             rsal = await applyRetrievalTraceReinforcementToMemory(r["id"], r["salience"])
-             now = int(time.time()*1000)
-             db.execute("UPDATE memories SET salience=?, last_seen_at=? WHERE id=?", (rsal, now, r["id"]))
-             
-             # Propagate to Linked Nodes
-             if len(r["path"]) > 1:
-                 # reinforce waypoints (simplified version of reinforce_waypoints)
-                 # TS line 937 called `reinforce_waypoints`.
-                 # For MVP I'll skip waypoint weight boost and focus on node salience propagation
-                 # TS line 944 calls `propagateAssociativeReinforcementToLinkedNodes`
-                 
-                 # need links: {target_id, weight}
-                 # simplistic fetch from waypoints table for this source? 
-                 # TS fetches `q.get_waypoints_by_src.all(r.id)`.
-                 # I'll enable this logic.
-                 wps_rows = db.fetchall("SELECT dst_id, weight FROM waypoints WHERE src_id=?", (r["id"],))
-                 wps = [{"target_id": row["dst_id"], "weight": row["weight"]} for row in wps_rows]
-                 
-                 pru = await propagateAssociativeReinforcementToLinkedNodes(r["id"], rsal, wps)
-                 for u in pru:
-                     # Update connected memory salience
-                     # TS lines 949-970: decay factor + boost
-                     linked_mem = q.get_mem(u["node_id"])
-                     if linked_mem:
-                         time_diff = (now - linked_mem["last_seen_at"]) / 86400000.0
-                         decay_fact = math.exp(-0.02 * time_diff)
-                         ctx_boost = HYBRID_PARAMS["gamma"] * (rsal - (linked_mem["salience"] or 0)) * decay_fact
-                         new_sal = max(0.0, min(1.0, (linked_mem["salience"] or 0) + ctx_boost))
-                         db.execute("UPDATE memories SET salience=?, last_seen_at=? WHERE id=?", (new_sal, now, u["node_id"]))
-                         
-             await on_query_hit(r["id"], r["primary_sector"], lambda t: embed_for_sector(t, r["primary_sector"]))
+            # Retrieval Trace Reinforcement, then propagation to linked nodes (TS hsg.ts ~937-970) and on_query_hit
+            rsal = await applyRetrievalTraceReinforcementToMemory(r["id"], r["salience"])
+            reinforce_queue.push_hit(r["id"], rsal, now, linked=len(r["path"]) > 1, sector=r["primary_sector"],
+                                     reembed_fn=lambda t, sec=r["primary_sector"]: embed_for_sector(t, sec))
              
-        cache[cache_key] = {"r": top, "t": time.time()*1000}
+        cache.put(cache_key, top, _result_size(top))
         return top
         
     finally:
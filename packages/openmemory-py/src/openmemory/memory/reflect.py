@@ -122,23 +122,25 @@ def summ(c: Dict) -> str:
     return f"{n} {sec} pattern: {txt[:200]}"
 
 async def mark_consolidated(ids: List[str]):
-    for i in ids:
-        m = q.get_mem(i)
-        if m:
-            meta = json.loads(m["meta"] or "{}")
-            meta["consolidated"] = True
-            db.execute("UPDATE memories SET meta=? WHERE id=?", (json.dumps(meta), i))
-    db.commit()
+    async with db.atransaction():
+        for i in ids:
+            m = q.get_mem(i)
+            if m:
+                meta = json.loads(m["meta"] or "{}")
+                meta["consolidated"] = True
+                db.execute("UPDATE memories SET meta=? WHERE id=?", (json.dumps(meta), i))
+    db.emit("mem_write", ids, None)
 
 async def boost(ids: List[str]):
     now = int(time.time() * 1000)
-    for i in ids:
-        m = q.get_mem(i)
-        if m:
-            # Touch updated_at, boost salience
-            new_sal = min(1.0, (m["salience"] or 0) * 1.1)
-            db.execute("UPDATE memories SET salience=?, last_seen_at=? WHERE id=?", (new_sal, now, i))
-    db.commit()
+    async with db.atransaction():
+        for i in ids:
+            m = q.get_mem(i)
+            if m:
+                # Touch updated_at, boost salience
+                new_sal = min(1.0, (m["salience"] or 0) * 1.1)
+                db.execute("UPDATE memories SET salience=?, last_seen_at=? WHERE id=?", (new_sal, now, i))
+    db.emit("mem_write", ids, None)
 
 async def run_reflection() -> Dict[str, Any]:
     print("[REFLECT] Starting reflection job...")
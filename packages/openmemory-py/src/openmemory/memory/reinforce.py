@@ -0,0 +1,141 @@
+import asyncio
+import atexit
+import math
+import itertools
+from typing import List, Dict, Any, Optional
+
+from ..core.db import q, db
+from ..core.config import env
+from ..core.constants import HYBRID_PARAMS
+from ..core.vector_store import vector_store as store
+from .decay import cfg
+
+# Write-behind queue for retrieval reinforcement.
+# hsg_query used to UPDATE each hit, each linked node and again in on_query_hit
+# before returning. Now it only records what happened; a background task replays
+# the events per memory id (same order, same formulas) and writes every touched row
+# once, in one transaction.
+#
+# Events, applied to (salience, last_seen_at) in sequence order:
+#   ("set", sal, ts)          retrieval trace reinforcement of a hit
+#   ("link", rsal, ts)        fan out as ("prop", rsal, ts) to the waypoint targets of the hit
+#   ("prop", rsal, ts)        associative boost from a reinforced neighbour
+#   ("hit", ts)               on_query_hit salience boost
+# Until flushed, hsg_query overlays pending set/hit events on the rows it reads;
+# propagated boosts only become visible once written.
+
+GAMMA = HYBRID_PARAMS["gamma"]
+
+class ReinforceQueue:
+    def __init__(self, flush_ms: int = 100):
+        self.flush_ms = flush_ms
+        self._pending: Dict[str, List[tuple]] = {} # mid -> [(seq, op...)]
+        self._regen: Dict[str, tuple] = {} # mid -> (sector, reembed_fn)
+        self._seq = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop = None
+
+    def __len__(self):
+        return len(self._pending) + len(self._regen)
+
+    def push_hit(self, mid: str, rsal: float, ts: int, linked: bool = False, sector: Optional[str] = None, reembed_fn=None):
+        # one retrieved result: trace reinforcement, neighbour propagation, on_query_hit
+        ops = self._pending.setdefault(mid, [])
+        ops.append((next(self._seq), "set", rsal, ts))
+        if linked: ops.append((next(self._seq), "link", rsal, ts))
+        if cfg.reinforce_on_query: ops.append((next(self._seq), "hit", ts))
+        if cfg.regeneration_enabled and reembed_fn and sector:
+            self._regen[mid] = (sector, reembed_fn)
+        self._schedule()
+
+    def view(self, row):
+        # row with pending set/hit events applied (for reads that race the flush)
+        ops = self._pending.get(row["id"]) if row is not None else None
+        if not ops: return row
+        d = dict(row)
+        d["salience"], d["last_seen_at"] = _replay(d["salience"], d["last_seen_at"], ops)
+        return d
+
+    def _schedule(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return # no loop (sync caller): flushed by the next flush() / at exit
+        if self._task and not self._task.done() and self._loop is loop: return
+        self._loop = loop
+        self._lock = asyncio.Lock()
+        self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        while self._pending or self._regen:
+            await asyncio.sleep(self.flush_ms / 1000.0)
+            await self.flush()
+
+    async def flush(self):
+        if not self._pending and not self._regen: return
+        lock = self._lock or asyncio.Lock()
+        async with lock:
+            async with db.atransaction(): # waits for another task's unit of work instead of joining it
+                self.flush_sync()
+            regen, self._regen = self._regen, {}
+            for mid, (sector, fn) in regen.items():
+                await _regenerate(mid, sector, fn)
+
+    def flush_sync(self):
+        pending, self._pending = self._pending, {}
+        if not pending: return
+
+        # expand neighbour propagation into per-target events, keeping the sequence slot
+        src = [m for m, ops in pending.items() if any(o[1] == "link" for o in ops)]
+        if src:
+            wps = {}
+            for n in range(0, len(src), 500):
+                chunk = src[n:n+500]
+                ph = ",".join("?" * len(chunk))
+                for r in db.fetchall(f"SELECT src_id, dst_id FROM waypoints WHERE src_id IN ({ph})", tuple(chunk)):
+                    wps.setdefault(r["src_id"], []).append(r["dst_id"])
+            for m in src:
+                for seq, kind, *args in [o for o in pending[m] if o[1] == "link"]:
+                    for dst in wps.get(m, []):
+                        pending.setdefault(dst, []).append((seq, "prop", *args))
+
+        rows = q.get_mems(pending.keys())
+        ups = []
+        for mid, ops in pending.items():
+            r = rows.get(mid)
+            if not r: continue
+            sal, ls = _replay(r["salience"], r["last_seen_at"], ops)
+            if (sal, ls) != (r["salience"], r["last_seen_at"]): ups.append((sal, ls, mid))
+        if not ups: return
+
+        with db.transaction():
+            db.conn.executemany("UPDATE memories SET salience=?, last_seen_at=? WHERE id=?", ups)
+
+def _replay(sal, ls, ops):
+    for op in sorted(ops, key=lambda o: o[0]):
+        kind = op[1]
+        if kind == "set":
+            sal, ls = op[2], op[3]
+        elif kind == "prop":
+            cur = sal or 0
+            df = math.exp(-0.02 * (op[3] - ls) / 86400000.0)
+            sal, ls = max(0.0, min(1.0, cur + GAMMA * (op[2] - cur) * df)), op[3]
+        elif kind == "hit":
+            sal, ls = min(1.0, (sal or 0.5) + 0.5), op[2]
+    return sal, ls
+
+async def _regenerate(mid: str, sector: str, reembed_fn):
+    # regeneration half of on_query_hit: a compressed/cold vector gets re-embedded on access
+    vec_row = await store.getVector(mid, sector)
+    if not (vec_row and vec_row.vector and len(vec_row.vector) <= 64): return
+    m = q.get_mem(mid)
+    if not m: return
+    try:
+        new_vec = await reembed_fn(m["summary"] or m["content"] or "")
+        await store.storeVector(mid, sector, new_vec, len(new_vec))
+    except Exception:
+        pass
+
+reinforce_queue = ReinforceQueue(env.reinforce_flush_ms)
+atexit.register(reinforce_queue.flush_sync)
@@ -52,13 +52,13 @@ async def update_user_summary(user_id: str):
         summary = await gen_user_summary_async(user_id)
         now = int(time.time()*1000)
         
-        existing = db.fetchone("SELECT * FROM users WHERE user_id=?", (user_id,))
-        if not existing:
-             db.execute("INSERT INTO users(user_id,summary,reflection_count,created_at,updated_at) VALUES (?,?,?,?,?)",
-                        (user_id, summary, 0, now, now))
-        else:
-             db.execute("UPDATE users SET summary=?, updated_at=? WHERE user_id=?", (summary, now, user_id))
-        db.commit()
+        async with db.atransaction():
+            existing = db.fetchone("SELECT * FROM users WHERE user_id=?", (user_id,))
+            if not existing:
+                 db.execute("INSERT INTO users(user_id,summary,reflection_count,created_at,updated_at) VALUES (?,?,?,?,?)",
+                            (user_id, summary, 0, now, now))
+            else:
+                 db.execute("UPDATE users SET summary=?, updated_at=? WHERE user_id=?", (summary, now, user_id))
     except Exception as e:
         print(f"[USER_SUMMARY] Error for {user_id}: {e}")
 
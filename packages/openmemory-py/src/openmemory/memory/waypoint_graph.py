@@ -0,0 +1,133 @@
+import numpy as np
+from typing import Dict, List, Optional, Set, Tuple
+
+from ..core.db import db
+
+# In-memory waypoint graph for expand_via_waypoints: one CSR adjacency per user (rows
+# sorted by weight, heaviest first) instead of a SELECT per expanded node.
+# Writers report new edges through add_edges(); deletes arrive via the mem_delete hook.
+# Both land in a small overlay on top of the CSR, which is rebuilt from memory once the
+# overlay grows. Everything is dropped on rollback or when another connection writes.
+
+REBUILD_AT = 0.1 # overlay size, as a fraction of the CSR edges, that triggers a rebuild
+
+class _UserGraph:
+    def __init__(self, edges: List[Tuple[str, str, float]]):
+        self._build(edges)
+
+    def _build(self, edges: List[Tuple[str, str, float]]):
+        ids = list(dict.fromkeys([e[0] for e in edges] + [e[1] for e in edges]))
+        self.pos = {i: n for n, i in enumerate(ids)}
+        self.ids = ids
+        src = np.fromiter((self.pos[e[0]] for e in edges), dtype=np.int64, count=len(edges))
+        dst = np.fromiter((self.pos[e[1]] for e in edges), dtype=np.int64, count=len(edges))
+        w = np.fromiter((e[2] for e in edges), dtype=np.float64, count=len(edges))
+        order = np.lexsort((dst, -w, src)) # by source, then heaviest first
+        self.indices = dst[order].astype(np.int32)
+        self.weights = w[order]
+        self.indptr = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=len(ids)), out=self.indptr[1:])
+        self.extra: Dict[str, Dict[str, float]] = {} # src -> {dst: weight} newer than the CSR
+        self.dead: Set[str] = set() # deleted memories still present in the CSR
+
+    def neighbors(self, src: str) -> List[Tuple[str, float]]:
+        if src in self.dead: return []
+        row = []
+        p = self.pos.get(src)
+        if p is not None:
+            a, b = self.indptr[p], self.indptr[p + 1]
+            row = [(self.ids[d], w) for d, w in zip(self.indices[a:b].tolist(), self.weights[a:b].tolist())]
+        ex = self.extra.get(src)
+        if ex:
+            row = [(d, w) for d, w in row if d not in ex] + list(ex.items())
+            row.sort(key=lambda e: -e[1])
+        return [(d, w) for d, w in row if d not in self.dead] if self.dead else row
+
+    def sources(self) -> Set[str]:
+        has = np.flatnonzero(np.diff(self.indptr))
+        return {self.ids[p] for p in has.tolist()} | set(self.extra)
+
+    def add(self, src: str, dst: str, w: float):
+        self.dead.discard(src)
+        self.dead.discard(dst)
+        self.extra.setdefault(src, {})[dst] = w
+        self._maybe_rebuild()
+
+    def remove(self, ids: List[str]):
+        for i in ids:
+            self.extra.pop(i, None)
+            if i in self.pos: self.dead.add(i)
+        for ex in self.extra.values():
+            for i in ids: ex.pop(i, None)
+        self._maybe_rebuild()
+
+    def _maybe_rebuild(self):
+        pending = len(self.dead) + sum(len(e) for e in self.extra.values())
+        if pending > max(64, REBUILD_AT * len(self.indices)):
+            self._build([(s, d, w) for s in self.sources() for d, w in self.neighbors(s)])
+
+class WaypointGraph:
+    def __init__(self):
+        self._graphs: Dict[Optional[str], _UserGraph] = {}
+        self._owner: Dict[str, Set[Optional[str]]] = {} # src id -> users whose graphs hold its edges
+        self._leaf: Set[str] = set() # ids known to have no outgoing edges
+        self._dv = None
+        db.on("mem_delete", lambda ids, uids: self.remove(ids))
+        db.on("tx_rollback", self.reset)
+
+    def reset(self):
+        self._graphs.clear()
+        self._owner.clear()
+        self._leaf.clear()
+
+    def _load(self, ids: List[str]):
+        dv = db.fetchone("PRAGMA data_version")[0]
+        if self._dv is not None and dv != self._dv: self.reset()
+        self._dv = dv
+        # owners of ids not seen yet, then the whole graph of any user not loaded yet
+        unknown = [i for i in ids if i not in self._owner and i not in self._leaf]
+        for n in range(0, len(unknown), 500):
+            chunk = unknown[n:n+500]
+            ph = ",".join("?" * len(chunk))
+            for r in db.fetchall(f"SELECT DISTINCT src_id, user_id FROM waypoints WHERE src_id IN ({ph})", tuple(chunk)):
+                self._owner.setdefault(r["src_id"], set()).add(r["user_id"])
+        for i in unknown:
+            if i not in self._owner: self._leaf.add(i)
+        for u in {u for i in unknown for u in self._owner.get(i, ())} - set(self._graphs):
+            rows = db.fetchall("SELECT src_id, dst_id, weight FROM waypoints WHERE user_id IS ?", (u,))
+            g = self._graphs[u] = _UserGraph([(r["src_id"], r["dst_id"], float(r["weight"])) for r in rows])
+            for s in g.sources(): self._owner.setdefault(s, set()).add(u)
+
+    def neighbors_many(self, ids: List[str]) -> Dict[str, List[Tuple[str, float]]]:
+        # {id: [(dst, weight)]} heaviest first, for one BFS level
+        self._load(ids)
+        out = {}
+        for i in ids:
+            us = self._owner.get(i, ())
+            if len(us) == 1:
+                out[i] = self._graphs[next(iter(us))].neighbors(i)
+            else:
+                row = [e for u in us for e in self._graphs[u].neighbors(i)]
+                row.sort(key=lambda e: -e[1])
+                out[i] = row
+        return out
+
+    def add_edges(self, edges: List[Tuple[str, str, Optional[str], float]]):
+        # (src, dst, user_id, weight) just written to the waypoints table
+        for src, dst, u, w in edges:
+            self._leaf.discard(src)
+            g = self._graphs.get(u)
+            if g is None:
+                # user not loaded yet: its graph (with this edge) is read on first use
+                self._owner.pop(src, None)
+                continue
+            g.add(src, dst, float(w))
+            self._owner.setdefault(src, set()).add(u)
+
+    def remove(self, ids: List[str]):
+        for g in self._graphs.values(): g.remove(ids)
+        for i in ids:
+            self._owner.pop(i, None)
+            self._leaf.discard(i)
+
+waypoint_graph = WaypointGraph()
@@ -0,0 +1,11 @@
+-- 002_vector_codebooks.sql
+-- Quantization parameters for the optional int8/binary search codes (OM_VEC_QUANT)
+CREATE TABLE IF NOT EXISTS vector_codebooks (
+    sector TEXT NOT NULL,
+    dim INTEGER NOT NULL,
+    scheme TEXT NOT NULL,
+    params BLOB,
+    n_train INTEGER,
+    created_at INTEGER,
+    PRIMARY KEY (sector, dim, scheme)
+);
@@ -0,0 +1,13 @@
+-- 003_vector_slots.sql
+-- Row positions of vectors inside the append-only .f32 segment files (mmap vector store)
+CREATE TABLE IF NOT EXISTS vector_slots (
+    id TEXT NOT NULL,
+    sector TEXT NOT NULL,
+    segment INTEGER NOT NULL,
+    dim INTEGER NOT NULL,
+    slot INTEGER NOT NULL,
+    user_id TEXT,
+    PRIMARY KEY (id, sector)
+);
+
+CREATE INDEX IF NOT EXISTS idx_vector_slots_sector ON vector_slots(sector);
@@ -0,0 +1,12 @@
+-- 004_embed_cache.sql
+-- Persistent tier of the content-hash embedding cache (memory/embed_cache.py)
+CREATE TABLE IF NOT EXISTS embed_cache (
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    sector TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    dim INTEGER NOT NULL,
+    v BLOB NOT NULL,
+    created_at INTEGER,
+    PRIMARY KEY (provider, model, sector, hash)
+);
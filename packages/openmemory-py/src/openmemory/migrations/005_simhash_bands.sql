@@ -0,0 +1,12 @@
+-- 005_simhash_bands.sql
+-- Banded LSH over the 64-bit content simhash: four 16-bit bands per memory. Two hashes
+-- within Hamming distance 3 always agree on at least one band, so near-duplicate
+-- candidates are a handful of indexed lookups. Rows for existing memories are
+-- backfilled from Python on first use (Queries.near_simhash).
+CREATE TABLE IF NOT EXISTS simhash_bands (
+    band INTEGER NOT NULL,
+    value INTEGER NOT NULL,
+    id TEXT NOT NULL,
+    PRIMARY KEY (band, value, id)
+);
+CREATE INDEX IF NOT EXISTS idx_simhash_bands_id ON simhash_bands(id);
@@ -0,0 +1,16 @@
+-- 006_segment_counter.sql
+-- idx_memories_segment was created on simhash (near-duplicate lookups go through
+-- simhash_bands now); rebuild it on segment for the decay job's per-segment scans.
+DROP INDEX IF EXISTS idx_memories_segment;
+CREATE INDEX IF NOT EXISTS idx_memories_segment ON memories(segment);
+
+-- Small key/value store for process-wide counters. "segment" / "segment_fill" track
+-- the segment new memories go to and how many it holds, so inserts do not rescan
+-- memories to decide when to rotate (Queries.alloc_segments).
+CREATE TABLE IF NOT EXISTS om_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER
+);
+INSERT OR IGNORE INTO om_meta(key, value) SELECT 'segment', coalesce(max(segment), 0) FROM memories;
+INSERT OR IGNORE INTO om_meta(key, value)
+    SELECT 'segment_fill', count(*) FROM memories WHERE segment = (SELECT coalesce(max(segment), 0) FROM memories);
@@ -0,0 +1,9 @@
+-- 007_mem_features.sql
+-- Lexical features per memory (utils/features.py): sorted uint32 crc32 hashes of the
+-- canonical token set and of the keyword set of memories.content. Written with the
+-- memory; rows for existing memories are filled in on first retrieval (Queries.get_features).
+CREATE TABLE IF NOT EXISTS mem_features (
+    id TEXT PRIMARY KEY,
+    toks BLOB NOT NULL,
+    kws BLOB NOT NULL
+);
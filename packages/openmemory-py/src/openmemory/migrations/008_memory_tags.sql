@@ -0,0 +1,14 @@
+-- 008_memory_tags.sql
+-- Normalized tags (lower-cased, one row per distinct tag) so tag scoring and tag filters
+-- resolve all candidates in one indexed query instead of parsing memories.tags per row.
+-- Written with the memory (Queries.set_tags); existing rows are backfilled here.
+CREATE TABLE IF NOT EXISTS memory_tags (
+    memory_id TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (memory_id, tag)
+);
+CREATE INDEX IF NOT EXISTS idx_memory_tags_tag ON memory_tags(tag);
+
+INSERT OR IGNORE INTO memory_tags(memory_id, tag)
+    SELECT m.id, lower(j.value) FROM memories m, json_each(m.tags) j
+    WHERE json_valid(m.tags) AND json_type(m.tags) = 'array' AND j.type IN ('text', 'integer', 'real');
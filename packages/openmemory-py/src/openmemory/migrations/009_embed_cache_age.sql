@@ -0,0 +1,4 @@
+-- 009_embed_cache_age.sql
+-- The persistent embedding cache is capped at OM_EMBED_CACHE_ROWS; the oldest rows
+-- (by created_at) are evicted first.
+CREATE INDEX IF NOT EXISTS idx_embed_cache_created ON embed_cache(created_at);
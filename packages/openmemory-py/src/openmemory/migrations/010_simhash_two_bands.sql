@@ -0,0 +1,4 @@
+-- 010_simhash_two_bands.sql
+-- The content simhash is a 32-bit hash written twice, so bands 2 and 3 always repeat
+-- bands 0 and 1. Only the two distinct bands are indexed now.
+DELETE FROM simhash_bands WHERE band >= 2;
@@ -3,10 +3,11 @@
 import logging
 import uuid
 import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List
 
 from ..core.db import q, db, transaction
-from ..memory.hsg import add_hsg_memory
+from ..memory.hsg import add_hsg_memory, add_hsg_memories, embed_hsg_memory, store_hsg_memory
+from ..memory.waypoint_graph import waypoint_graph
 from ..utils.vectors import rid
 from .extract import extract_text
 
@@ -73,7 +74,8 @@ async def mk_root(txt: str, ex: Dict, meta: Dict = None, user_id: str = None) ->
         # db.execute("ROLLBACK")
         raise e
 
-async def mk_child(txt: str, idx: int, tot: int, rid: str, meta: Dict = None, user_id: str = None) -> str:
+async def mk_child(txt: str, idx: int, tot: int, rid: str, meta: Dict = None, user_id: str = None, prep: Dict = None) -> str:
+    # prep: embed_hsg_memory(txt) done beforehand, outside the document's transaction
     m = meta or {}
     m.update({
         "is_child": True,
@@ -81,15 +83,23 @@ async def mk_child(txt: str, idx: int, tot: int, rid: str, meta: Dict = None, us
         "total_sections": tot,
         "parent_id": rid
     })
-    r = await add_hsg_memory(txt, json.dumps([]), m, user_id)
+    if prep is not None:
+        r = await store_hsg_memory(prep, json.dumps([]), m, user_id)
+    else:
+        r = await add_hsg_memory(txt, json.dumps([]), m, user_id)
     return r["id"]
 
+async def embed_sections(secs: List[str], meta: Dict = None) -> List[Dict]:
+    # every section's embeddings, concurrently (remote providers coalesce them into batches)
+    return await asyncio.gather(*(embed_hsg_memory(s, meta) for s in secs))
+
 async def link(rid: str, cid: str, idx: int, user_id: str = None):
     ts = int(time.time()*1000)
     # q.ins_waypoint
     db.execute("INSERT INTO waypoints(src_id,dst_id,user_id,weight,created_at,updated_at) VALUES (?,?,?,?,?,?)",
                (rid, cid, user_id or "anonymous", 1.0, ts, ts))
     db.commit()
+    waypoint_graph.add_edges([(rid, cid, user_id or "anonymous", 1.0)])
 
 async def ingest_document(t: str, data: Any, meta: Dict = None, cfg: Dict = None, user_id: str = None, tags: list = None) -> Dict[str, Any]:
     th = cfg.get("lg_thresh", LG) if cfg else LG
@@ -125,11 +135,15 @@ async def ingest_document(t: str, data: Any, meta: Dict = None, cfg: Dict = None
     
     cids = []
     try:
-        rid_val = await mk_root(text, ex, meta, user_id)
-        for i, s in enumerate(secs):
-             cid = await mk_child(s, i, len(secs), rid_val, meta, user_id)
-             cids.append(cid)
-             await link(rid_val, cid, i, user_id)
+        # embeddings first; then root, children and links commit together, so a failed
+        # section leaves no partial document and no provider call runs inside the transaction
+        preps = await embed_sections(secs, meta)
+        async with db.atransaction():
+            rid_val = await mk_root(text, ex, meta, user_id)
+            for i, (s, prep) in enumerate(zip(secs, preps)):
+                 cid = await mk_child(s, i, len(secs), rid_val, meta, user_id, prep)
+                 cids.append(cid)
+                 await link(rid_val, cid, i, user_id)
              
         return {
             "root_memory_id": rid_val,
@@ -144,6 +158,35 @@ async def ingest_document(t: str, data: Any, meta: Dict = None, cfg: Dict = None
         print(f"[INGEST] Failed: {e}")
         raise e
 
+async def ingest_documents(items: List[Dict[str, Any]], cfg: Dict = None) -> List[Dict[str, Any]]:
+    # Bulk ingest_document("text", ...): items are {content, meta?, user_id?, tags?}. Documents
+    # small enough for the single strategy are stored through one add_hsg_memories batch;
+    # large ones still go through the root-child path one at a time.
+    th = cfg.get("lg_thresh", LG) if cfg else LG
+    out: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    single, pos = [], []
+    for n, it in enumerate(items):
+        ex = await extract_text("text", it["content"])
+        exMeta = ex["metadata"]
+        if (cfg and cfg.get("force_root")) or exMeta["estimated_tokens"] > th:
+            out[n] = await ingest_document("text", it["content"], it.get("meta"), cfg, it.get("user_id"), it.get("tags"))
+            continue
+        m = dict(it.get("meta") or {})
+        m.update(exMeta)
+        m.update({"ingestion_strategy": "single", "ingested_at": int(time.time()*1000)})
+        single.append({"content": ex["text"], "tags": json.dumps(it.get("tags") or []), "metadata": m, "user_id": it.get("user_id")})
+        pos.append((n, exMeta))
+        
+    for (n, exMeta), r in zip(pos, await add_hsg_memories(single)):
+        out[n] = {
+            "root_memory_id": r["id"],
+            "child_count": 0,
+            "total_tokens": exMeta["estimated_tokens"],
+            "strategy": "single",
+            "extraction": exMeta
+        }
+    return out
+
 async def ingest_url(url: str, meta: Dict = None, cfg: Dict = None, user_id: str = None) -> Dict[str, Any]:
     from .extract import extract_url
     ex = await extract_url(url)
@@ -173,11 +216,13 @@ async def ingest_url(url: str, meta: Dict = None, cfg: Dict = None, user_id: str
     m_root["source_url"] = url
     
     try:
-        rid_val = await mk_root(ex["text"], ex, m_root, user_id)
-        for i, s in enumerate(secs):
-             cid = await mk_child(s, i, len(secs), rid_val, m_root, user_id)
-             cids.append(cid)
-             await link(rid_val, cid, i, user_id)
+        preps = await embed_sections(secs, m_root)
+        async with db.atransaction():
+            rid_val = await mk_root(ex["text"], ex, m_root, user_id)
+            for i, (s, prep) in enumerate(zip(secs, preps)):
+                 cid = await mk_child(s, i, len(secs), rid_val, m_root, user_id, prep)
+                 cids.append(cid)
+                 await link(rid_val, cid, i, user_id)
              
         return {
             "root_memory_id": rid_val,
@@ -36,5 +36,10 @@ async def log_requests(request: Request, call_next):
     @app.on_event("startup")
     async def startup():
         logger.info(f"OpenMemory Server running on port {env.port}")
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        from ..ai.registry import close_clients
+        await close_clients()
         
     return app
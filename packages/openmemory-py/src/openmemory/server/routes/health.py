@@ -1,8 +1,9 @@
 
 from fastapi import APIRouter
+from ...memory.hsg import cache as query_cache
 
 router = APIRouter()
 
 @router.get("/health")
 async def health_check():
-    return {"status": "ok", "service": "openmemory-py"}
+    return {"status": "ok", "service": "openmemory-py", "query_cache": query_cache.stats()}
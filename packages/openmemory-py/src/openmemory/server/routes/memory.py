@@ -17,6 +17,10 @@ class AddMemoryRequest(BaseModel):
     tags: Optional[List[str]] = []
     metadata: Optional[Dict[str, Any]] = {}
 
+class AddBatchRequest(BaseModel):
+    items: List[AddMemoryRequest]
+    user_id: Optional[str] = None
+
 class SearchMemoryRequest(BaseModel):
     query: str
     user_id: Optional[str] = None
@@ -39,6 +43,20 @@ async def add_memory(req: AddMemoryRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/add_batch")
+async def add_memory_batch(req: AddBatchRequest):
+    try:
+        # same meta/tags handling as /add, one transaction for the whole batch
+        items = []
+        for it in req.items:
+            meta = it.metadata or {}
+            if it.tags: meta["tags"] = it.tags
+            items.append({"content": it.content, "user_id": it.user_id, "meta": meta})
+        results = await mem.add_many(items, user_id=req.user_id)
+        return {"success": True, "data": results}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/search")
 async def search_memory(req: SearchMemoryRequest):
     try:
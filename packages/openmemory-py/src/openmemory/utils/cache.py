@@ -0,0 +1,69 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+# Bounded LRU with optional TTL. Capped both by entry count and by an approximate
+# byte size supplied by the caller on put(); least recently used entries go first.
+
+class LRUCache:
+    def __init__(self, max_items: int = 1024, max_bytes: int = 0, ttl_ms: int = 0):
+        self.max_items = max_items
+        self.max_bytes = max_bytes # 0 = no byte cap
+        self.ttl_ms = ttl_ms # 0 = no expiry
+        self._d: "OrderedDict[Hashable, tuple]" = OrderedDict() # key -> (value, size, ts)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            e = self._d.get(key)
+            if e is None:
+                self.misses += 1
+                return None
+            if self.ttl_ms and time.time()*1000 - e[2] >= self.ttl_ms:
+                self._drop(key)
+                self.misses += 1
+                return None
+            self._d.move_to_end(key)
+            self.hits += 1
+            return e[0]
+
+    def put(self, key: Hashable, value: Any, size: int = 0):
+        with self._lock:
+            if key in self._d: self._drop(key)
+            if self.max_bytes and size > self.max_bytes: return # would evict everything else
+            self._d[key] = (value, size, time.time()*1000)
+            self._bytes += size
+            while self._d and (len(self._d) > self.max_items or (self.max_bytes and self._bytes > self.max_bytes)):
+                k, _ = next(iter(self._d.items()))
+                self._drop(k)
+                self.evictions += 1
+
+    def _drop(self, key: Hashable):
+        _, size, _ = self._d.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._d.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._d)
+
+    def stats(self) -> Dict[str, Any]:
+        tot = self.hits + self.misses
+        return {
+            "items": len(self._d),
+            "bytes": self._bytes,
+            "max_items": self.max_items,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / tot if tot else 0.0,
+        }
@@ -0,0 +1,37 @@
+import zlib
+import numpy as np
+from typing import Iterable, Set, Tuple
+
+from .text import canonical_token_set
+from .keyword import extract_keywords
+from ..core.config import env
+
+# Per-memory lexical features, computed once on insert (Queries.ins_mem) and stored in
+# mem_features as sorted uint32 arrays of crc32 term hashes:
+#   toks  canonical token set     (compute_token_overlap)
+#   kws   extract_keywords() set  (compute_keyword_overlap)
+# so query-time overlap is an intersection of two small integer arrays instead of
+# re-tokenizing every candidate's content.
+
+def hash_terms(terms: Iterable[str]) -> np.ndarray:
+    return np.unique(np.fromiter((zlib.crc32(t.encode("utf-8")) for t in terms), dtype=np.uint32))
+
+def text_features(text: str) -> Tuple[np.ndarray, np.ndarray]:
+    return hash_terms(canonical_token_set(text or "")), hash_terms(extract_keywords(text or "", env.keyword_min_length))
+
+class QueryFeatures:
+    # query side of the overlap scores; keyword weights follow compute_keyword_overlap (n-grams count double)
+    def __init__(self, q_toks: Set[str], q_text: str):
+        self.toks = hash_terms(q_toks)
+        kws = sorted(extract_keywords(q_text, env.keyword_min_length))
+        self.kws = np.fromiter((zlib.crc32(k.encode("utf-8")) for k in kws), dtype=np.uint32, count=len(kws))
+        self.kw_w = np.array([2.0 if "_" in k else 1.0 for k in kws], dtype=np.float64)
+        self.kw_tot = float(self.kw_w.sum())
+
+    def token_overlap(self, toks: np.ndarray) -> float:
+        if not len(self.toks): return 0.0
+        return len(np.intersect1d(self.toks, toks, assume_unique=True)) / len(self.toks)
+
+    def keyword_overlap(self, kws: np.ndarray) -> float:
+        if self.kw_tot <= 0: return 0.0
+        return float(self.kw_w[np.isin(self.kws, kws, assume_unique=False)].sum()) / self.kw_tot
@@ -1,4 +1,4 @@
-from typing import Set, List, Dict, Any
+from typing import Set, List, Dict, Any, Optional
 import math
 from .text import canonical_tokens_from_text
 from ..core.config import env
@@ -49,8 +49,11 @@ def compute_bm25_score(
     query_terms: List[str],
     content_terms: List[str],
     corpus_size: int = 10000,
-    avg_doc_length: int = 100
+    avg_doc_length: int = 100,
+    doc_freq: Optional[Dict[str, int]] = None
 ) -> float:
+    # without doc_freq this is the original approximation (idf from the term's own tf);
+    # with it, standard Okapi idf over the corpus described by corpus_size/avg_doc_length
     k1 = 1.5
     b = 0.75
     
@@ -65,7 +68,11 @@ def compute_bm25_score(
         tf = term_freq.get(qt, 0)
         if tf == 0: continue
         
-        idf = math.log((corpus_size + 1) / (tf + 0.5))
+        if doc_freq is not None:
+            df = doc_freq.get(qt, 0)
+            idf = math.log((corpus_size - df + 0.5) / (df + 0.5) + 1)
+        else:
+            idf = math.log((corpus_size + 1) / (tf + 0.5))
         numerator = tf * (k1 + 1)
         denominator = tf + k1 * (1 - b + b * (doc_len / avg_doc_length))
         
@@ -78,22 +85,38 @@ async def keyword_filter_memories(
     all_memories: List[Dict[str, Any]], # expects {id, content}
     threshold: float = 0.1
 ) -> Dict[str, float]:
-    q_kw = extract_keywords(query, env.keyword_min_length if hasattr(env, 'keyword_min_length') else 3)
+    from ..core.db import q, db # circular: core.db hashes keywords on insert
+    q_kw = extract_keywords(query, env.keyword_min_length)
     q_terms = canonical_tokens_from_text(query)
     scores = {}
     
+    # bm25 from the FTS5 index for stored memories, computed over the given set for the rest.
+    # The two are not on one scale (FTS5 ranks against every stored memory with its own k1),
+    # so each source is divided by its best candidate before weighting.
+    ids = [m["id"] for m in all_memories]
+    fts = dict(q.fts_search(query, len(ids), ids=ids)) if db.has_fts else {}
+    stored = q.fts_indexed(ids) if db.has_fts else set()
+    docs = {m["id"]: canonical_tokens_from_text(m["content"]) for m in all_memories if m["id"] not in stored}
+    avg = sum(len(t) for t in docs.values()) / len(docs) if docs else 1
+    df: Dict[str, int] = {}
+    for t in docs.values():
+        for w in set(t): df[w] = df.get(w, 0) + 1
+    local = {i: compute_bm25_score(q_terms, t, len(docs), avg or 1, df) for i, t in docs.items()}
+    bm25s = {}
+    for src in (fts, local):
+        top = max(src.values(), default=0.0)
+        if top > 0: bm25s.update((i, s / top) for i, s in src.items())
+    
     for mem in all_memories:
         total = 0.0
         if exact_phrase_match(query, mem["content"]):
             total += 1.0
             
-        c_kw = extract_keywords(mem["content"], env.keyword_min_length if hasattr(env, 'keyword_min_length') else 3)
+        c_kw = extract_keywords(mem["content"], env.keyword_min_length)
         kw_score = compute_keyword_overlap(q_kw, c_kw)
         total += kw_score * 0.8
         
-        c_terms = canonical_tokens_from_text(mem["content"])
-        bm25 = compute_bm25_score(q_terms, c_terms)
-        total += min(1.0, bm25 / 10.0) * 0.5
+        total += bm25s.get(mem["id"], 0.0) * 0.5
         
         if total > threshold:
             scores[mem["id"]] = total
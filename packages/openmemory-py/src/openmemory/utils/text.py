@@ -1,4 +1,5 @@
 import re
+from functools import lru_cache
 from typing import List, Set, Dict
 
 # Ported from backend/src/utils/text.ts
@@ -50,6 +51,7 @@ def stem(tok: str) -> str:
             if len(st) >= 3: return st
     return tok
 
+@lru_cache(maxsize=65536) # pure; hot in synthetic embedding (every token and synonym)
 def canonicalize_token(tok: str) -> str:
     if not tok: return ""
     low = tok.lower()
@@ -70,14 +72,16 @@ def synonyms_for(tok: str) -> Set[str]:
     return SLOOK.get(can, {can})
 
 def build_search_doc(text: str) -> str:
+    # canonical tokens in order (bm25 wants term frequencies), then their synonyms once
     can = canonical_tokens_from_text(text)
-    exp = set()
-    for tok in can:
-        exp.add(tok)
-        syns = SLOOK.get(tok)
-        if syns:
-            exp.update(syns)
-    return " ".join(exp)
+    seen = set(can)
+    exp = []
+    for tok in dict.fromkeys(can):
+        for syn in sorted(SLOOK.get(tok, ())):
+            if syn not in seen:
+                seen.add(syn)
+                exp.append(syn)
+    return " ".join(can + exp)
 
 def build_fts_query(text: str) -> str:
     can = canonical_tokens_from_text(text)
@@ -4,7 +4,7 @@
 import json
 import struct
 import numpy as np
-from typing import List, Union, Any
+from typing import List, Union, Any, Dict, Optional, Tuple
 
 # Ported from backend/src/utils/index.ts
 
@@ -39,3 +39,108 @@ def vec_to_buf(v: List[float]) -> bytes:
 def buf_to_vec(buf: bytes) -> List[float]:
     cnt = len(buf) // 4
     return list(struct.unpack(f"{cnt}f", buf))
+
+class VecMatrix:
+    # Resident float32 matrix of L2-normalised rows keyed by id.
+    # Cosine similarity against every row becomes a single matmul.
+    # Rows are appended into spare capacity and removed by swapping in the last row,
+    # so ids[] / pos{} / labels[] always describe rows [0, n).
+    dtype = np.float32
+
+    def __init__(self, dim: int, cap: int = 64):
+        self.dim = dim
+        self.n = 0
+        self.mat = np.zeros((max(1, cap), self.width()), dtype=self.dtype)
+        self.labels = np.zeros(max(1, cap), dtype=np.int32)
+        self.ids: List[str] = []
+        self.pos: Dict[str, int] = {}
+        self._codes: Dict[Any, int] = {}
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __contains__(self, id: str) -> bool:
+        return id in self.pos
+
+    def width(self) -> int:
+        return self.dim
+
+    def encode(self, unit: np.ndarray) -> np.ndarray:
+        # how a normalised row is stored; subclasses quantise here
+        return unit
+
+    def code(self, label: Any) -> int:
+        # small int per distinct label (user id) so filtering is an int compare
+        c = self._codes.get(label)
+        if c is None:
+            c = len(self._codes) + 1
+            self._codes[label] = c
+        return c
+
+    def _grow(self, need: int):
+        cap = self.mat.shape[0]
+        if need <= cap: return
+        while cap < need: cap *= 2
+        mat = np.zeros((cap, self.width()), dtype=self.dtype)
+        mat[:self.n] = self.mat[:self.n]
+        labels = np.zeros(cap, dtype=np.int32)
+        labels[:self.n] = self.labels[:self.n]
+        self.mat, self.labels = mat, labels
+
+    def upsert(self, id: str, vec: Union[List[float], np.ndarray], label: Any = None):
+        v = np.asarray(vec, dtype=np.float32)
+        nv = float(np.linalg.norm(v))
+        i = self.pos.get(id)
+        if i is None:
+            self._grow(self.n + 1)
+            i = self.n
+            self.n += 1
+            self.ids.append(id)
+            self.pos[id] = i
+        self.mat[i] = self.encode(v / nv if nv > 0 else np.zeros(self.dim, dtype=np.float32))
+        self.labels[i] = self.code(label)
+
+    def remove(self, id: str) -> bool:
+        i = self.pos.pop(id, None)
+        if i is None: return False
+        last = self.n - 1
+        if i != last:
+            moved = self.ids[last]
+            self.mat[i] = self.mat[last]
+            self.labels[i] = self.labels[last]
+            self.ids[i] = moved
+            self.pos[moved] = i
+        self.ids.pop()
+        self.n = last
+        return True
+
+    def scores(self, q: Union[List[float], np.ndarray]) -> np.ndarray:
+        qv = np.asarray(q, dtype=np.float32)
+        qn = float(np.linalg.norm(qv))
+        if qn == 0 or self.n == 0: return np.zeros(self.n, dtype=np.float32)
+        return self.mat[:self.n] @ (qv / qn)
+
+    def mask(self, label: Any) -> np.ndarray:
+        c = self._codes.get(label)
+        if c is None: return np.zeros(self.n, dtype=bool)
+        return self.labels[:self.n] == c
+
+    def mask_ids(self, ids) -> np.ndarray:
+        # pre-filter bitmap: True for the rows of the given ids
+        m = np.zeros(self.n, dtype=bool)
+        rows = [self.pos[i] for i in ids if i in self.pos]
+        if rows: m[rows] = True
+        return m
+
+    def top_k(self, q: Union[List[float], np.ndarray], k: int, mask: Optional[np.ndarray] = None) -> List[Tuple[str, float]]:
+        if self.n == 0 or k <= 0: return []
+        sims = self.scores(q)
+        idx = np.nonzero(mask)[0] if mask is not None else np.arange(self.n)
+        if len(idx) == 0: return []
+        s = sims[idx]
+        if k < len(s):
+            part = np.argpartition(-s, k - 1)[:k]
+            order = part[np.argsort(-s[part], kind="stable")]
+        else:
+            order = np.argsort(-s, kind="stable")
+        return [(self.ids[idx[o]], float(s[o])) for o in order]
@@ -0,0 +1,154 @@
+import pytest
+from openmemory.client import Memory
+from openmemory.core.db import q, db
+from openmemory.core.vector_store import vector_store
+
+# ==================================================================================
+# BULK INGESTION
+# ==================================================================================
+# add_many must store what add would (rows, vectors, waypoints, summary) and commit
+# the batch as a whole.
+# ==================================================================================
+
+@pytest.mark.asyncio
+async def test_add_many_matches_single_adds():
+    mem = Memory()
+    uid = "batch_user"
+    await mem.delete_all(user_id=uid)
+    texts = [
+        "Kiwi birds cannot fly and lay very large eggs",
+        "The Danube flows through ten countries before the Black Sea",
+        "Sourdough starter needs feeding with flour and water daily",
+        "Kiwi birds cannot fly and lay very large eggs", # repeat folds into the first
+    ]
+    res = await mem.add_many(texts, user_id=uid)
+    assert len(res) == 4
+    assert res[3]["id"] == res[0]["id"]
+    ids = [r["id"] for r in res[:3]]
+    assert len(set(ids)) == 3
+
+    rows = q.get_mems(ids)
+    assert set(rows) == set(ids)
+    for i in ids:
+        assert rows[i]["user_id"] == uid
+        assert rows[i]["mean_vec"] is not None
+        assert await vector_store.getVectorsById(i)
+        assert db.fetchone("SELECT 1 FROM waypoints WHERE src_id=?", (i,))
+    assert rows[ids[0]]["salience"] >= 0.55 # 0.4+ initial, +0.15 for the repeat
+    assert "3 memories" in db.fetchone("SELECT summary FROM users WHERE user_id=?", (uid,))["summary"]
+
+    # a single add after the batch still sees the batch for dedup
+    again = await mem.add(texts[1], user_id=uid)
+    assert again["id"] == ids[1]
+    await mem.delete_all(user_id=uid)
+
+@pytest.mark.asyncio
+async def test_transaction_rolls_back_whole_batch():
+    mem = Memory()
+    n = db.fetchone("SELECT count(*) c FROM memories")["c"]
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            q.ins_mem(id="tx-probe", user_id="tx_user", content="x", simhash="0" * 16)
+            db.commit() # deferred to the end of the block
+            raise RuntimeError("boom")
+    assert db.fetchone("SELECT count(*) c FROM memories")["c"] == n
+    assert not db.conn.in_transaction
+
+@pytest.mark.asyncio
+async def test_nested_transaction_rolls_back_to_savepoint():
+    mem = Memory()
+    with db.transaction():
+        q.ins_mem(id="tx-outer", user_id="tx_user", content="outer", simhash="0" * 16)
+        with pytest.raises(ValueError):
+            with db.transaction():
+                q.ins_mem(id="tx-inner", user_id="tx_user", content="inner", simhash="0" * 16)
+                raise ValueError("inner only")
+    assert q.get_mem("tx-outer") and not q.get_mem("tx-inner")
+    q.del_mem("tx-outer")
+
+@pytest.mark.asyncio
+async def test_concurrent_units_of_work():
+    import asyncio
+    mem = Memory()
+    uid = "uow_user"
+    await mem.delete_all(user_id=uid)
+    res = await asyncio.gather(*(mem.add(f"Unit of work note number {i} about {w}", user_id=uid)
+                                 for i, w in enumerate(["lighthouses", "glaciers", "volcanoes", "reefs"])))
+    assert len({r["id"] for r in res}) == 4
+    assert not db.conn.in_transaction
+
+    # a failing unit of work leaves nothing behind, including in the in-process indexes
+    with pytest.raises(KeyError):
+        async with db.atransaction():
+            await mem.add("Unit of work note that never lands", user_id=uid)
+            raise KeyError("boom")
+    assert len(mem.history(uid)) == 4
+    hits = await mem.search("Unit of work note that never lands", user_id=uid, limit=10)
+    assert {h["id"] for h in hits} <= {r["id"] for r in res}
+    await mem.delete_all(user_id=uid)
+
+@pytest.mark.asyncio
+async def test_foreign_writer_stays_out_of_open_transaction():
+    import asyncio
+    from openmemory.memory.embed_cache import embed_cache
+    Memory()
+    held, release = asyncio.Event(), asyncio.Event()
+
+    async def owner():
+        async with db.atransaction():
+            q.ins_mem(id="tx-owner", user_id="tx_user", content="owner", simhash="0" * 16)
+            held.set()
+            await release.wait()
+            raise KeyError("owner rolls back")
+
+    t = asyncio.create_task(owner())
+    await held.wait()
+    # a sync write from another task would otherwise land in (and roll back with) the owner's tx
+    assert db.busy
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            pass
+    # so would a plain write, which used to return success and then vanish with the rollback
+    with pytest.raises(RuntimeError):
+        db.execute("UPDATE users SET summary='foreign' WHERE user_id=?", ("tx_user",))
+    assert db.fetchone("SELECT count(*) c FROM memories")["c"] >= 1 # reads are fine
+    # the embedding cache defers its write instead
+    k = embed_cache.key("probe", "m", "", "deferred while busy")
+    embed_cache.put(k, [0.5, 0.25], persist=True)
+    # and async helpers wait for the owner's transaction to end
+    from openmemory.memory.user_summary import update_user_summary
+    waiting = asyncio.create_task(update_user_summary("tx_foreign"))
+    await asyncio.sleep(0.01)
+    assert not waiting.done()
+    release.set()
+    with pytest.raises(KeyError):
+        await t
+    await waiting
+    assert not q.get_mem("tx-owner") and not db.busy
+    assert db.fetchone("SELECT 1 FROM users WHERE user_id=?", ("tx_foreign",))
+    db.execute("DELETE FROM users WHERE user_id=?", ("tx_foreign",))
+
+    embed_cache.put(embed_cache.key("probe", "m", "", "written after"), [0.5], persist=True)
+    assert db.fetchone("SELECT 1 FROM embed_cache WHERE provider=? AND model=? AND sector=? AND hash=?", k)
+    db.execute("DELETE FROM embed_cache WHERE provider='probe'")
+    db.commit()
+
+@pytest.mark.asyncio
+async def test_segment_counter_rotates_and_persists(monkeypatch):
+    from openmemory.core.config import env
+    from openmemory.core.db import Queries
+    mem = Memory()
+    uid = "seg_user"
+    await mem.delete_all(user_id=uid)
+    monkeypatch.setattr(env, "seg_size", 2)
+    q.alloc_segments(0) # load the counter
+    base = Queries._seg[0]
+    res = await mem.add_many([f"Segment probe {w} entry" for w in ["alpha", "bravo", "charlie", "delta", "echo"]], user_id=uid)
+    segs = [q.get_mem(r["id"])["segment"] for r in res]
+    assert segs == sorted(segs) and segs[-1] - segs[0] in (2, 3) and segs[0] >= base
+    # the counter survives a reload from om_meta
+    last = Queries._seg[:2]
+    Queries._seg = None
+    assert q.alloc_segments(0) == [] and Queries._seg[:2] == last
+    assert "(segment)" in str(db.fetchone("SELECT sql FROM sqlite_master WHERE name='idx_memories_segment'")["sql"])
+    await mem.delete_all(user_id=uid)
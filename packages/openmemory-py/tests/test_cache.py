@@ -0,0 +1,105 @@
+import pytest
+from openmemory.utils.cache import LRUCache
+from openmemory.client import Memory
+
+# ==================================================================================
+# QUERY CACHE
+# ==================================================================================
+# Bounded LRU, and cached hsg_query results must not survive a write for that user.
+# ==================================================================================
+
+def test_lru_bounds():
+    c = LRUCache(max_items=3, max_bytes=100)
+    for i in range(5):
+        c.put(i, str(i), 10)
+    assert len(c) == 3 and c.get(0) is None and c.get(4) == "4"
+    c.get(2) # 2 becomes most recent
+    c.put("big", "x", 80) # byte cap pushes out LRU entries, not 2
+    assert c.get(2) == "2" and c.get(3) is None
+    st = c.stats()
+    assert st["bytes"] <= 100 and st["evictions"] >= 3 and st["hits"] == 3
+
+@pytest.mark.asyncio
+async def test_query_cache_invalidated_on_write():
+    mem = Memory()
+    uid = "cache_user"
+    await mem.delete_all(user_id=uid)
+
+    a = await mem.add("Zebras graze on the open savanna", user_id=uid)
+    first = await mem.search("zebras savanna", user_id=uid)
+    assert [r["id"] for r in first] == [a["id"]]
+
+    b = await mem.add("Zebras migrate across the savanna in herds", user_id=uid)
+    second = await mem.search("zebras savanna", user_id=uid)
+    assert {r["id"] for r in second} == {a["id"], b["id"]}
+
+    await mem.delete(b["id"])
+    third = await mem.search("zebras savanna", user_id=uid)
+    assert [r["id"] for r in third] == [a["id"]]
+    await mem.delete_all(user_id=uid)
+
+
+@pytest.mark.asyncio
+async def test_embed_cache_tiers():
+    from openmemory.memory.embed_cache import EmbedCache
+    from openmemory.core.db import db
+
+    db.connect()
+    c = EmbedCache(max_items=2)
+    k = c.key("openai", "text-embedding-3-small", "", "the same query string")
+    assert c.get(k) is None
+    v = c.put(k, [0.1, 0.2, 0.3])
+    assert c.get(k) == v
+
+    # a fresh process-level cache still finds it in the table
+    cold = EmbedCache(max_items=2)
+    assert cold.get(k) == v
+    assert cold.get(c.key("openai", "text-embedding-3-small", "", "other text")) is None
+    db.execute("DELETE FROM embed_cache WHERE hash=?", (k[3],))
+    db.commit()
+
+
+@pytest.mark.asyncio
+async def test_micro_batcher_coalesces():
+    import asyncio
+    from openmemory.memory.batcher import MicroBatcher
+
+    calls = []
+    async def fn(texts):
+        calls.append(list(texts))
+        return [[float(len(t))] for t in texts]
+
+    b = MicroBatcher(fn, window_ms=5, max_items=3)
+    res = await asyncio.gather(*(b.submit(t) for t in ["a", "bb", "a", "ccc", "dddd"]))
+    assert res == [[1.0], [2.0], [1.0], [3.0], [4.0]]
+    # "a" is sent once; the third distinct text fills the batch, the rest waits for the window
+    assert calls == [["a", "bb", "ccc"], ["dddd"]]
+
+    # in-flight batches are held by the batcher until they finish
+    f = b.submit("eeeee")
+    b._fire()
+    assert len(b._tasks) == 1
+    assert await f == [5.0]
+    await asyncio.sleep(0)
+    assert not b._tasks
+
+
+def test_embed_cache_table_is_capped():
+    from openmemory.memory.embed_cache import EmbedCache
+    from openmemory.core.db import db
+
+    db.connect()
+    db.execute("DELETE FROM embed_cache")
+    db.commit()
+    c = EmbedCache(max_items=4, max_rows=20)
+    keys = [c.key("openai", "cap-model", "", f"text {n}") for n in range(60)]
+    for n, k in enumerate(keys):
+        c.put(k, [float(n)])
+        db.execute("UPDATE embed_cache SET created_at=? WHERE hash=?", (n, k[3])) # strictly ordered ages
+    assert db.fetchone("SELECT count(*) AS c FROM embed_cache")["c"] <= 22
+    # the newest rows survive, the oldest were evicted
+    cold = EmbedCache(max_items=4)
+    assert cold.get(keys[-1]) == [59.0]
+    assert cold.get(keys[0]) is None
+    db.execute("DELETE FROM embed_cache WHERE model='cap-model'")
+    db.commit()
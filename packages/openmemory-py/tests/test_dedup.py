@@ -0,0 +1,46 @@
+import pytest
+from openmemory.client import Memory
+from openmemory.core.db import q, db
+from openmemory.memory.hsg import compute_simhash, hamming_dist
+
+# ==================================================================================
+# NEAR-DUPLICATES
+# ==================================================================================
+# The simhash band index must find every stored hash within Hamming distance 3.
+# ==================================================================================
+
+@pytest.mark.asyncio
+async def test_band_index_finds_near_duplicates():
+    mem = Memory()
+    uid = "dedup_user"
+    await mem.delete_all(user_id=uid)
+    a = await mem.add("Otters hold hands while sleeping in kelp forests", user_id=uid)
+    sh = q.get_mem(a["id"])["simhash"]
+
+    # the hash is 32 bits written twice: a flipped bit shows up in both halves
+    v = int(sh, 16)
+    assert v >> 32 == v & 0xffffffff
+    assert len(db.fetchall("SELECT 1 FROM simhash_bands WHERE id=?", (a["id"],))) == q.SIMHASH_BANDS == 2
+    for b in (0, 15, 16, 31):
+        near = format(v ^ (1 << b) ^ (1 << (b + 32)), "016x")
+        assert hamming_dist(sh, near) == 2
+        assert a["id"] in {r["id"] for r in q.near_simhash(near)}
+
+    # exact re-add is folded into the existing memory, a different short text is not
+    again = await mem.add("Otters hold hands while sleeping in kelp forests", user_id=uid)
+    assert again["id"] == a["id"]
+    other = await mem.add("Otters hold stones while sleeping in kelp forests", user_id=uid)
+    assert other["id"] != a["id"]
+
+    await mem.delete_all(user_id=uid)
+    assert not db.fetchall("SELECT 1 FROM simhash_bands WHERE id=?", (a["id"],))
+
+
+@pytest.mark.asyncio
+async def test_band_backfill_reruns_after_rollback():
+    Memory()
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            q.near_simhash("0" * 16) # first use backfills inside the transaction
+            raise RuntimeError("boom")
+    assert not q._bands_ready
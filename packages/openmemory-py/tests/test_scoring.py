@@ -0,0 +1,220 @@
+import pytest
+import numpy as np
+from openmemory.memory.hsg import (
+    calc_decay, calc_decay_many, compute_hybrid_score, compute_hybrid_scores, top_k_indices,
+)
+
+# ==================================================================================
+# SCORING
+# ==================================================================================
+# The columnar scoring stage must agree with the per-candidate helpers it replaced.
+# ==================================================================================
+
+def test_columnar_scoring_matches_scalar():
+    rng = np.random.default_rng(3)
+    n = 200
+    secs = list(rng.choice(["semantic", "episodic", "procedural", "emotional", "reflective", "unknown"], n))
+    sal, days = rng.random(n), rng.random(n) * 90
+    sim, tok, wp, rec, kw, tag = (rng.random(n) for _ in range(6))
+
+    dec = calc_decay_many(secs, sal, days)
+    fs = compute_hybrid_scores(sim, tok, wp, rec, kw, tag)
+    for i in range(n):
+        assert dec[i] == pytest.approx(calc_decay(secs[i], sal[i], days[i]))
+        assert fs[i] == pytest.approx(compute_hybrid_score(sim[i], tok[i], wp[i], rec[i], kw[i], tag[i]))
+
+    # top-k must equal a stable full sort, ties included
+    fs = np.round(fs, 2)
+    ref = sorted(range(n), key=lambda i: fs[i], reverse=True)
+    for k in (1, 10, 50, n, n + 5):
+        assert list(top_k_indices(fs, k)) == ref[:k]
+
+
+@pytest.mark.asyncio
+async def test_reinforcement_is_written_behind():
+    from openmemory.client import Memory
+    from openmemory.core.db import q
+    from openmemory.memory.reinforce import reinforce_queue
+    from openmemory.ops.dynamics import ETA_REINFORCEMENT_FACTOR_FOR_TRACE_LEARNING as ETA
+
+    mem = Memory()
+    uid = "reinforce_user"
+    await mem.delete_all(user_id=uid)
+    a = await mem.add("Kestrels hover above the meadow", user_id=uid)
+    before = q.get_mem(a["id"])
+
+    hits = await mem.search("kestrels meadow", user_id=uid, limit=1)
+    assert hits[0]["id"] == a["id"]
+    # nothing written on the read path, but later reads already see the boost
+    assert q.get_mem(a["id"])["salience"] == before["salience"]
+    assert reinforce_queue.view(q.get_mem(a["id"]))["salience"] > before["salience"]
+
+    await reinforce_queue.flush()
+    rsal = min(1.0, hits[0]["salience"] + ETA * (1.0 - hits[0]["salience"]))
+    assert q.get_mem(a["id"])["salience"] == pytest.approx(min(1.0, rsal + 0.5))
+    await mem.delete_all(user_id=uid)
+
+def _sql_expand(ids, max_exp):
+    # the per-node FIFO expansion that expand_via_waypoints replaced
+    from openmemory.core.db import db
+    exp, vis, q_arr, cnt = [], set(ids), [{"id": i, "weight": 1.0, "path": [i]} for i in ids], 0
+    while q_arr and cnt < max_exp:
+        cur = q_arr.pop(0)
+        for n in db.fetchall("SELECT dst_id, weight FROM waypoints WHERE src_id=? ORDER BY weight DESC, dst_id", (cur["id"],)):
+            if n["dst_id"] in vis: continue
+            exp_wt = cur["weight"] * min(1.0, max(0.0, float(n["weight"]))) * 0.8
+            if exp_wt < 0.1: continue
+            item = {"id": n["dst_id"], "weight": exp_wt, "path": cur["path"] + [n["dst_id"]]}
+            exp.append(item)
+            vis.add(n["dst_id"])
+            q_arr.append(item)
+            cnt += 1
+    return exp
+
+@pytest.mark.asyncio
+async def test_waypoint_expansion_matches_per_node_queries():
+    from openmemory.client import Memory
+    from openmemory.core.db import db, q
+    from openmemory.memory.hsg import expand_via_waypoints
+    from openmemory.memory.waypoint_graph import waypoint_graph
+
+    Memory()
+    rng = np.random.default_rng(11)
+    nodes = [f"wpg-{i}" for i in range(60)]
+    edges = {}
+    for _ in range(240):
+        a, b = rng.choice(len(nodes), 2, replace=False)
+        edges[(nodes[a], nodes[b])] = round(float(rng.uniform(0.3, 1.0)), 3) # distinct-enough weights
+    db.conn.executemany("INSERT OR REPLACE INTO waypoints(src_id,dst_id,user_id,weight,created_at,updated_at) VALUES (?,?,?,?,?,?)",
+                        [(s, d, "wpg_user", w, 0, 0) for (s, d), w in edges.items()])
+    waypoint_graph.reset()
+
+    def same(a, b):
+        return [(x["id"], x["path"]) for x in a] == [(x["id"], x["path"]) for x in b] and \
+               all(x["weight"] == pytest.approx(y["weight"]) for x, y in zip(a, b))
+
+    for start in (nodes[:1], nodes[5:8], nodes[20:30]):
+        for m in (3, 10, 40):
+            assert same(await expand_via_waypoints(list(start), m), _sql_expand(list(start), m))
+
+    # writes and deletes reach the cached graph
+    db.execute("INSERT INTO waypoints(src_id,dst_id,user_id,weight,created_at,updated_at) VALUES (?,?,?,?,?,?)", ("wpg-0", "wpg-new", "wpg_user", 0.99, 0, 0))
+    waypoint_graph.add_edges([("wpg-0", "wpg-new", "wpg_user", 0.99)])
+    assert (await expand_via_waypoints(["wpg-0"], 1))[0]["id"] == "wpg-new"
+    db.execute("DELETE FROM waypoints WHERE src_id LIKE 'wpg-%' AND (src_id='wpg-new' OR dst_id='wpg-new')")
+    db.emit("mem_delete", ["wpg-new"], {"wpg_user"})
+    assert same(await expand_via_waypoints(["wpg-0"], 10), _sql_expand(["wpg-0"], 10))
+    db.execute("DELETE FROM waypoints WHERE user_id='wpg_user'")
+    waypoint_graph.reset()
+
+@pytest.mark.asyncio
+async def test_stored_features_match_text_overlaps():
+    from openmemory.client import Memory
+    from openmemory.core.db import db, q
+    from openmemory.memory.hsg import compute_token_overlap
+    from openmemory.utils.features import QueryFeatures
+    from openmemory.utils.keyword import extract_keywords, compute_keyword_overlap
+    from openmemory.utils.text import canonical_token_set
+
+    mem = Memory()
+    uid = "feature_user"
+    await mem.delete_all(user_id=uid)
+    texts = ["I prefer dark mode themes in my code editor", "Weekly sync meeting moved to Thursday afternoon",
+             "Deploy the staging cluster with helm and kubectl"]
+    ids = [(await mem.add(t, user_id=uid))["id"] for t in texts]
+    rows = q.get_mems(ids)
+    feats = q.get_features(rows)
+    for query in ["dark theme editor", "when is the weekly meeting", "helm deploy staging", "nothing relevant here"]:
+        qf = QueryFeatures(canonical_token_set(query), query)
+        for i in ids:
+            c = rows[i]["content"]
+            assert qf.token_overlap(feats[i][0]) == pytest.approx(compute_token_overlap(canonical_token_set(query), canonical_token_set(c)))
+            assert qf.keyword_overlap(feats[i][1]) == pytest.approx(compute_keyword_overlap(extract_keywords(query), extract_keywords(c)))
+
+    # rows that predate the table are filled in on read; deletes clean up
+    db.execute("DELETE FROM mem_features WHERE id=?", (ids[0],))
+    assert len(q.get_features(rows)[ids[0]][0]) == len(feats[ids[0]][0])
+    await mem.delete_all(user_id=uid)
+    assert not db.fetchall("SELECT 1 FROM mem_features WHERE id=?", (ids[0],))
+
+@pytest.mark.asyncio
+async def test_fts_index_ranks_and_feeds_candidates():
+    from openmemory.client import Memory
+    from openmemory.core.db import db, q
+    from openmemory.utils.keyword import keyword_filter_memories
+
+    mem = Memory()
+    uid = "fts_user"
+    await mem.delete_all(user_id=uid)
+    a = (await mem.add("The build failed with error code qx7734 on the arm runner", user_id=uid))["id"]
+    b = (await mem.add("Runner qx7734 qx7734 keeps failing, qx7734 again after the retry", user_id=uid))["id"]
+    c = (await mem.add("Lunch options near the office on Fridays", user_id=uid))["id"]
+
+    hits = q.fts_search("qx7734", 10, uid)
+    assert [h[0] for h in hits] == [b, a] and hits[0][1] > hits[1][1] > 0
+    assert q.fts_search("qx7734", 10, "someone_else") == []
+    assert {r["id"] for r in await mem.search("qx7734", user_id=uid, limit=3)} >= {a, b}
+
+    rows = [dict(r) for r in q.get_mems([a, b, c]).values()]
+    scores = await keyword_filter_memories("qx7734 runner", rows)
+    assert scores[b] > scores.get(c, 0) and c not in scores
+    # ad-hoc rows (not in the index) get their bm25 computed locally instead of 0
+    from openmemory.utils.keyword import extract_keywords, compute_keyword_overlap
+    from openmemory.core.config import env
+    adhoc = {"id": "adhoc-1", "content": "Runner qx7734 qx7734 keeps failing, qx7734 again after the retry"}
+    mixed = await keyword_filter_memories("qx7734 runner", rows + [adhoc])
+    kw_only = 0.8 * compute_keyword_overlap(extract_keywords("qx7734 runner", env.keyword_min_length),
+                                            extract_keywords(adhoc["content"], env.keyword_min_length))
+    assert mixed["adhoc-1"] > kw_only + 0.25
+    assert mixed[b] == pytest.approx(scores[b]) # each source is scaled on its own
+
+    await mem.delete(b)
+    assert [h[0] for h in q.fts_search("qx7734", 10, uid)] == [a]
+
+    # the index must not follow memories' implicit rowid, which VACUUM may renumber
+    db.execute("UPDATE memories SET rowid = rowid + 1000000 WHERE id=?", (a,))
+    db.commit()
+    assert [h[0] for h in q.fts_search("qx7734", 10, uid)] == [a]
+    assert [h[0] for h in q.fts_search("office", 10, uid)] == [c]
+    await mem.delete_all(user_id=uid)
+    assert q.fts_search("qx7734", 10) == []
+    assert not db.fetchone("SELECT 1 FROM memories_fts_keys WHERE id IN (?,?,?)", (a, b, c))
+
+@pytest.mark.asyncio
+async def test_tag_index_scores_and_filters():
+    import json
+    from openmemory.client import Memory
+    from openmemory.core.db import db, q
+    from openmemory.memory.hsg import compute_tag_match_score
+
+    def ref(tags, q_toks):
+        # the per-row json scoring compute_tag_match_score used to do
+        matches = 0
+        for tag in tags:
+            tl = str(tag).lower()
+            if tl in q_toks: matches += 2
+            else:
+                for tok in q_toks:
+                    if tl in tok or tok in tl: matches += 1
+        return min(1.0, matches / max(1, len(tags) * 2))
+
+    mem = Memory()
+    uid = "tag_user"
+    await mem.delete_all(user_id=uid)
+    a = (await mem.add("Quarterly budget review notes", user_id=uid, tags=["Finance", "q3"]))["id"]
+    b = (await mem.add("Planning the team offsite agenda", user_id=uid, tags=["events", "team"]))["id"]
+    c = (await mem.add("Notes without any tags at all", user_id=uid))["id"]
+    for toks in [{"finance", "review"}, {"team", "offsite"}, {"fin"}, set()]:
+        for i, tags in [(a, ["Finance", "q3"]), (b, ["events", "team"]), (c, [])]:
+            assert await compute_tag_match_score(i, toks) == pytest.approx(ref(tags, toks))
+
+    assert {k: sorted(v) for k, v in q.get_tags([a, b, c]).items()} == {a: ["finance", "q3"], b: ["events", "team"]}
+    assert [m["id"] for m in mem.by_tags(["FINANCE"], user_id=uid)] == [a]
+    assert {r["id"] for r in await mem.search("notes", user_id=uid, tags=["finance"])} == {a}
+
+    # migration backfill reads the same json
+    db.execute("DELETE FROM memory_tags WHERE memory_id=?", (a,))
+    q.set_tags([(a, q.get_mem(a)["tags"])])
+    assert sorted(q.get_tags([a])[a]) == ["finance", "q3"]
+    await mem.delete_all(user_id=uid)
+    assert not db.fetchall("SELECT 1 FROM memory_tags WHERE memory_id IN (?,?)", (a, b))
@@ -0,0 +1,83 @@
+import math
+import pytest
+import numpy as np
+from openmemory.ai.synthetic import SyntheticAdapter
+from openmemory.utils.text import canonical_tokens_from_text, synonyms_for, canonicalize_token
+from openmemory.core.constants import SEC_WTS
+
+# ==================================================================================
+# SYNTHETIC EMBEDDINGS
+# ==================================================================================
+# The vectorized generator must be bit-identical to the scalar one it replaced
+# (kept below verbatim as the reference).
+# ==================================================================================
+
+def _reference(a: SyntheticAdapter, t: str, s: str):
+    def add_feat(vec, k, w):
+        h = a._fnv1a(k)
+        h2 = a._murmurish(k, 0xdeadbeef)
+        val = w * (1.0 - float((h & 1) << 1))
+        if (a.dim & (a.dim - 1)) == 0:
+            vec[h & (a.dim - 1)] += val
+            vec[h2 & (a.dim - 1)] += val * 0.5
+        else:
+            vec[h % a.dim] += val
+            vec[h2 % a.dim] += val * 0.5
+
+    def add_pos_feat(vec, pos, w):
+        idx = pos % a.dim
+        ang = pos / pow(10000, (2 * idx) / a.dim)
+        vec[idx] += w * math.sin(ang)
+        vec[(idx + 1) % a.dim] += w * math.cos(ang)
+
+    v = np.zeros(a.dim, dtype=np.float32)
+    ct = canonical_tokens_from_text(t)
+    if not ct:
+        return (np.ones(a.dim, dtype=np.float32) / math.sqrt(a.dim)).tolist()
+    et = []
+    for tok in ct:
+        et.append(tok)
+        syns = synonyms_for(tok)
+        if syns:
+            for syn in syns: et.append(canonicalize_token(syn))
+    el = len(et)
+    tc = {}
+    for tok in et: tc[tok] = tc.get(tok, 0) + 1
+    sw = SEC_WTS.get(s, 1.0)
+    for tok, c in tc.items():
+        tf = c / el
+        idf = math.log(1 + el/c)
+        w = (tf * idf + 1) * sw
+        add_feat(v, f"{s}|tok|{tok}", w)
+        if len(tok) >= 3:
+            for i in range(len(tok) - 2):
+                add_feat(v, f"{s}|c3|{tok[i:i+3]}", w * 0.4)
+    for i in range(len(ct) - 1):
+        add_feat(v, f"{s}|bi|{ct[i]}_{ct[i+1]}", 1.4 * sw * (1.0 / (1.0 + i * 0.1)))
+    dl = math.log(1 + el)
+    for i in range(min(len(ct), 50)):
+        add_pos_feat(v, i, (0.5 * sw) / dl)
+    n = np.linalg.norm(v)
+    if n > 0: v /= n
+    return v.tolist()
+
+TEXTS = [
+    "",
+    "!!!",
+    "Hello world",
+    "I bought a new car yesterday and I feel happy about it",
+    "How to install the package: run pip install openmemory then import Memory",
+    "Café naïve résumé — ünïcödé tokens 東京 and emoji 🙂 mixed in",
+    " ".join(f"word{i} repeated repeated" for i in range(80)),
+]
+
+@pytest.mark.parametrize("dim", [768, 256, 100])
+@pytest.mark.asyncio
+async def test_vectorized_matches_reference(dim):
+    a = SyntheticAdapter(dim)
+    for s in ["semantic", "emotional", "episodic", "unknown"]:
+        batch = await a.embed_batch(TEXTS, s)
+        for t, got in zip(TEXTS, batch):
+            ref = _reference(a, t, s)
+            assert np.array_equal(np.array(got, dtype=np.float32), np.array(ref, dtype=np.float32))
+            assert await a.embed(t, s) == ref
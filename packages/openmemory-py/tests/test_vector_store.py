@@ -0,0 +1,410 @@
+import pytest
+import numpy as np
+from openmemory.utils.vectors import VecMatrix, cos_sim
+
+# ==================================================================================
+# VECTOR STORE
+# ==================================================================================
+# Resident matrix search must agree with the naive per-row cosine scan it replaced.
+# ==================================================================================
+
+def _naive(rows, q, k, label=None):
+    res = [(i, cos_sim(v, q)) for i, (v, l) in rows.items() if label is None or l == label]
+    res.sort(key=lambda x: x[1], reverse=True)
+    return res[:k]
+
+def test_matrix_matches_naive_scan():
+    rng = np.random.default_rng(7)
+    m = VecMatrix(16, cap=2)
+    rows = {}
+    for n in range(50):
+        v = rng.normal(size=16).astype(np.float32)
+        rows[f"m{n}"] = (v, "a" if n % 2 else "b")
+        m.upsert(f"m{n}", v, rows[f"m{n}"][1])
+
+    # deletes swap the last row in, overwrite replaces in place
+    for gone in ["m0", "m13", "m49"]:
+        assert m.remove(gone)
+        rows.pop(gone)
+    v = rng.normal(size=16).astype(np.float32)
+    m.upsert("m7", v, "a")
+    rows["m7"] = (v, "a")
+    assert len(m) == len(rows)
+
+    q = rng.normal(size=16).astype(np.float32)
+    got = m.top_k(q, 5)
+    exp = _naive(rows, q, 5)
+    assert [i for i, _ in got] == [i for i, _ in exp]
+    assert np.allclose([s for _, s in got], [s for _, s in exp], atol=1e-5)
+
+    got = m.top_k(q, 100, m.mask("a"))
+    exp = _naive(rows, q, 100, "a")
+    assert [i for i, _ in got] == [i for i, _ in exp]
+
+@pytest.mark.asyncio
+async def test_sqlite_store_tracks_writes():
+    from openmemory.core.db import db, q
+    from openmemory.core.vector_store import SQLiteVectorStore
+    db.connect()
+    store = SQLiteVectorStore()
+    await store.storeVector("vs_a", "semantic", [1.0, 0.0, 0.0], 3, "vs_user")
+    assert (await store.search([1.0, 0.0, 0.0], "semantic", 1, {"user_id": "vs_user"}))[0]["id"] == "vs_a"
+
+    # written after the sector was loaded -> visible without a reload
+    await store.storeVector("vs_b", "semantic", [0.0, 1.0, 0.0], 3, "vs_user")
+    hits = await store.search([0.0, 1.0, 0.0], "semantic", 2, {"user_id": "vs_user"})
+    assert [h["id"] for h in hits] == ["vs_b", "vs_a"]
+
+    await store.deleteVectors("vs_b")
+    q.del_mem("vs_a")
+    assert await store.search([0.0, 1.0, 0.0], "semantic", 2, {"user_id": "vs_user"}) == []
+
+
+@pytest.mark.asyncio
+async def test_bulk_vectors_match_single_lookups():
+    from openmemory.core.vector_store import SQLiteVectorStore
+
+    store = SQLiteVectorStore()
+    rng = np.random.default_rng(2)
+    ids = [f"bulk-{i}" for i in range(12)]
+    for i in ids:
+        await store.storeVector(i, "semantic", rng.standard_normal(16).tolist(), 16, "u-bulk")
+        await store.storeVector(i, "episodic", rng.standard_normal(16).tolist(), 16, "u-bulk")
+
+    got = await store.getVectorsByIds(ids + ["bulk-missing"])
+    assert set(got) == {"semantic", "episodic"}
+    for sec, batch in got.items():
+        assert sorted(batch.ids) == sorted(ids)
+        for row, i in enumerate(batch.ids):
+            one = await store.getVector(i, sec)
+            assert np.allclose(batch.mat[row], one.vector)
+
+    for i in ids:
+        await store.deleteVectors(i)
+
+
+@pytest.mark.asyncio
+async def test_waypoint_links_follow_mean_vectors():
+    from openmemory.client import Memory
+    from openmemory.core.db import db, q
+    from openmemory.core.config import env
+    from openmemory.memory.hsg import mean_index
+
+    mem = Memory()
+    uid = "waypoint_user"
+    await mem.delete_all(user_id=uid)
+    texts = ["Rust borrow checker rules", "Python asyncio event loops", "Rust lifetimes and borrowing",
+             "Baking sourdough bread", "Sourdough starter feeding"]
+    ids = [(await mem.add(t, user_id=uid))["id"] for t in texts]
+
+    # brute force over the stored blobs must agree with the resident matrix
+    rows = [r for r in q.all_mem_by_user(uid, 100, 0) if r["id"] != ids[-1]]
+    new = np.frombuffer(q.get_mem(ids[-1])["mean_vec"], dtype=np.float32)
+    want = max(rows, key=lambda r: cos_sim(new, np.frombuffer(r["mean_vec"], dtype=np.float32)))["id"]
+    assert mean_index.nearest(new.tolist(), uid, 1, ids[-1])[0][0] == want
+
+    old, env.waypoint_links = env.waypoint_links, 3
+    try:
+        extra = (await mem.add("Sourdough bread crust and crumb", user_id=uid))["id"]
+    finally:
+        env.waypoint_links = old
+    links = db.fetchall("SELECT dst_id FROM waypoints WHERE src_id=?", (extra,))
+    assert len(links) == 3 and extra not in {r["dst_id"] for r in links}
+    await mem.delete_all(user_id=uid)
+
+
+def test_stores_release_their_db_hooks(tmp_path):
+    import gc
+    import weakref
+    from openmemory.core.db import db
+    from openmemory.core.vector_store import SQLiteVectorStore
+    from openmemory.core.vector.mmap import MmapVectorStore
+    from openmemory.core.vector.hnsw import HNSWVectorStore
+    db.connect()
+    hooks = lambda: (len(db._hooks.get("mem_delete", [])), len(db._hooks.get("tx_rollback", [])))
+    # stores dropped by earlier tests unhook on the next event
+    gc.collect()
+    db.emit("tx_rollback")
+    db.emit("mem_delete", [], set())
+    before = hooks()
+    for make in (SQLiteVectorStore, lambda: MmapVectorStore(data_dir=str(tmp_path / "vecs")),
+                 lambda: HNSWVectorStore(index_dir=str(tmp_path / "hnsw"))):
+        s = make()
+        assert hooks() == (before[0] + 1, before[1] + 1)
+        s.close()
+        assert hooks() == before
+        # dropped without close(): the hooks do not keep it alive, and go on the next event
+        s = make()
+        ref = weakref.ref(s)
+        del s
+        gc.collect()
+        assert ref() is None
+        db.emit("tx_rollback")
+        db.emit("mem_delete", [], set())
+        assert hooks() == before
+
+
+@pytest.mark.asyncio
+async def test_filters_are_pushed_into_every_store(tmp_path, monkeypatch):
+    import json
+    from openmemory.core import filters
+    from openmemory.core.db import db, q
+    from openmemory.core.filters import MemFilter
+    from openmemory.core.vector_store import SQLiteVectorStore
+    from openmemory.core.vector.mmap import MmapVectorStore
+    db.connect()
+    stores = [SQLiteVectorStore(), MmapVectorStore(data_dir=str(tmp_path / "vecs"))]
+    try:
+        from openmemory.core.vector.hnsw import HNSWVectorStore
+        stores.append(HNSWVectorStore(index_dir=str(tmp_path / "hnsw")))
+    except ImportError:
+        pass
+
+    rng = np.random.default_rng(11)
+    rows = {}
+    for n in range(400):
+        mid = f"flt-{n}"
+        meta = {"project": "apollo" if n % 40 == 0 else "other", "pinned": n % 3 == 0}
+        q.ins_mem(id=mid, user_id="flt_user" if n % 5 else "flt_other", content=f"row {n}", primary_sector="semantic",
+                  meta=json.dumps(meta), tags=json.dumps(["even"] if n % 2 == 0 else []),
+                  created_at=1000 + n, updated_at=1000 + n, last_seen_at=1000 + n, salience=(n % 10) / 10)
+        rows[mid] = (rng.normal(size=16).astype(np.float32), n, meta)
+    for s in stores:
+        for mid, (v, _, _) in rows.items():
+            await s.storeVector(mid, "semantic", v.tolist(), 16, "flt_user" if rows[mid][1] % 5 else "flt_other")
+
+    qv = rng.normal(size=16).astype(np.float32)
+    cases = [
+        ({"user_id": "flt_user", "metadata": {"project": "apollo"}}, lambda n, m: n % 5 and m["project"] == "apollo"),
+        ({"user_id": "flt_user", "startTime": 1100, "endTime": 1150, "minSalience": 0.5}, lambda n, m: n % 5 and 100 <= n <= 150 and n % 10 >= 5),
+        ({"metadata": {"pinned": True}, "tags": ["EVEN"]}, lambda n, m: m["pinned"] and n % 2 == 0),
+        ({"user_id": "flt_user", "sector": ["episodic"]}, lambda n, m: False),
+        # a bare string is one tag, not its characters
+        ({"user_id": "flt_user", "tags": "even", "minSalience": 0.3}, lambda n, m: n % 5 and n % 2 == 0 and n % 10 >= 3),
+    ]
+    assert MemFilter.from_dict({"tags": "even"}).tags == ["even"]
+    # then again with every filter over 10% of the owner's rows taking the post-filter path
+    for id_min, broad in ((filters.ID_SET_MIN, set()), (0, {2, 4})):
+        monkeypatch.setattr(filters, "ID_SET_MIN", id_min)
+        for n_case, (f, want) in enumerate(cases):
+            exp = [i for i, _ in sorted(((i, cos_sim(v, qv)) for i, (v, n, m) in rows.items() if want(n, m)), key=lambda x: -x[1])][:5]
+            flt = MemFilter.from_dict(f)
+            assert flt.broad == (n_case in broad)
+            assert flt.ids() == (None if flt.broad else {i for i, (_, n, m) in rows.items() if want(n, m)})
+            for s in stores:
+                got = await s.search_many({"semantic": qv.tolist()}, 5, f)
+                assert [h["id"] for h in got["semantic"]] == exp, (type(s).__name__, f, id_min)
+
+    # the lexical index takes the same filter on its memories join
+    hits = q.fts_search("row", 50, flt=MemFilter.from_dict(cases[0][0]))
+    assert {i for i, _ in hits} == {i for i, (_, n, m) in rows.items() if cases[0][1](n, m)}
+    q.del_mem_by_user("flt_user")
+    q.del_mem_by_user("flt_other")
+
+
+@pytest.mark.asyncio
+async def test_selective_filter_does_not_starve_top_k():
+    from openmemory.client import Memory
+    mem = Memory()
+    uid = "starve_user"
+    await mem.delete_all(user_id=uid)
+    import random
+    r = random.Random(1)
+    words = "python code review refactor function class module test lint type async loop cache index query parser token build deploy branch".split()
+    await mem.add_many([" ".join(r.sample(words, 8)) for _ in range(300)], user_id=uid)
+    garden = ["Tomato seedlings need watering every morning", "Compost the fallen autumn leaves behind the shed",
+              "Prune the rose bushes before spring frost ends"]
+    rare = [(await mem.add(t, user_id=uid, meta={"project": "garden"}))["id"] for t in garden]
+
+    # far from the query, but the only rows that pass the filter: all three must come back
+    res = await mem.search("python code refactoring", user_id=uid, limit=3, metadata={"project": "garden"})
+    assert sorted(r["id"] for r in res) == sorted(rare)
+    assert await mem.search("python code refactoring", user_id=uid, limit=3, metadata={"project": "none"}) == []
+    await mem.delete_all(user_id=uid)
+
+
+@pytest.mark.asyncio
+async def test_hnsw_store_insert_filter_delete_reload(tmp_path):
+    pytest.importorskip("hnswlib")
+    from openmemory.core.db import db
+    from openmemory.core.vector.hnsw import HNSWVectorStore
+    db.connect()
+    d = str(tmp_path / "hnsw")
+    # own sector: the graph dim follows the sector's vectors, other tests write 768-d "semantic" rows
+    rng = np.random.default_rng(5)
+    rows = {f"hn-{n}": (rng.normal(size=16).astype(np.float32), "hn_a" if n % 2 else "hn_b") for n in range(300)}
+    store = HNSWVectorStore(index_dir=d)
+    for i, (v, u) in rows.items():
+        await store.storeVector(i, "hn_sector", v.tolist(), 16, u)
+
+    qv = rng.normal(size=16).astype(np.float32)
+    exp = [i for i, _ in _naive(rows, qv, 10, "hn_a")]
+    got = [h["id"] for h in await store.search(qv.tolist(), "hn_sector", 10, {"user_id": "hn_a"})]
+    assert len(set(got) & set(exp)) >= 9 # approximate, but near-exact at this size
+    assert all(rows[i][1] == "hn_a" for i in got)
+
+    # delete after the last save: the saved graph still holds it, reconciling drops it
+    store.flush()
+    top = got[0]
+    await store.deleteVectors(top)
+    assert top not in [h["id"] for h in await store.search(rows[top][0].tolist(), "hn_sector", 5)]
+    from openmemory.core.vector.hnsw import _SectorIndex
+    import os
+    assert top in _SectorIndex.load(os.path.join(d, "hn_sector")).labels
+    for _ in range(2):
+        reopened = HNSWVectorStore(index_dir=d)
+        hits = [h["id"] for h in await reopened.search(rows[top][0].tolist(), "hn_sector", 5)]
+        assert top not in hits and len(hits) == 5
+        reopened.flush() # the second pass loads the graph saved without it
+        assert top not in _SectorIndex.load(os.path.join(d, "hn_sector")).labels
+    for i in rows: await store.deleteVectors(i)
+
+
+def test_hnsw_selective_filters_keep_k_and_recall():
+    pytest.importorskip("hnswlib")
+    from openmemory.core.vector.hnsw import _SectorIndex
+    rng = np.random.default_rng(17)
+    rows = {f"sel-{n}": (rng.normal(size=16).astype(np.float32), "rare" if n % 10 == 0 else "common") for n in range(3000)}
+    si = _SectorIndex(16, cap=len(rows))
+    for i, (v, u) in rows.items(): si.add(i, v, u)
+    assert si.per_user["rare"] == 300 and si.per_user["common"] == 2700
+
+    # a 10% filter: the graph walk widens ef instead of returning fewer or worse hits
+    qv = rng.normal(size=16).astype(np.float32)
+    got = [h["id"] for h in si.query(qv, 10, "rare")]
+    assert len(got) == 10 and all(rows[i][1] == "rare" for i in got)
+    assert len(set(got) & {i for i, _ in _naive(rows, qv, 10, "rare")}) >= 9
+    allow = {i for i, (_, u) in rows.items() if u == "rare"}
+    assert [h["id"] for h in si.query(qv, 10, allow=allow)] == got
+    # too few matching rows for a graph walk: the store searches those exactly
+    assert si.query(qv, 10, allow=set(list(allow)[:50])) is None
+
+    si.remove(got[0])
+    si.add(got[1], rows[got[1]][0], "common")
+    assert si.per_user["rare"] == 298 and si.per_user["common"] == 2701
+
+
+@pytest.mark.parametrize("scheme", ["int8", "binary"])
+def test_quantized_codes_keep_recall(scheme):
+    from openmemory.core.vector.quant import Codebook, QuantMatrix
+    rng = np.random.default_rng(13)
+    # clustered rows, like embeddings: a few directions plus noise
+    centers = rng.normal(size=(20, 64))
+    data = (centers[rng.integers(0, 20, 3000)] + 0.6 * rng.normal(size=(3000, 64))).astype(np.float32)
+    units = data / np.linalg.norm(data, axis=1, keepdims=True)
+    cb = Codebook.train(scheme, units[:2000])
+    assert cb.trained and cb.width() == (64 if scheme == "int8" else 8)
+    m, exact = QuantMatrix(cb, cap=8), VecMatrix(64)
+    for n, v in enumerate(data):
+        m.upsert(f"q{n}", v)
+        exact.upsert(f"q{n}", v)
+
+    hit = tot = 0
+    for qv in rng.normal(size=(20, 64)).astype(np.float32) + centers[:20].astype(np.float32):
+        want = {i for i, _ in exact.top_k(qv, 10)}
+        short = [i for i, _ in m.top_k(qv, cb.shortlist(10))]
+        # exact re-rank of the shortlist, as the stores do
+        rr = VecMatrix(64)
+        for i in short: rr.upsert(i, data[int(i[1:])])
+        hit += len(want & {i for i, _ in rr.top_k(qv, 10)})
+        tot += 10
+    assert hit / tot >= 0.95
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store_quantized_search_reranks(monkeypatch):
+    from openmemory.core.config import env
+    from openmemory.core.db import db
+    from openmemory.core.vector_store import SQLiteVectorStore
+    db.connect()
+    monkeypatch.setattr(env, "vec_quant", "int8")
+    rng = np.random.default_rng(17)
+    rows = {f"qs-{n}": (rng.normal(size=32).astype(np.float32), "qs_user") for n in range(1200)}
+    store = SQLiteVectorStore()
+    await store.storeVectors([(i, "qs_sector", v.tolist(), 32, u) for i, (v, u) in rows.items()])
+    qv = rng.normal(size=32).astype(np.float32)
+    # k=150 shortlists 600 ids: the exact re-rank has to read them in chunks
+    got = await store.search(qv.tolist(), "qs_sector", 150, {"user_id": "qs_user"})
+    exp = _naive(rows, qv, 150)
+    assert hasattr(store._mats["qs_sector"][32], "codebook")
+    assert len({h["id"] for h in got} & {i for i, _ in exp}) >= 140
+    assert np.allclose([h["similarity"] for h in got[:5]], [s for _, s in exp[:5]], atol=1e-5)
+    db.execute("DELETE FROM vectors WHERE sector='qs_sector'")
+    db.execute("DELETE FROM vector_codebooks WHERE sector='qs_sector'")
+    db.commit()
+
+
+@pytest.mark.asyncio
+async def test_mmap_store_reopen_delete_and_torn_tail(tmp_path, caplog):
+    import logging, os
+    from openmemory.core.db import db
+    from openmemory.core.vector.mmap import MmapVectorStore
+    db.connect()
+    d = str(tmp_path / "vecs")
+    rng = np.random.default_rng(23)
+    rows = {f"mm-{n}": (rng.normal(size=16).astype(np.float32), "mm_a" if n % 2 else "mm_b") for n in range(60)}
+    store = MmapVectorStore(data_dir=d)
+    for i, (v, u) in rows.items():
+        await store.storeVector(i, "mm_sector", v.tolist(), 16, u)
+
+    qv = rng.normal(size=16).astype(np.float32)
+    got = await store.search(qv.tolist(), "mm_sector", 8, {"user_id": "mm_a"})
+    assert [h["id"] for h in got] == [i for i, _ in _naive(rows, qv, 8, "mm_a")]
+
+    gone = got[0]["id"]
+    await store.deleteVectors(gone)
+    rows.pop(gone)
+
+    # an append cut short by a crash leaves a partial row at the end of the file
+    path = os.path.join(d, "mm_sector", "0_16.f32")
+    with open(path, "ab") as f: f.write(b"\x00" * 10)
+
+    caplog.set_level(logging.INFO, logger="vector_store.mmap")
+    reopened = MmapVectorStore(data_dir=d)
+    got = await reopened.search(qv.tolist(), "mm_sector", 8, {"user_id": "mm_a"})
+    assert [h["id"] for h in got] == [i for i, _ in _naive(rows, qv, 8, "mm_a")]
+    assert not any("mirrored" in r.message for r in caplog.records) # slots reused, no blobs re-read
+    assert os.path.getsize(path) % (16 * 4) == 0
+
+    # the next append lands on a row boundary again
+    v = rng.normal(size=16).astype(np.float32)
+    await reopened.storeVector("mm-new", "mm_sector", v.tolist(), 16, "mm_a")
+    rows["mm-new"] = (v, "mm_a")
+    again = MmapVectorStore(data_dir=d)
+    hits = await again.search(v.tolist(), "mm_sector", 60)
+    assert hits[0]["id"] == "mm-new" and hits[0]["similarity"] == pytest.approx(1.0, abs=1e-5)
+    assert {h["id"] for h in hits} == set(rows)
+    for i in rows: await again.deleteVectors(i)
+
+
+@pytest.mark.asyncio
+async def test_search_many_matches_separate_searches(tmp_path):
+    from openmemory.core.db import db
+    from openmemory.core.vector_store import SQLiteVectorStore
+    from openmemory.core.vector.mmap import MmapVectorStore
+    db.connect()
+    stores = [SQLiteVectorStore(), MmapVectorStore(data_dir=str(tmp_path / "vecs"))]
+    try:
+        import hnswlib  # noqa: F401
+        from openmemory.core.vector.hnsw import HNSWVectorStore
+        stores.append(HNSWVectorStore(index_dir=str(tmp_path / "hnsw")))
+    except ImportError:
+        pass
+    rng = np.random.default_rng(29)
+    sectors = ["sm_a", "sm_b", "sm_c"]
+    rows = [(f"sm-{s}-{n}", s, rng.normal(size=16).astype(np.float32).tolist(), 16, "sm_u" if n % 3 else "sm_v")
+            for s in sectors for n in range(80)]
+    await stores[0].storeVectors(rows) # one table, every store mirrors it on first search
+
+    queries = {s: rng.normal(size=16).astype(np.float32).tolist() for s in sectors + ["sm_empty"]}
+    for store in stores:
+        for f in (None, {"user_id": "sm_u"}):
+            many = await store.search_many(queries, 7, f)
+            assert set(many) == set(queries)
+            for s, qv in queries.items():
+                one = await store.search(qv, s, 7, f)
+                assert [h["id"] for h in many[s]] == [h["id"] for h in one], (type(store).__name__, s, f)
+                assert np.allclose([h["similarity"] for h in many[s]], [h["similarity"] for h in one])
+    db.execute("DELETE FROM vectors WHERE sector IN ('sm_a', 'sm_b', 'sm_c')")
+    db.execute("DELETE FROM vector_slots WHERE sector IN ('sm_a', 'sm_b', 'sm_c')")
+    db.commit()